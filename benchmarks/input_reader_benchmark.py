@@ -0,0 +1,174 @@
+"""Benchmark tokenizing SWMM input files with and without shlex.
+
+Reads a SWMM input file with the reader's fast tokenizer and with the shlex
+tokenizer it replaced, checks that both produce the same input and reports
+how long each took. If no input file is given, a synthetic input of about
+100,000 lines is generated from the bundled model template, including quoted
+names so that every tokenizer path is exercised.
+
+Usage:
+    python benchmarks/input_reader_benchmark.py [input_path]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import tempfile
+import timeit
+
+from ostrich_swmm.swmm import input_reader as sir
+
+template_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    os.pardir,
+    'templates',
+    'ModelTemplate.inp',
+)
+"""The model template synthetic input is generated from."""
+
+
+def generate_input(f, num_subcatchments):
+    """Write a synthetic SWMM input file.
+
+    Each section of the model template describing subcatchments is extended
+    with generated subcatchments, every tenth of which has a quoted name
+    containing a space.
+
+    Args:
+        f (file): The file to write to.
+        num_subcatchments (int): The number of subcatchments to generate.
+    """
+    generated_lines = {
+        'SUBCATCHMENTS': (
+            '{0:<16} Gage1            J{1}               {2:<8.3f} 50       '
+            '400      0.5      0'
+        ),
+        'SUBAREAS': (
+            '{0:<16} 0.01       0.1        0.05       0.05       25         '
+            'OUTLET'
+        ),
+        'INFILTRATION': (
+            '{0:<16} 3.5        0.5        0.26       ;Generated'
+        ),
+        'POLYGONS': '{0:<16} {3:<18.3f} {4:<18.3f}',
+    }
+    names = [
+        '"Generated {0}"'.format(i) if i % 10 == 0 else 'G{0}'.format(i)
+        for i in range(num_subcatchments)
+    ]
+
+    random.seed(0)
+    section = None
+    with open(template_path) as template_file:
+        for line in template_file:
+            f.write(line)
+            if line.startswith('['):
+                section = line.strip()[1:-1].upper()
+            elif line.startswith(';;-') and section in generated_lines:
+                line_format = generated_lines[section]
+                num_lines = 2 if section == 'POLYGONS' else 1
+                for i, name in enumerate(names):
+                    for _ in range(num_lines):
+                        f.write(line_format.format(
+                            name,
+                            i % 3 + 1,
+                            random.uniform(1, 5),
+                            random.uniform(0, 1e6),
+                            random.uniform(0, 1e6),
+                        ))
+                        f.write('\n')
+
+
+def read_input(input_path):
+    """Read and parse every section of a SWMM input file.
+
+    Args:
+        input_path (string): The path to the input file.
+
+    Returns:
+        list: The name, comment and lines of each section.
+    """
+    with open(input_path) as input_file:
+        swmm_input = sir.read(input_file)
+
+    # Sections are only parsed when their lines are used, so use them all.
+    return [
+        (section, section_content['comment'], section_content['lines'])
+        for section, section_content
+        in swmm_input.iteritems()
+    ]
+
+
+def read_input_with_shlex(input_path):
+    """Read and parse a SWMM input file, tokenizing every line with shlex.
+
+    Args:
+        input_path (string): The path to the input file.
+
+    Returns:
+        list: The name, comment and lines of each section.
+    """
+    split_ssv_values = sir.split_ssv_values
+    sir.split_ssv_values = sir.split_ssv_values_with_shlex
+    try:
+        return read_input(input_path)
+    finally:
+        sir.split_ssv_values = split_ssv_values
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark tokenizing SWMM input files.',
+    )
+    parser.add_argument(
+        'input_path',
+        nargs='?',
+        default=None,
+        help='The input file to read. Defaults to a synthetic input.',
+    )
+    parser.add_argument(
+        '-n',
+        '--repeat',
+        type=int,
+        default=3,
+        help='The number of times to read the input with each tokenizer.',
+    )
+    args = parser.parse_args()
+
+    input_path = args.input_path
+    if input_path is None:
+        input_fd, input_path = tempfile.mkstemp(suffix='.inp')
+        with os.fdopen(input_fd, 'w') as input_file:
+            generate_input(input_file, 20000)
+
+    try:
+        with open(input_path) as input_file:
+            num_lines = sum(1 for _ in input_file)
+        print('Input: {0} ({1} lines)'.format(input_path, num_lines))
+
+        if read_input(input_path) != read_input_with_shlex(input_path):
+            raise AssertionError('Tokenizers produced different input.')
+
+        results = []
+        for name, read_function in [
+            ('shlex', read_input_with_shlex),
+            ('fast', read_input),
+        ]:
+            seconds = min(timeit.repeat(
+                lambda: read_function(input_path),
+                repeat=args.repeat,
+                number=1,
+            ))
+            results.append(seconds)
+            print('{0:>6}: {1:.3f} s'.format(name, seconds))
+        print('Speedup: {0:.1f}x'.format(results[0] / results[1]))
+    finally:
+        if args.input_path is None:
+            os.remove(input_path)
+
+
+if __name__ == '__main__':
+    main()
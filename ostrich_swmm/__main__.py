@@ -6,10 +6,14 @@ import argparse
 import os
 import sys
 
+from . import batch
 from . import config as cfg
+from . import incremental
 from . import inject
 from . import extract
+from . import result_cache
 from . import run
+from . import server
 from .version import __version__
 
 
@@ -61,6 +65,14 @@ def load_config_with_args(args):
         config['input_template_path'] = args['input_template']
     if args.get('parameters_file') is not None:
         config['input_parameters_path'] = args['parameters_file']
+    if args.get('socket') is not None:
+        config['socket_path'] = args['socket']
+    if args.get('batch_dir') is not None:
+        config['batch_dir'] = args['batch_dir']
+    if args.get('parameters'):
+        config.setdefault('batch', {})['parameters'] = args['parameters']
+    if args.get('processes') is not None:
+        config.setdefault('batch', {})['processes'] = args['processes']
 
     cfg.validate_config(config)
 
@@ -96,7 +108,7 @@ def inject_cmd(config):
     Raises:
         ConfigException: The configuration was invalid.
     """
-    inject.perform_injection(config)
+    incremental.perform_injection(config)
 
     return 0
 
@@ -118,6 +130,96 @@ def run_cmd(config):
     return 0
 
 
+def run_batch_cmd(config):
+    """Run SWMM for many parameter files across a pool of processes.
+
+    Args:
+        config (dict): The configuration to use.
+
+    Returns:
+        int: An exit code for the script.
+
+    Raises:
+        ConfigException: The configuration was invalid.
+    """
+    runs, results, combined_summary_paths = batch.perform_batch(config)
+
+    num_failed = 0
+    for batch_run, result in zip(runs, results):
+        if result['exit_code'] != 0:
+            num_failed += 1
+            print(
+                'Run "{0}" failed:\n{1}'.format(
+                    batch_run['name'],
+                    result['error'],
+                ),
+                file=sys.stderr,
+            )
+    print('Performed {0} runs, {1} of which failed.'.format(
+        len(runs),
+        num_failed,
+    ))
+    for combined_summary_path in combined_summary_paths:
+        print('Combined summaries at "{0}".'.format(combined_summary_path))
+
+    return 1 if num_failed else 0
+
+
+def cache_polygons_cmd(config):
+    """Cache the subcatchment polygons of a SWMM input template.
+
+    Args:
+        config (dict): The configuration to use.
+
+    Returns:
+        int: An exit code for the script.
+
+    Raises:
+        ConfigException: The configuration was invalid.
+    """
+    cache_path = inject.perform_polygon_caching(config)
+    print('Cached subcatchment polygons at "{0}".'.format(cache_path))
+
+    return 0
+
+
+def cache_stats_cmd(config):
+    """Report how many runs found their results in the result cache.
+
+    Args:
+        config (dict): The configuration to use.
+
+    Returns:
+        int: An exit code for the script.
+
+    Raises:
+        ConfigException: The configuration was invalid.
+    """
+    cfg.validate_required_sections(config, ['cache_dir'], 'cache-stats')
+    print(result_cache.format_stats(
+        result_cache.read_stats(config['cache_dir']),
+    ))
+
+    return 0
+
+
+def serve_cmd(config):
+    """Serve runs of SWMM from a persistent process until interrupted.
+
+    Args:
+        config (dict): The configuration to use.
+
+    Returns:
+        int: An exit code for the script.
+
+    Raises:
+        ConfigException: The configuration was invalid.
+    """
+    server.serve(config)
+
+    return 0
+
+
 def main(argv=None):
     """Execute functions of this package as a script.
 
@@ -234,6 +336,75 @@ def main(argv=None):
             ],
         )
 
+        # Set up parsing for the batch run sub-command.
+        run_batch_parser = subparsers.add_parser(
+            'run-batch',
+            help='Run SWMM for many parameter files in parallel.',
+            parents=[
+                config_parser,
+                swmm_input_template_parser,
+            ],
+        )
+        run_batch_parser.add_argument(
+            'parameters',
+            nargs='*',
+            help=(
+                'Parameter files, directories of parameter files or glob '
+                'patterns matching parameter files to run.'
+            ),
+        )
+        run_batch_parser.add_argument(
+            '-d',
+            '--batch-dir',
+            default=None,
+            help='The directory to create a directory for each run in.',
+        )
+        run_batch_parser.add_argument(
+            '-j',
+            '--processes',
+            type=int,
+            default=None,
+            help=(
+                'The number of runs to perform at once. Defaults to the '
+                'number of CPUs.'
+            ),
+        )
+
+        # Set up parsing for the server sub-command.
+        serve_parser = subparsers.add_parser(
+            'serve',
+            help='Serve runs of SWMM from a persistent process.',
+            parents=[
+                config_parser,
+                swmm_input_template_parser,
+            ],
+        )
+        serve_parser.add_argument(
+            '-s',
+            '--socket',
+            default=None,
+            help='The path of the socket to serve runs on.',
+        )
+
+        # Set up parsing for the polygon caching sub-command.
+        subparsers.add_parser(
+            'cache-polygons',
+            help='Cache the subcatchment polygons of a SWMM input template.',
+            parents=[
+                config_parser,
+                swmm_input_template_parser,
+            ],
+        )
+
+        # Set up parsing for the result cache statistics sub-command.
+        subparsers.add_parser(
+            'cache-stats',
+            help='Report how many runs found their results in the cache.',
+            parents=[
+                config_parser,
+            ],
+        )
+
         # Parse arguments.
         args = vars(parser.parse_args(argv[1:]))
         config = load_config_with_args(args)
@@ -243,6 +414,10 @@ def main(argv=None):
             'extract': extract_cmd,
             'inject': inject_cmd,
             'run': run_cmd,
+            'run-batch': run_batch_cmd,
+            'serve': serve_cmd,
+            'cache-polygons': cache_polygons_cmd,
+            'cache-stats': cache_stats_cmd,
         }
         return subcommands[args['subcommand']](config)
     except (UsageException, cfg.ConfigException) as e:
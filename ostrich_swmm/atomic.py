@@ -0,0 +1,81 @@
+"""Functionality for writing files atomically.
+
+Files are written to a temporary file in the same directory first, which is
+then moved into place. Readers of a file, such as other runs or OSTRICH, never
+see it partially written, and runs writing the same file at once each leave
+it whole. Temporary files are created with the permissions new files normally
+get, so replaced files keep being readable by whoever could read them before.
+"""
+
+import contextlib
+import os
+import tempfile
+
+# The umask can only be read by setting it, so set it back straight away.
+umask = os.umask(0)
+os.umask(umask)
+
+file_mode = 0o666 & ~umask
+"""The permissions of files written by this process."""
+
+
+def make_temp_file(path):
+    """Create an empty temporary file to write a file's contents to.
+
+    Args:
+        path (string): The path to the file the temporary file will replace.
+
+    Returns:
+        string: The path to the temporary file.
+
+    Raises:
+        OSError: The temporary file could not be created.
+    """
+    temp_fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or os.curdir,
+        prefix='.{0}.'.format(os.path.basename(path)),
+    )
+    os.close(temp_fd)
+    os.chmod(temp_path, file_mode)
+
+    return temp_path
+
+
+def remove_temp_file(temp_path):
+    """Remove a temporary file, if it exists.
+
+    Args:
+        temp_path (string): The path to the temporary file.
+    """
+    try:
+        os.remove(temp_path)
+    except OSError:
+        pass
+
+
+@contextlib.contextmanager
+def open_file(path, mode='w'):
+    """Open a file to write it atomically.
+
+    The file is replaced once the block using it finishes. If the block
+    raises an exception, the file is left as it was.
+
+    Args:
+        path (string): The path to the file.
+        mode (string): The mode to open the file in. Defaults to "w".
+
+    Yields:
+        file: A temporary file to write the file's contents to.
+
+    Raises:
+        IOError: The file could not be written.
+        OSError: The file could not be written.
+    """
+    temp_path = make_temp_file(path)
+    try:
+        with open(temp_path, mode) as temp_file:
+            yield temp_file
+        os.rename(temp_path, path)
+    except BaseException:
+        remove_temp_file(temp_path)
+        raise
@@ -0,0 +1,332 @@
+"""Functionality for running SWMM for many parameter files in parallel.
+
+Each parameter file is run in its own directory within a batch directory, by
+a pool of worker processes. The input template is read once before the
+workers are started, so workers share it instead of reading it for each run.
+Once all runs have finished, the summaries extracted for each run are
+combined into one table for each extraction step, with a column naming the
+run each row came from.
+
+Paths in the configuration are relative to each run's directory, except for
+the input template, the SWMM executable and library, the result cache and
+spin-up hotstart files, which are shared by all runs. The files written by
+each run must be within its directory.
+"""
+
+from __future__ import print_function
+
+import csv
+import glob
+import multiprocessing
+import os
+import traceback
+
+from . import atomic
+from . import config as cfg
+from . import extract
+from . import inject
+from . import run
+from . import spin_up
+
+from .swmm import input as si
+
+default_batch_dir = 'batch'
+"""The default directory to run batches in."""
+
+worker_state = {}
+"""The configuration and input template shared by a pool's workers."""
+
+run_path_sections = [
+    'input_path',
+    'binary_output_path',
+    'report_output_path',
+    'summary_dir',
+]
+"""The sections giving paths of files written by each run."""
+
+
+def find_parameter_files(patterns):
+    """Find the parameter files matching paths or patterns.
+
+    Args:
+        patterns (Iterable): Paths to parameter files, directories containing
+            parameter files, or glob patterns matching parameter files.
+
+    Returns:
+        list: The paths of the parameter files, in the order they were matched
+            and without duplicates.
+    """
+    parameter_paths = []
+    seen_parameter_paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*.json')
+        for parameter_path in sorted(glob.glob(pattern)):
+            absolute_parameter_path = os.path.abspath(parameter_path)
+            if absolute_parameter_path in seen_parameter_paths:
+                continue
+            seen_parameter_paths.add(absolute_parameter_path)
+            parameter_paths.append(parameter_path)
+
+    return parameter_paths
+
+
+def plan_runs(parameter_paths, batch_dir):
+    """Plan a run for each of a set of parameter files.
+
+    Each run is named after its parameter file, with a number appended to
+    the names of files that share a name.
+
+    Args:
+        parameter_paths (Iterable): The paths of the parameter files.
+        batch_dir (string): The directory to create run directories in.
+
+    Returns:
+        list: The "name", absolute "parameters_path" and absolute "run_dir"
+            of each run.
+    """
+    runs = []
+    name_counts = {}
+    for parameter_path in parameter_paths:
+        name = os.path.splitext(os.path.basename(parameter_path))[0]
+        name_counts[name] = name_counts.get(name, 0) + 1
+        if name_counts[name] > 1:
+            name = '{0}-{1}'.format(name, name_counts[name])
+        runs.append({
+            'name': name,
+            'parameters_path': os.path.abspath(parameter_path),
+            'run_dir': os.path.abspath(os.path.join(batch_dir, name)),
+        })
+
+    return runs
+
+
+def init_worker(config, input_template):
+    """Set up a worker process to perform runs.
+
+    Args:
+        config (dict): The configuration to perform runs with.
+        input_template (OrderedDict): The input template to copy for each run.
+    """
+    worker_state['config'] = config
+    worker_state['input_template'] = input_template
+
+
+def perform_batch_run(batch_run):
+    """Perform a run in a worker process.
+
+    Args:
+        batch_run (dict): The run, as planned by plan_runs.
+
+    Returns:
+        dict: The run's "exit_code" and any "error" message.
+    """
+    config = dict(
+        worker_state['config'],
+        input_parameters_path=batch_run['parameters_path'],
+    )
+    input_template = si.copy_sections(
+        worker_state['input_template'],
+        inject.modified_sections,
+        inject.appended_sections,
+    )
+
+    try:
+        if not os.path.isdir(batch_run['run_dir']):
+            os.makedirs(batch_run['run_dir'])
+        os.chdir(batch_run['run_dir'])
+        run.perform_run(config, input_template=input_template)
+    except cfg.ConfigException as e:
+        return {
+            'exit_code': 2,
+            'error': e.msg,
+        }
+    except Exception:
+        return {
+            'exit_code': 1,
+            'error': traceback.format_exc(),
+        }
+
+    return {
+        'exit_code': 0,
+    }
+
+
+def combine_summaries(config, runs, results, batch_dir):
+    """Combine the summaries of successful runs into one table per step.
+
+    Args:
+        config (dict): The configuration the runs were performed with.
+        runs (list): The runs, as planned by plan_runs.
+        results (list): The result of each run.
+        batch_dir (string): The directory to write the combined summaries to.
+
+    Returns:
+        list: The paths of the combined summaries.
+
+    Raises:
+        IOError: A summary could not be read or written.
+    """
+    combined_summary_paths = []
+    for output_path, summary_path in extract.get_summary_paths(
+        config,
+    ).iteritems():
+        combined_summary_path = os.path.join(batch_dir, output_path)
+        with atomic.open_file(
+            combined_summary_path,
+            'wb',
+        ) as combined_summary_file:
+            csv_writer = csv.writer(combined_summary_file)
+            header_written = False
+            for batch_run, result in zip(runs, results):
+                if result['exit_code'] != 0:
+                    continue
+
+                run_summary_path = os.path.join(
+                    batch_run['run_dir'],
+                    summary_path,
+                )
+                with open(run_summary_path, 'rb') as run_summary_file:
+                    csv_reader = csv.reader(run_summary_file)
+                    header = next(csv_reader, None)
+                    if header is None:
+                        continue
+                    if not header_written:
+                        csv_writer.writerow(['run'] + header)
+                        header_written = True
+                    for row in csv_reader:
+                        csv_writer.writerow([batch_run['name']] + row)
+        combined_summary_paths.append(combined_summary_path)
+
+    return combined_summary_paths
+
+
+def perform_batch(config, validate=True):
+    """Perform runs for a batch of parameter files as specified by a config.
+
+    Args:
+        config (dict): The configuration to perform runs with.
+        validate (boolean): Validate the configuration before attempting
+            to use it. Defaults to True.
+
+    Returns:
+        tuple: The runs, as planned by plan_runs, the result of each run and
+            the paths of the combined summaries.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+        IOError: The input template could not be read, or a summary could
+            not be read or written.
+    """
+    if validate:
+        validate_config(config)
+
+    batch_config = config.get('batch', {})
+    batch_dir = config.get('batch_dir', default_batch_dir)
+    parameter_paths = find_parameter_files(batch_config['parameters'])
+    if not parameter_paths:
+        raise cfg.ConfigException(
+            'No parameter files found.',
+            'batch',
+        )
+
+    if not os.path.isdir(batch_dir):
+        os.makedirs(batch_dir)
+
+    # Runs are performed in their own directories, so keep the files shared
+    # by all runs reachable from them.
+    config = cfg.make_shared_paths_absolute(config)
+    input_template = inject.read_input_template(config)
+    cfg.load_json_schema(inject.get_input_parameters_schema_path())
+
+    runs = plan_runs(parameter_paths, batch_dir)
+    pool = multiprocessing.Pool(
+        batch_config.get('processes') or multiprocessing.cpu_count(),
+        init_worker,
+        (config, input_template),
+    )
+    try:
+        results = pool.map(perform_batch_run, runs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    combined_summary_paths = combine_summaries(
+        config,
+        runs,
+        results,
+        batch_dir,
+    )
+
+    return runs, results, combined_summary_paths
+
+
+def validate_config(config):
+    """Validate a configuration for use with this functionality.
+
+    Files used by each run are checked when it runs, since they are found
+    relative to the run's directory.
+
+    Args:
+        config (dict): The configuration to validate.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+    """
+    cfg.validate_required_sections(config, [
+        'batch',
+        'binary_output_path',
+        'input_path',
+        'input_template_path',
+        'swmm_path',
+        'summary_dir',
+        'extract',
+    ], 'run-batch')
+    if 'parameters' not in config['batch']:
+        raise cfg.ConfigException(
+            'Missing required section for run-batch: "parameters"',
+            'batch',
+        )
+    cfg.validate_file_exists(config, 'input_template_path')
+    cfg.validate_executable_path(config, 'swmm_path')
+    if 'spin_up' in config:
+        spin_up.validate_config(config)
+    if 'batch_dir' in config:
+        cfg.validate_dir_exists(config, 'batch_dir')
+    validate_run_paths(config)
+
+
+def validate_run_paths(config):
+    """Validate that the files written by each run are within its directory.
+
+    Files outside a run's directory would be written by every run in the
+    batch.
+
+    Args:
+        config (dict): The configuration to validate.
+
+    Raises:
+        ConfigException: A file would be written outside a run's directory.
+    """
+    run_paths = [
+        (section, config[section])
+        for section in run_path_sections
+        if section in config
+    ]
+    run_paths.append(('lid_summary_path', inject.get_lid_summary_path(config)))
+    run_paths.extend(
+        ('extract', summary_path)
+        for summary_path in extract.get_summary_paths(config).itervalues()
+    )
+
+    for section, run_path in run_paths:
+        run_path = os.path.normpath(run_path)
+        if os.path.isabs(run_path) or (
+            run_path.split(os.sep)[0] == os.pardir
+        ):
+            raise cfg.ConfigException(
+                '"{0}" is not within the directory of each run.'.format(
+                    run_path,
+                ),
+                section,
+            )
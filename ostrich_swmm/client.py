@@ -0,0 +1,105 @@
+"""A lightweight client for running evaluations on an OSTRICH-SWMM server.
+
+This module is meant to be started once per model evaluation, so it only
+imports what it needs from the standard library. It can be used as OSTRICH's
+model executable in place of running OSTRICH-SWMM directly.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import socket
+import sys
+
+default_socket_path = 'ostrich-swmm.sock'
+"""The path of the server socket if not otherwise specified."""
+
+socket_path_env_var = 'OSTRICH_SWMM_SOCKET'
+"""An environment variable that may hold the path of the server socket."""
+
+
+def send_request(socket_path, request):
+    """Send a request to a server and wait for its response.
+
+    Args:
+        socket_path (string): The path of the server socket.
+        request (dict): The request to send.
+
+    Returns:
+        dict: The response from the server.
+
+    Raises:
+        socket.error: The server could not be reached.
+        ValueError: The server's response was not valid.
+    """
+    client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client_socket.connect(socket_path)
+        client_file = client_socket.makefile('rwb')
+        client_file.write(json.dumps(request).encode('utf-8') + b'\n')
+        client_file.flush()
+        response_line = client_file.readline()
+        client_file.close()
+    finally:
+        client_socket.close()
+
+    if not response_line:
+        raise ValueError('Server closed connection without responding.')
+    return json.loads(response_line.decode('utf-8'))
+
+
+def main(argv=None):
+    """Run an evaluation on a server as a script.
+
+    Args:
+        argv: The list of arguments to use. Defaults to sys.argv.
+
+    Returns:
+        int: An exit code for the script.
+    """
+    if argv is None:
+        argv = sys.argv
+
+    parser = argparse.ArgumentParser(
+        description='Run an evaluation on an OSTRICH-SWMM server.',
+    )
+    parser.add_argument(
+        '-s',
+        '--socket',
+        default=os.environ.get(socket_path_env_var, default_socket_path),
+        help=(
+            'The socket of the server to use. Defaults to the value of {0} '
+            'if set, or "{1}" otherwise.'
+        ).format(socket_path_env_var, default_socket_path),
+    )
+    parser.add_argument(
+        '-d',
+        '--directory',
+        default=os.curdir,
+        help='The directory to run the evaluation in.',
+    )
+    args = parser.parse_args(argv[1:])
+
+    try:
+        response = send_request(args.socket, {
+            'directory': os.path.abspath(args.directory),
+        })
+    except (socket.error, ValueError) as e:
+        print(
+            'Could not run evaluation on server at "{0}": {1}'.format(
+                args.socket,
+                e,
+            ),
+            file=sys.stderr,
+        )
+        return 1
+
+    if response.get('error'):
+        print(response['error'], file=sys.stderr)
+    return response['exit_code']
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,6 +15,19 @@ config_schema_path = None
 json_schema_cache = {}
 """A cache of JSON Schemas read from file paths."""
 
+shared_path_sections = [
+    'input_template_path',
+    'cache_dir',
+]
+"""The sections giving paths of files shared by runs in other directories."""
+
+searched_path_sections = [
+    'swmm_path',
+    'swmm_library_path',
+]
+"""The shared sections that are searched for by name if given without a
+directory."""
+
 
 class ConfigException(Exception):
     """A problem with an OSTRICH-SWMM config file."""
@@ -100,6 +113,25 @@ def validate_config(config):
         config['swmm_path'] = 'swmm5'
 
 
+def load_json_schema(schema_path):
+    """Load a JSON Schema from a file, reusing it if already loaded.
+
+    Args:
+        schema_path (string): The path to the JSON Schema file to load.
+
+    Returns:
+        dict: The JSON Schema.
+
+    Raises:
+        IOError: The JSON Schema file could not be opened or read.
+    """
+    if schema_path not in json_schema_cache:
+        with open(schema_path) as schema_file:
+            json_schema_cache[schema_path] = json.load(schema_file)
+
+    return json_schema_cache[schema_path]
+
+
 def validate_against_json_schema(o, schema_path):
     """Validate an object against a JSON Schema.
 
@@ -111,11 +143,7 @@ def validate_against_json_schema(o, schema_path):
         ConfigException: The object or JSON Schema was invalid.
         IOError: The JSON Schema file could not be opened or read.
     """
-    if schema_path not in json_schema_cache:
-        with open(schema_path) as schema_file:
-            json_schema_cache[schema_path] = json.load(schema_file)
-
-    schema = json_schema_cache[schema_path]
+    schema = load_json_schema(schema_path)
     try:
         jsonschema.validate(o, schema)
     except jsonschema.ValidationError as e:
@@ -220,3 +248,39 @@ def validate_required_sections(config, sections, dependent):
                     section,
                 )
             )
+
+
+def make_shared_paths_absolute(config):
+    """Make the paths of files shared by runs in other directories absolute.
+
+    Runs performed in their own directories find the files they write, and
+    their parameters, relative to those directories. Files shared by every
+    run must be found wherever a run is performed, so their paths are made
+    absolute relative to the current working directory.
+
+    Args:
+        config (dict): The configuration to make paths absolute in.
+
+    Returns:
+        dict: A copy of the configuration with the paths of the input
+            template, the SWMM executable and library, the result cache and
+            spin-up hotstart files made absolute.
+    """
+    config = dict(config)
+    for section in shared_path_sections:
+        if section in config:
+            config[section] = os.path.abspath(config[section])
+
+    # The SWMM executable and library are searched for in the system's paths
+    # if named without a directory.
+    for section in searched_path_sections:
+        if os.path.dirname(config.get(section, '')):
+            config[section] = os.path.abspath(config[section])
+
+    if 'hotstart_dir' in config.get('spin_up', {}):
+        config['spin_up'] = dict(
+            config['spin_up'],
+            hotstart_dir=os.path.abspath(config['spin_up']['hotstart_dir']),
+        )
+
+    return config
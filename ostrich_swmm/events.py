@@ -0,0 +1,371 @@
+"""Functionality for detecting flow events in reported time series."""
+
+import numpy as np
+
+notable_event_types = [
+    'first',
+    'last',
+    'max_volume',
+    'max_duration',
+]
+"""The types of notable events found for each object."""
+
+
+def get_max_in_groups(groups, values, num_groups):
+    """Get the position of the first maximum value in each group.
+
+    Args:
+        groups (numpy.ndarray): The sorted group of each value.
+        values (numpy.ndarray): The values to compare within each group.
+        num_groups (int): The number of groups.
+
+    Returns:
+        numpy.ndarray: The position of the first maximum value in each group,
+            or -1 for groups without any values.
+    """
+    group_maxima = np.full(num_groups, -np.inf, np.float64)
+    present_groups, group_starts = np.unique(groups, return_index=True)
+    if len(values):
+        group_maxima[present_groups] = np.maximum.reduceat(
+            values,
+            group_starts,
+        )
+
+    # Of the values matching their group's maximum, take the first per group.
+    positions = np.flatnonzero(values == group_maxima[groups])
+    max_groups, first_indices = np.unique(
+        groups[positions],
+        return_index=True,
+    )
+    max_positions = np.full(num_groups, -1, np.intp)
+    max_positions[max_groups] = positions[first_indices]
+    return max_positions
+
+
+def sum_runs(values, starts, stops):
+    """Sum runs of values, adding each run's values one at a time in order.
+
+    Floating point addition is not associative, so each run is summed
+    strictly in order, as a running total kept one value at a time would be.
+
+    Args:
+        values (numpy.ndarray): The values to sum, with shape (values,).
+        starts (numpy.ndarray): The position of the first value of each run.
+        stops (numpy.ndarray): The position after the last value of each run.
+
+    Returns:
+        numpy.ndarray: The sum of each run.
+    """
+    sums = np.zeros(len(starts), np.float64)
+    if not len(starts):
+        return sums
+
+    # With the longest runs first, the runs still being summed at each offset
+    # are the first few, so every run advances by one value at a time.
+    lengths = stops - starts
+    order = np.argsort(-lengths, kind='mergesort')
+    sorted_starts = starts[order]
+    sorted_lengths = lengths[order]
+    num_runs_longer = np.searchsorted(
+        -sorted_lengths,
+        -np.arange(sorted_lengths[0]),
+        'left',
+    )
+    sorted_sums = np.zeros(len(starts), np.float64)
+    for offset, num_runs in enumerate(num_runs_longer):
+        sorted_sums[:num_runs] += values[sorted_starts[:num_runs] + offset]
+
+    sums[order] = sorted_sums
+    return sums
+
+
+class FlowEventAccumulator(object):
+    """Accumulates flow and flow event statistics for a set of flow series.
+
+    A flow event is a run of consecutive reporting periods in which an
+    object's flow rate is above a threshold. Flows are given one block of
+    periods at a time; events still active at the end of a block are carried
+    into the next, so memory use does not depend on the number of periods.
+
+    Within each block, events are found with array operations across all
+    objects at once. Flow rates are added to each sum one period at a time in
+    period order, so results match accumulating them one period at a time
+    whatever the size of the blocks given.
+    """
+
+    def __init__(
+        self,
+        num_objects,
+        report_interval_seconds,
+        start_date,
+        event_threshold_flow_rate=0,
+    ):
+        """Constructor.
+
+        Args:
+            num_objects (int): The number of objects with flow series.
+            report_interval_seconds (float): The length of a reporting period.
+            start_date (float): The SWMM timestamp at the start of the first
+                reporting period.
+            event_threshold_flow_rate (Number): The flow rate above which an
+                object is considered to have flow. Defaults to 0.
+        """
+        self.num_objects = num_objects
+        self.report_interval_seconds = report_interval_seconds
+        self.event_threshold_flow_rate = event_threshold_flow_rate
+        self.num_periods = 0
+        self.end_date = start_date
+
+        self.total_rate_sums = np.zeros(num_objects, np.float64)
+        self.active_intervals = np.zeros(num_objects, np.uint64)
+        self.num_flow_events = np.zeros(num_objects, np.uint64)
+
+        # The state of each object's current event, if any.
+        self.previously_active = np.zeros(num_objects, np.bool_)
+        self.current_event_starts = np.full(num_objects, -1, np.int64)
+        self.current_event_start_dates = np.zeros(num_objects, np.float64)
+        self.current_event_intervals = np.zeros(num_objects, np.int64)
+        self.current_event_rate_sums = np.zeros(num_objects, np.float64)
+
+        self.notable_events = {
+            event_type: {
+                'start': np.full(num_objects, -1, np.int64),
+                'end': np.full(num_objects, -1, np.int64),
+                'start_date': np.zeros(num_objects, np.float64),
+                'end_date': np.zeros(num_objects, np.float64),
+                'duration': np.zeros(num_objects, np.float64),
+                'volume': np.zeros(num_objects, np.float64),
+            }
+            for event_type
+            in notable_event_types
+        }
+
+    def update(self, flows, period_dates):
+        """Accumulate statistics for the next block of periods.
+
+        Args:
+            flows (numpy.ndarray): The flow rates with shape
+                (periods, objects).
+            period_dates (numpy.ndarray): The SWMM timestamp at the end of
+                each period.
+        """
+        num_periods = flows.shape[0]
+        num_objects = self.num_objects
+        if num_periods == 0:
+            return
+
+        # Lay each object's series end to end. Each row starts with a column
+        # carrying the object's current event into this block and ends with
+        # an inactive padding column, so no event runs between objects.
+        row_length = num_periods + 2
+        values = np.zeros((num_objects, row_length), np.float64)
+        values[:, 0] = self.current_event_rate_sums
+        values[:, 1:-1] = flows.T
+        active = np.zeros(num_objects * row_length + 1, np.int8)
+        row_active = active[1:].reshape(num_objects, row_length)
+        row_active[:, 0] = self.previously_active
+        row_active[:, 1:-1] = values[:, 1:-1] > self.event_threshold_flow_rate
+
+        # Events start where activity rises and stop where it falls.
+        edges = np.diff(active)
+        starts = np.flatnonzero(edges == 1)
+        stops = np.flatnonzero(edges == -1)
+        event_objects = starts // row_length
+        start_columns = starts % row_length
+        stop_columns = stops % row_length
+        continued = start_columns == 0
+
+        # Sum each event's flow rates in order, continuing from any sum
+        # carried into this block.
+        rate_sums = sum_runs(values.ravel(), starts, stops)
+
+        # Convert columns to periods, counting from the first period given.
+        first_period = self.num_periods
+        event_starts = np.where(
+            continued,
+            self.current_event_starts[event_objects],
+            first_period + start_columns - 1,
+        )
+        event_ends = first_period + stop_columns - 2
+
+        # Date events by the dates bounding this block's periods, starting
+        # with the end of the previous block.
+        block_dates = np.empty(num_periods + 1, np.float64)
+        block_dates[0] = self.end_date
+        block_dates[1:] = period_dates
+        event_start_dates = np.where(
+            continued,
+            self.current_event_start_dates[event_objects],
+            block_dates[start_columns - 1],
+        )
+        event_end_dates = block_dates[stop_columns - 1]
+        event_intervals = (
+            stop_columns
+            - start_columns
+            - continued
+            + np.where(
+                continued,
+                self.current_event_intervals[event_objects],
+                0,
+            )
+        )
+
+        # Update the totals for each object.
+        values[:, 0] = self.total_rate_sums
+        row_starts = np.arange(num_objects) * row_length
+        self.total_rate_sums = sum_runs(
+            values.ravel(),
+            row_starts,
+            row_starts + row_length,
+        )
+        self.active_intervals += np.count_nonzero(
+            row_active[:, 1:-1],
+            axis=1,
+        ).astype(np.uint64)
+        self.num_flow_events += np.bincount(
+            event_objects[~continued],
+            minlength=num_objects,
+        ).astype(np.uint64)
+        self.num_periods += num_periods
+        self.end_date = block_dates[-1]
+
+        # Carry events still active at the end of this block into the next.
+        is_open = stop_columns == row_length - 1
+        open_objects = event_objects[is_open]
+        self.previously_active[:] = False
+        self.previously_active[open_objects] = True
+        self.current_event_starts[:] = -1
+        self.current_event_starts[open_objects] = event_starts[is_open]
+        self.current_event_start_dates[open_objects] = (
+            event_start_dates[is_open]
+        )
+        self.current_event_intervals[:] = 0
+        self.current_event_intervals[open_objects] = event_intervals[is_open]
+        self.current_event_rate_sums[:] = 0
+        self.current_event_rate_sums[open_objects] = rate_sums[is_open]
+
+        is_closed = ~is_open
+        self.update_notable_events(
+            event_objects[is_closed],
+            event_starts[is_closed],
+            event_ends[is_closed],
+            event_start_dates[is_closed],
+            event_end_dates[is_closed],
+            event_intervals[is_closed],
+            rate_sums[is_closed],
+        )
+
+    def update_notable_events(
+        self,
+        event_objects,
+        event_starts,
+        event_ends,
+        event_start_dates,
+        event_end_dates,
+        event_intervals,
+        event_rate_sums,
+    ):
+        """Update each object's notable events with newly ended events.
+
+        Args:
+            event_objects (numpy.ndarray): The object of each event, sorted.
+            event_starts (numpy.ndarray): The first period of each event.
+            event_ends (numpy.ndarray): The last period of each event.
+            event_start_dates (numpy.ndarray): The SWMM timestamp at the
+                start of each event.
+            event_end_dates (numpy.ndarray): The SWMM timestamp at the end of
+                each event.
+            event_intervals (numpy.ndarray): The periods in each event.
+            event_rate_sums (numpy.ndarray): The sum of each event's flows.
+        """
+        event_durations = event_intervals * self.report_interval_seconds
+        event_volumes = event_rate_sums * self.report_interval_seconds
+
+        num_objects = self.num_objects
+        object_indices = np.arange(num_objects)
+        has_events = np.bincount(event_objects, minlength=num_objects) > 0
+        positions = {
+            'first': np.searchsorted(event_objects, object_indices),
+            'last': (
+                np.searchsorted(event_objects, object_indices, 'right') - 1
+            ),
+            'max_volume': get_max_in_groups(
+                event_objects,
+                event_volumes,
+                num_objects,
+            ),
+            'max_duration': get_max_in_groups(
+                event_objects,
+                event_durations,
+                num_objects,
+            ),
+        }
+        comparisons = {
+            'max_volume': ('volume', event_volumes),
+            'max_duration': ('duration', event_durations),
+        }
+
+        # Keep the first event found, always replace the last event found and
+        # only replace maximums with strictly greater events.
+        for event_type, notable_events in self.notable_events.iteritems():
+            found = notable_events['start'] >= 0
+            replace = has_events.copy()
+            type_positions = np.where(has_events, positions[event_type], 0)
+            if event_type == 'first':
+                replace &= ~found
+            elif event_type in comparisons:
+                key, event_values = comparisons[event_type]
+                replace[has_events] &= ~found[has_events] | (
+                    event_values[type_positions[has_events]]
+                    > notable_events[key][has_events]
+                )
+
+            replace_positions = type_positions[replace]
+            notable_events['start'][replace] = event_starts[replace_positions]
+            notable_events['end'][replace] = event_ends[replace_positions]
+            notable_events['start_date'][replace] = (
+                event_start_dates[replace_positions]
+            )
+            notable_events['end_date'][replace] = (
+                event_end_dates[replace_positions]
+            )
+            notable_events['duration'][replace] = (
+                event_durations[replace_positions]
+            )
+            notable_events['volume'][replace] = (
+                event_volumes[replace_positions]
+            )
+
+    def finish(self):
+        """Finish accumulating, ending any events still active.
+
+        Returns:
+            dict: Arrays of statistics for each object. "num_flow_events",
+                "total_flow_volume" and "total_flow_duration" hold totals, and
+                "notable_events" maps each notable event type to the "start"
+                and "end" periods, the "start_date" and "end_date" SWMM
+                timestamps, "duration" and "volume" of that event. Objects
+                without flow events have a start and end of -1.
+        """
+        open_objects = np.flatnonzero(self.previously_active)
+        self.update_notable_events(
+            open_objects,
+            self.current_event_starts[open_objects],
+            np.full(len(open_objects), self.num_periods - 1, np.int64),
+            self.current_event_start_dates[open_objects],
+            np.full(len(open_objects), self.end_date, np.float64),
+            self.current_event_intervals[open_objects],
+            self.current_event_rate_sums[open_objects],
+        )
+        self.previously_active[:] = False
+
+        return {
+            'num_flow_events': self.num_flow_events,
+            'total_flow_volume': (
+                self.total_rate_sums * self.report_interval_seconds
+            ),
+            'total_flow_duration': (
+                self.active_intervals * self.report_interval_seconds
+            ),
+            'notable_events': self.notable_events,
+        }
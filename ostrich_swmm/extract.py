@@ -1,14 +1,36 @@
 """Functionality for extracting data from SWMM output."""
 
+from collections import defaultdict
 import csv
 import datetime as dt
 
 import numpy as np
 import os
-import swmmtoolbox.swmmtoolbox as swmmtoolbox
 
 from . import SWMM_EPOCH_DATETIME
+from . import atomic
 from . import config as cfg
+from . import events
+from .swmm import output_reader as sor
+
+flow_variables = {
+    'node': 'Total_inflow',
+    'link': 'Flow_rate',
+}
+"""The reported variable used as the flow of each type of object."""
+
+step_object_keys = {
+    'node': 'nodes',
+    'link': 'links',
+}
+"""The key listing the objects of an extraction step for each step type."""
+
+period_block_size = 1024
+"""The number of reporting periods read from binary output at a time."""
+
+tail_poll_interval = 0.05
+"""The number of seconds to wait for SWMM to write more binary output."""
+
 
 def convert_swmm_ts_to_datetime(swmm_ts):
     """Convert a SWMM timestamp to a Python datetime.
@@ -22,270 +44,423 @@ def convert_swmm_ts_to_datetime(swmm_ts):
     return SWMM_EPOCH_DATETIME + dt.timedelta(days=swmm_ts)
 
 
-def perform_node_extraction(
-    binary_output,
-    node_output_file,
-    node_names,
-    statistics,
-    event_threshold_flow_rate=0,
-):
-    """Perform extraction of node data from a binary output file.
+def convert_datetime_to_swmm_ts(date_time):
+    """Convert a Python datetime to a SWMM timestamp.
 
     Args:
-        binary_output (swmmtoolbox.SwmmExtract): The output to extract from.
-        node_output_file (file): The file to output extracted data to.
-        node_names (Iterable): A list of node names to extract data for.
-        statistics (Iterable): A list of statistics to extract.
-        event_threshold_flow_rate (Number): The flow rate above which a node
-            is considered to have flow. Defaults to 0.
+        date_time (datetime): The datetime to convert, to the second.
+
+    Returns:
+        float: The SWMM timestamp, encoded as SWMM encodes dates in input.
     """
-    # Get the indicies of the relevant data in the binary output.
-    node_type = binary_output.TypeCheck('node')
-    node_total_inflow_variable_index = next(
-        index
-        for index, name
-        in binary_output.varcode[node_type].items()
-        if name == 'Total_inflow'
-    )
+    delta = date_time - SWMM_EPOCH_DATETIME
+    return delta.days + delta.seconds / 86400.0
 
-    # Set up arrays to hold calculations for nodes.
-    num_nodes = len(node_names)
-    nodes_flow_previously_active = np.zeros(num_nodes, np.bool_)
-    nodes_flow_active_intervals = np.zeros(num_nodes, np.uint64)
-    nodes_total_flow_events = np.zeros(num_nodes, np.uint64)
-    nodes_total_flow_rate_sums = np.zeros(num_nodes, np.float64)
-
-    nodes_current_flow_event_start_times = [None] * num_nodes
-    nodes_current_flow_event_rate_sums = np.zeros(num_nodes, np.float64)
-    nodes_current_flow_event_active_intervals = np.zeros(num_nodes, np.uint64)
-    nodes_flow_events = [[] for n in range(num_nodes)]
-
-    # For each period recorded in the output, extract and calculate data.
-    previous_time = binary_output.startdate
-    report_interval_seconds = binary_output.reportinterval.total_seconds()
-    nodes_current_values = np.zeros(num_nodes, np.float64)
-    for period in range(binary_output.nperiods):
-        # Get this period's values for each node.
-        for node_index, node_name in enumerate(node_names):
-            swmm_timestamp, value = binary_output.GetSwmmResults(
-                node_type,
-                node_name,
-                node_total_inflow_variable_index,
-                period,
-            )
-            nodes_current_values[node_index] = value
 
-        # Convert this period's SWMM timestamp to a Python datetime.
-        current_time = convert_swmm_ts_to_datetime(swmm_timestamp)
+def plan_extraction_steps(steps):
+    """Plan a single pass over binary output for a set of extraction steps.
 
-        # Determine the activity states for each node.
-        nodes_flow_currently_active = (
-            nodes_current_values > event_threshold_flow_rate
-        )
-        nodes_flow_newly_active = np.logical_and(
-            nodes_flow_currently_active,
-            np.logical_not(nodes_flow_previously_active)
-        )
-        nodes_flow_newly_inactive = np.logical_and(
-            np.logical_not(nodes_flow_currently_active),
-            nodes_flow_previously_active
-        )
+    Args:
+        steps (Iterable): The extraction steps to plan.
 
-        # Perform calculations involving totals for each node.
-        nodes_flow_active_intervals[nodes_flow_currently_active] += 1
-        nodes_total_flow_events[nodes_flow_newly_active] += 1
-        nodes_total_flow_rate_sums += nodes_current_values
-
-        # Perform calculations involving current events for each node.
-        for node_index, newly_inactive in enumerate(nodes_flow_newly_inactive):
-            if not newly_inactive:
-                continue
-
-            nodes_flow_events[node_index].append({
-                'start': nodes_current_flow_event_start_times[node_index],
-                'end': previous_time,
-                'duration': (
-                    nodes_current_flow_event_active_intervals[node_index]
-                    * report_interval_seconds
-                ),
-                'volume': (
-                    nodes_current_flow_event_rate_sums[node_index]
-                    * report_interval_seconds
-                ),
-            })
-            nodes_current_flow_event_start_times[node_index] = None
-
-        for node_index, newly_active in enumerate(nodes_flow_newly_active):
-            if not newly_active:
-                continue
-
-            nodes_current_flow_event_start_times[node_index] = previous_time
-            nodes_current_flow_event_rate_sums[node_index] = 0
-            nodes_current_flow_event_active_intervals[node_index] = 0
-
-        nodes_current_flow_event_active_intervals[
-            nodes_flow_currently_active
-        ] += 1
-        nodes_current_flow_event_rate_sums += nodes_current_values
-
-        # Move values for the next period.
-        previous_time = current_time
-        nodes_flow_previously_active = nodes_flow_currently_active
-
-    # Cleanup unfinished current events.
-    for node_index, active in enumerate(nodes_flow_currently_active):
-        if not active:
+    Returns:
+        tuple: A dict mapping each object type to the names of every object
+            needed by the enabled steps, and a list of plans for each enabled
+            step. Each plan holds the step and the columns of the step's
+            objects within the needed objects of its type.
+    """
+    object_names = defaultdict(list)
+    object_columns = defaultdict(dict)
+    step_plans = []
+    for step in steps:
+        # If step has been explicitly disabled, skip it.
+        step_enabled = step.get('enabled', True)
+        if not step_enabled:
             continue
 
-        nodes_flow_events[node_index].append({
-            'start': nodes_current_flow_event_start_times[node_index],
-            'end': current_time,
-            'duration': (
-                nodes_current_flow_event_active_intervals[node_index]
-                * report_interval_seconds
-            ),
-            'volume': (
-                nodes_current_flow_event_rate_sums[node_index]
-                * report_interval_seconds
-            ),
+        object_type = step['type']
+        type_object_names = object_names[object_type]
+        type_object_columns = object_columns[object_type]
+        step_columns = []
+        for object_name in step[step_object_keys[object_type]]:
+            if object_name not in type_object_columns:
+                type_object_columns[object_name] = len(type_object_names)
+                type_object_names.append(object_name)
+            step_columns.append(type_object_columns[object_name])
+
+        step_plans.append({
+            'step': step,
+            'object_type': object_type,
+            'columns': np.array(step_columns, np.intp),
         })
 
-    # Calculate post-extraction statistics.
-    nodes_total_flow_volumes = (
-        nodes_total_flow_rate_sums * report_interval_seconds
-    )
-    nodes_total_flow_durations = (
-        nodes_flow_active_intervals * report_interval_seconds
-    )
+    return dict(object_names), step_plans
+
 
-    nodes_notable_events = {
-        'first': [
-            node_events[0]
-            if node_events
-            else None
-            for node_events
-            in nodes_flow_events
-        ],
-        'last': [
-            node_events[-1]
-            if node_events
-            else None
-            for node_events
-            in nodes_flow_events
-        ],
-        'max_volume': [
-            max(node_events, key=lambda event: event['volume'])
-            if node_events
-            else None
-            for node_events
-            in nodes_flow_events
-        ],
-        'max_duration': [
-            max(node_events, key=lambda event: event['duration'])
-            if node_events
-            else None
-            for node_events
-            in nodes_flow_events
-        ],
+def get_summary_paths(config):
+    """Get the paths of the summaries written by extraction.
+
+    Args:
+        config (dict): The configuration of the run.
+
+    Returns:
+        dict: The path of each summary written, by its output path in the
+            extraction steps.
+    """
+    _, step_plans = plan_extraction_steps(config['extract']['steps'])
+    return {
+        step_plan['step']['output_path']: os.path.join(
+            config['summary_dir'],
+            step_plan['step']['output_path'],
+        )
+        for step_plan
+        in step_plans
     }
-    nodes_notable_events_start_strings = {
+
+
+def read_flow_series_blocks(binary_output, object_names, period_block_size):
+    """Read flow series from binary output one block of periods at a time.
+
+    Every block holds the flows of all requested objects and the dates of its
+    periods, so the output is only passed over once no matter how many
+    objects are read.
+
+    Args:
+        binary_output (BinaryOutput): The output to read flows from.
+        object_names (dict): The names of the objects to read for each
+            object type.
+        period_block_size (int): The number of periods in each block.
+
+    Yields:
+        tuple: The index of the first period in the block, a dict mapping
+            each object type to its flow rates with shape
+            (periods in block, objects) and the SWMM timestamp at the end of
+            each period in the block.
+    """
+    period_dates = binary_output.get_period_dates()
+    object_results = {}
+    for object_type, type_object_names in object_names.iteritems():
+        object_results[object_type] = (
+            binary_output.get_results(object_type),
+            binary_output.get_object_indices(object_type, type_object_names),
+            binary_output.get_variable_index(
+                object_type,
+                flow_variables[object_type],
+            ),
+        )
+
+    for block_start in range(0, binary_output.num_periods, period_block_size):
+        block_end = block_start + period_block_size
+        yield block_start, {
+            object_type: results[
+                block_start:block_end,
+                object_indices,
+                flow_variable_index,
+            ].astype(np.float64)
+            for object_type, (results, object_indices, flow_variable_index)
+            in object_results.iteritems()
+        }, period_dates[block_start:block_end].copy()
+
+
+def write_flow_statistics(
+    output_file,
+    statistics,
+    object_type,
+    object_names,
+    flow_statistics,
+):
+    """Write flow statistics for a set of objects to a file as CSV.
+
+    Args:
+        output_file (file): The file to output statistics to.
+        statistics (Iterable): A list of statistics to write.
+        object_type (string): The type of the objects.
+        object_names (Iterable): The names of the objects.
+        flow_statistics (dict): The statistics calculated for the objects.
+    """
+    notable_events = flow_statistics['notable_events']
+    notable_events_start_strings = {
         event_type: [
-            event['start'].isoformat()
-            if event is not None
+            convert_swmm_ts_to_datetime(start_date).isoformat()
+            if start >= 0
             else ''
-            for event
-            in events
+            for start, start_date
+            in zip(type_events['start'], type_events['start_date'])
         ]
-        for event_type, events
-        in nodes_notable_events.iteritems()
+        for event_type, type_events
+        in notable_events.iteritems()
     }
-    nodes_notable_events_end_strings = {
+    notable_events_end_strings = {
         event_type: [
-            event['end'].isoformat()
-            if event is not None
+            convert_swmm_ts_to_datetime(end_date).isoformat()
+            if end >= 0
             else ''
-            for event
-            in events
+            for end, end_date
+            in zip(type_events['end'], type_events['end_date'])
         ]
-        for event_type, events
-        in nodes_notable_events.iteritems()
+        for event_type, type_events
+        in notable_events.iteritems()
     }
-    nodes_notable_events_volumes = {
+    notable_events_volumes = {
         event_type: [
-            event['volume']
-            if event is not None
+            volume
+            if start >= 0
             else 0
-            for event
-            in events
+            for start, volume
+            in zip(type_events['start'], type_events['volume'])
         ]
-        for event_type, events
-        in nodes_notable_events.iteritems()
+        for event_type, type_events
+        in notable_events.iteritems()
     }
-    nodes_notable_events_durations = {
+    notable_events_durations = {
         event_type: [
-            event['duration']
-            if event is not None
+            duration
+            if start >= 0
             else 0
-            for event
-            in events
+            for start, duration
+            in zip(type_events['start'], type_events['duration'])
         ]
-        for event_type, events
-        in nodes_notable_events.iteritems()
+        for event_type, type_events
+        in notable_events.iteritems()
     }
 
     # Write the requested statistics out to the given file as CSV.
-    csv_writer = csv.writer(node_output_file)
+    csv_writer = csv.writer(output_file)
     csv_writer.writerow(statistics)
 
     csv_columns = []
-    node_stat_names_to_columns = {
-        'node_name': node_names,
-        'num_flow_events': nodes_total_flow_events,
-        'total_flow_volume': nodes_total_flow_volumes,
-        'total_flow_duration': nodes_total_flow_durations,
-        'first_flow_start': nodes_notable_events_start_strings['first'],
-        'first_flow_end': nodes_notable_events_end_strings['first'],
-        'first_flow_duration': nodes_notable_events_durations['first'],
-        'first_flow_volume': nodes_notable_events_volumes['first'],
-
-        'last_flow_start': nodes_notable_events_start_strings['last'],
-        'last_flow_end': nodes_notable_events_end_strings['last'],
-        'last_flow_duration': nodes_notable_events_durations['last'],
-        'last_flow_volume': nodes_notable_events_volumes['last'],
-
-        'max_volume_flow_start': nodes_notable_events_start_strings[
-            'max_volume'
-        ],
-        'max_volume_flow_end': nodes_notable_events_end_strings[
-            'max_volume'
-        ],
-        'max_volume_flow_duration': nodes_notable_events_durations[
-            'max_volume'
-        ],
-        'max_volume_flow_volume': nodes_notable_events_volumes[
-            'max_volume'
-        ],
-
-        'max_duration_flow_start': nodes_notable_events_start_strings[
-            'max_duration'
-        ],
-        'max_duration_flow_end': nodes_notable_events_end_strings[
-            'max_duration'
-        ],
-        'max_duration_flow_duration': nodes_notable_events_durations[
-            'max_duration'
-        ],
-        'max_duration_flow_volume': nodes_notable_events_volumes[
-            'max_duration'
-        ],
+    stat_names_to_columns = {
+        '{0}_name'.format(object_type): object_names,
+        'num_flow_events': flow_statistics['num_flow_events'],
+        'total_flow_volume': flow_statistics['total_flow_volume'],
+        'total_flow_duration': flow_statistics['total_flow_duration'],
     }
+    for event_type in events.notable_event_types:
+        stat_names_to_columns.update({
+            '{0}_flow_start'.format(event_type): (
+                notable_events_start_strings[event_type]
+            ),
+            '{0}_flow_end'.format(event_type): (
+                notable_events_end_strings[event_type]
+            ),
+            '{0}_flow_duration'.format(event_type): (
+                notable_events_durations[event_type]
+            ),
+            '{0}_flow_volume'.format(event_type): (
+                notable_events_volumes[event_type]
+            ),
+        })
 
     for statistic in statistics:
-        csv_columns.append(node_stat_names_to_columns[statistic])
+        csv_columns.append(stat_names_to_columns[statistic])
 
     csv_writer.writerows(zip(*csv_columns))
 
 
+def perform_flow_extraction(
+    binary_output,
+    output_file,
+    object_type,
+    object_names,
+    statistics,
+    event_threshold_flow_rate=0,
+):
+    """Perform extraction of flow data from a binary output file.
+
+    Flows are read one block of periods at a time, so memory use does not
+    depend on the number of periods.
+
+    Args:
+        binary_output (BinaryOutput): The output to extract from.
+        output_file (file): The file to output extracted data to.
+        object_type (string): The type of objects to extract data for.
+        object_names (Iterable): A list of object names to extract data for.
+        statistics (Iterable): A list of statistics to extract.
+        event_threshold_flow_rate (Number): The flow rate above which an
+            object is considered to have flow. Defaults to 0.
+    """
+    accumulator = events.FlowEventAccumulator(
+        len(object_names),
+        float(binary_output.report_step),
+        binary_output.start_date,
+        event_threshold_flow_rate,
+    )
+    flow_blocks = read_flow_series_blocks(
+        binary_output,
+        {object_type: object_names},
+        period_block_size,
+    )
+    for _, block_flows, block_dates in flow_blocks:
+        accumulator.update(block_flows[object_type], block_dates)
+
+    write_flow_statistics(
+        output_file,
+        statistics,
+        object_type,
+        object_names,
+        accumulator.finish(),
+    )
+
+
+def perform_node_extraction(
+    binary_output,
+    node_output_file,
+    node_names,
+    statistics,
+    event_threshold_flow_rate=0,
+):
+    """Perform extraction of node data from a binary output file.
+
+    Args:
+        binary_output (BinaryOutput): The output to extract from.
+        node_output_file (file): The file to output extracted data to.
+        node_names (Iterable): A list of node names to extract data for.
+        statistics (Iterable): A list of statistics to extract.
+        event_threshold_flow_rate (Number): The flow rate above which a node
+            is considered to have flow. Defaults to 0.
+    """
+    perform_flow_extraction(
+        binary_output,
+        node_output_file,
+        'node',
+        node_names,
+        statistics,
+        event_threshold_flow_rate,
+    )
+
+
+def perform_link_extraction(
+    binary_output,
+    link_output_file,
+    link_names,
+    statistics,
+    event_threshold_flow_rate=0,
+):
+    """Perform extraction of link data from a binary output file.
+
+    Args:
+        binary_output (BinaryOutput): The output to extract from.
+        link_output_file (file): The file to output extracted data to.
+        link_names (Iterable): A list of link names to extract data for.
+        statistics (Iterable): A list of statistics to extract.
+        event_threshold_flow_rate (Number): The flow rate above which a link
+            is considered to have flow. Defaults to 0.
+    """
+    perform_flow_extraction(
+        binary_output,
+        link_output_file,
+        'link',
+        link_names,
+        statistics,
+        event_threshold_flow_rate,
+    )
+
+
+def accumulate_flow_statistics(
+    step_plans,
+    report_interval_seconds,
+    start_date,
+    flow_blocks,
+):
+    """Stream blocks of flows through the statistics of extraction steps.
+
+    Each step's statistics are updated with its own objects' flows from each
+    block as it arrives, so only one block of periods is held at once.
+
+    Args:
+        step_plans (list): The plans of the steps, as returned by
+            plan_extraction_steps. The statistics calculated for each step are
+            added to its plan as "flow_statistics".
+        report_interval_seconds (float): The number of seconds between
+            reporting periods.
+        start_date (float): The SWMM timestamp at the start of the first
+            reporting period.
+        flow_blocks (Iterable): The blocks of flows and their dates, as
+            yielded by read_flow_series_blocks.
+    """
+    for step_plan in step_plans:
+        step_plan['accumulator'] = events.FlowEventAccumulator(
+            len(step_plan['columns']),
+            report_interval_seconds,
+            start_date,
+            step_plan['step'].get('event_threshold_flow_rate', 0),
+        )
+    for _, block_flows, block_dates in flow_blocks:
+        for step_plan in step_plans:
+            step_plan['accumulator'].update(
+                block_flows[step_plan['object_type']][
+                    :,
+                    step_plan['columns'],
+                ],
+                block_dates,
+            )
+
+    for step_plan in step_plans:
+        step_plan['flow_statistics'] = step_plan.pop('accumulator').finish()
+
+
+def write_step_summaries(config, step_plans):
+    """Write the summary of each extraction step.
+
+    Args:
+        config (dict): The configuration of the extraction.
+        step_plans (list): The plans of the steps, with the statistics
+            calculated by accumulate_flow_statistics.
+    """
+    for step_plan in step_plans:
+        step = step_plan['step']
+        object_type = step_plan['object_type']
+
+        output_path = os.path.join(
+            config['summary_dir'],
+            step['output_path'],
+        )
+        with atomic.open_file(output_path, 'wb') as output_file:
+            write_flow_statistics(
+                output_file,
+                step['statistics'],
+                object_type,
+                step[step_object_keys[object_type]],
+                step_plan['flow_statistics'],
+            )
+
+
+def write_penalty_summaries(config, penalty_value):
+    """Write the summary of each extraction step with a penalty value.
+
+    Every statistic of every object is given the penalty value, except for
+    the names of the objects and the dates of flow events, which are left
+    empty as for objects without flow events.
+
+    Args:
+        config (dict): The configuration of the extraction.
+        penalty_value (float): The value to give every statistic.
+    """
+    _, step_plans = plan_extraction_steps(config['extract']['steps'])
+    for step_plan in step_plans:
+        step = step_plan['step']
+        object_type = step_plan['object_type']
+        object_names = step[step_object_keys[object_type]]
+
+        csv_columns = []
+        for statistic in step['statistics']:
+            if statistic == '{0}_name'.format(object_type):
+                csv_columns.append(object_names)
+            elif statistic.endswith(('_flow_start', '_flow_end')):
+                csv_columns.append([''] * len(object_names))
+            else:
+                csv_columns.append([penalty_value] * len(object_names))
+
+        output_path = os.path.join(
+            config['summary_dir'],
+            step['output_path'],
+        )
+        with atomic.open_file(output_path, 'wb') as output_file:
+            csv_writer = csv.writer(output_file)
+            csv_writer.writerow(step['statistics'])
+            csv_writer.writerows(zip(*csv_columns))
+
+
 def perform_extraction_steps(config, validate=True):
     """Perform the extraction steps specified in a configuration.
 
@@ -300,38 +475,192 @@ def perform_extraction_steps(config, validate=True):
     if validate:
         validate_config(config)
 
-    binary_output = swmmtoolbox.SwmmExtract(
-        config['binary_output_path']
+    object_names, step_plans = plan_extraction_steps(
+        config['extract']['steps'],
     )
 
-    for step in config['extract']['steps']:
-        # If step has been explicitly disabled, skip it.
-        step_enabled = step.get('enabled', True)
-        if not step_enabled:
-            continue
+    binary_output = sor.BinaryOutput(config['binary_output_path'])
+
+    # Stream the flows needed by all steps through each step's statistics in a
+    # single pass over the output.
+    accumulate_flow_statistics(
+        step_plans,
+        float(binary_output.report_step),
+        binary_output.start_date,
+        read_flow_series_blocks(
+            binary_output,
+            object_names,
+            config['extract'].get('period_block_size', period_block_size),
+        ),
+    )
+    binary_output.close()
 
-        if step['type'] == 'node':
-            node_output_path = os.path.join(
-                config['summary_dir'],
-                step['output_path'],
-            )
-            node_output_file = open(node_output_path, 'wb')
+    write_step_summaries(config, step_plans)
 
-            node_extraction_args = {
-                'binary_output': binary_output,
-                'node_output_file': node_output_file,
-                'node_names': step['nodes'],
-                'statistics': step['statistics'],
-            }
 
-            if 'event_threshold_flow_rate' in step:
-                node_extraction_args['event_threshold_flow_rate'] = (
-                    step['event_threshold_flow_rate']
-                )
+def tail_flow_series_blocks(tailed_output, object_names, period_block_size):
+    """Read flow series from binary output as SWMM writes it.
 
-            perform_node_extraction(**node_extraction_args)
+    Args:
+        tailed_output (TailedBinaryOutput): The output to read flows from.
+        object_names (dict): The names of the objects to read for each
+            object type.
+        period_block_size (int): The maximum number of periods in each block.
+
+    Yields:
+        tuple: The index of the first period in the block, a dict mapping
+            each object type to its flow rates with shape
+            (periods in block, objects) and the SWMM timestamp at the end of
+            each period in the block.
+    """
+    object_columns = {}
+    for object_type, type_object_names in object_names.iteritems():
+        object_columns[object_type] = (
+            tailed_output.get_object_indices(object_type, type_object_names),
+            tailed_output.get_variable_index(
+                object_type,
+                flow_variables[object_type],
+            ),
+        )
+
+    period_blocks = tailed_output.read_period_blocks(period_block_size)
+    for block_start, periods, num_periods in period_blocks:
+        yield block_start, {
+            object_type: tailed_output.get_results_view(
+                periods,
+                0,
+                num_periods,
+                object_type,
+            )[
+                :,
+                object_indices,
+                flow_variable_index,
+            ].astype(np.float64)
+            for object_type, (object_indices, flow_variable_index)
+            in object_columns.iteritems()
+        }, tailed_output.get_period_dates_view(periods, 0, num_periods).copy()
+
+
+def perform_tailed_extraction(
+    config,
+    binary_output_path,
+    is_writing,
+    validate=True,
+):
+    """Perform the extraction steps of a configuration while SWMM runs.
+
+    Reporting periods are read and added to each step's statistics as SWMM
+    writes them, so that when SWMM exits only the last periods and the
+    summaries are left to process.
+
+    Args:
+        config: The config to get extraction steps from.
+        binary_output_path (string): The path SWMM is writing binary output
+            to.
+        is_writing (callable): Returns whether SWMM is still running.
+        validate (boolean): Validate the configuration before attempting
+            to use it. Defaults to True.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+        ValueError: SWMM did not write complete binary output.
+    """
+    if validate:
+        validate_config(config, perform_file_checks=False)
+
+    object_names, step_plans = plan_extraction_steps(
+        config['extract']['steps'],
+    )
+
+    with sor.TailedBinaryOutput(
+        binary_output_path,
+        is_writing,
+        config['extract'].get('tail_poll_interval', tail_poll_interval),
+    ) as tailed_output:
+        accumulate_flow_statistics(
+            step_plans,
+            float(tailed_output.report_step),
+            tailed_output.start_date,
+            tail_flow_series_blocks(
+                tailed_output,
+                object_names,
+                config['extract'].get('period_block_size', period_block_size),
+            ),
+        )
+
+    write_step_summaries(config, step_plans)
+
+
+def simulate_flow_series_blocks(simulation, object_names, period_block_size):
+    """Read flow series from a simulation as SWMM runs it in-process.
+
+    Args:
+        simulation (Simulation): The started simulation to read flows from.
+        object_names (dict): The names of the objects to read for each
+            object type.
+        period_block_size (int): The maximum number of periods in each block.
+
+    Yields:
+        tuple: The index of the first period in the block, a dict mapping
+            each object type to its flow rates with shape
+            (periods in block, objects) and the SWMM timestamp at the end of
+            each period in the block.
+    """
+    object_indices = {
+        object_type: simulation.get_object_indices(
+            object_type,
+            type_object_names,
+        )
+        for object_type, type_object_names in object_names.iteritems()
+    }
+
+    period_blocks = simulation.read_period_blocks(
+        object_indices,
+        flow_variables,
+        period_block_size,
+    )
+    for block_start, block_results, block_dates in period_blocks:
+        yield block_start, {
+            object_type: results.astype(np.float64)
+            for object_type, results in block_results.iteritems()
+        }, block_dates
+
+
+def perform_simulated_extraction(config, simulation, validate=True):
+    """Perform the extraction steps of a configuration as SWMM runs in-process.
+
+    Each reporting period's flows are added to each step's statistics as SWMM
+    computes them, so no binary output needs to be written or read.
+
+    Args:
+        config: The config to get extraction steps from.
+        simulation (Simulation): The started simulation to extract from.
+        validate (boolean): Validate the configuration before attempting
+            to use it. Defaults to True.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+        ValueError: SWMM encountered an error.
+    """
+    if validate:
+        validate_config(config, perform_file_checks=False)
+
+    object_names, step_plans = plan_extraction_steps(
+        config['extract']['steps'],
+    )
+
+    accumulate_flow_statistics(
+        step_plans,
+        float(simulation.report_step),
+        simulation.report_start_date,
+        simulate_flow_series_blocks(
+            simulation,
+            object_names,
+            config['extract'].get('period_block_size', period_block_size),
+        ),
+    )
 
-            node_output_file.close()
+    write_step_summaries(config, step_plans)
 
 
 def validate_config(config, perform_file_checks=True):
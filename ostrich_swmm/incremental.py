@@ -0,0 +1,568 @@
+"""Functionality for injecting parameters into SWMM input incrementally.
+
+Search algorithms usually change only a few parameters between consecutive
+evaluations, which changes only a few lines of the input file. When injecting
+incrementally, the parameters and the layout of the input file written for
+them are stored next to the input file. The next injection then only validates
+the parameters that changed, and patches the lines that changed into the
+previous input file instead of writing all of it. LIDs are still placed in
+every subcatchment, as in a full injection, so only writing the input file is
+incremental.
+
+The input file is written in full whenever patching it could not produce
+exactly what writing it in full would, such as when the template or the number
+of lines injected changed, or when a column would have to be realigned.
+"""
+
+from __future__ import print_function
+
+import json
+import logging
+import marshal
+import os
+
+from . import atomic
+from . import config as cfg
+from . import inject
+from . import spin_up
+
+from .swmm import input as si
+from .swmm import input_reader as sir
+from .swmm import input_writer as siw
+
+state_path_suffix = '.state'
+"""The suffix added to an input file's path to get its state's path."""
+
+state_format_version = 2
+"""The version of the structure stored in states."""
+
+
+def get_state_path(input_path):
+    """Get the path of the injection state for an input file.
+
+    Args:
+        input_path (string): The path to the input file.
+
+    Returns:
+        string: The path to the input file's injection state.
+    """
+    return '{0}{1}'.format(input_path, state_path_suffix)
+
+
+def get_file_key(path):
+    """Get a key identifying the contents of a file by its metadata.
+
+    Args:
+        path (string): The path to the file.
+
+    Returns:
+        tuple: The absolute path, size and modification time of the file.
+
+    Raises:
+        OSError: The file could not be found.
+    """
+    file_stat = os.stat(path)
+    return (
+        os.path.abspath(path),
+        file_stat.st_size,
+        file_stat.st_mtime,
+    )
+
+
+def read_state(state_path):
+    """Read an injection state from a file.
+
+    Args:
+        state_path (string): The path to the state file.
+
+    Returns:
+        dict|None: The state, or None if the state file is missing,
+            unreadable or of another version.
+    """
+    try:
+        with open(state_path, 'rb') as state_file:
+            if marshal.load(state_file) != (
+                state_format_version,
+                marshal.version,
+            ):
+                return None
+            return marshal.load(state_file)
+    except (IOError, EOFError, ValueError, TypeError):
+        return None
+
+
+def write_state(state_path, state):
+    """Write an injection state to a file.
+
+    The state is written to a temporary file first and moved into place, so
+    it is never partially written. Failing to write the state is not an
+    error, since the next injection can always write the input file in full.
+
+    Args:
+        state_path (string): The path to the state file.
+        state (dict): The state to write.
+    """
+    try:
+        with atomic.open_file(state_path, 'wb') as state_file:
+            marshal.dump((state_format_version, marshal.version), state_file)
+            marshal.dump(state, state_file)
+    except (IOError, OSError) as e:
+        logging.warning(
+            'Could not store injection state at "{0}": {1}'.format(
+                state_path,
+                e,
+            )
+        )
+
+
+def remove_state(state_path):
+    """Remove an injection state file, if it exists.
+
+    Args:
+        state_path (string): The path to the state file.
+    """
+    try:
+        os.remove(state_path)
+    except OSError:
+        pass
+
+
+def get_changed_parameters(input_parameters, previous_parameters):
+    """Get the parameters that differ from previous parameters.
+
+    Args:
+        input_parameters (dict): The parameters.
+        previous_parameters (dict): The previous parameters.
+
+    Returns:
+        dict: The parameters that differ. Lists of parameters, such as LIDs,
+            only contain the items that differ from the item at the same
+            position in the previous parameters.
+    """
+    changed_parameters = {}
+    for key, value in input_parameters.iteritems():
+        previous_value = previous_parameters.get(key)
+        if isinstance(value, list) and isinstance(previous_value, list):
+            changed_parameters[key] = [
+                item
+                for i, item
+                in enumerate(value)
+                if i >= len(previous_value) or item != previous_value[i]
+            ]
+        elif value != previous_value:
+            changed_parameters[key] = value
+
+    return changed_parameters
+
+
+def get_num_lines(swmm_input):
+    """Get the number of lines in each parsed section of input.
+
+    Args:
+        swmm_input (OrderedDict): The input.
+
+    Returns:
+        dict: The number of lines of each section that has been parsed.
+    """
+    return {
+        section: len(section_content['lines'])
+        for section, section_content
+        in swmm_input.iteritems()
+        if not isinstance(section_content, sir.LazySection)
+        or section_content.is_parsed()
+    }
+
+
+def get_section_lines(swmm_input, sections):
+    """Get a copy of the lines of sections of input.
+
+    Args:
+        swmm_input (OrderedDict): The input.
+        sections (Iterable): The sections to copy the lines of.
+
+    Returns:
+        dict: The values and comment of each line of each section, by section.
+    """
+    return {
+        section: [
+            (tuple(line['values']), line['comment'])
+            for line
+            in swmm_input[section]['lines']
+        ]
+        for section
+        in sections
+        if section in swmm_input
+    }
+
+
+def get_injected_lines(swmm_input, layout, template_lines):
+    """Get the lines injected into formatted parts of input.
+
+    Args:
+        swmm_input (OrderedDict): The input parameters were injected into.
+        layout (dict): The layout the input was written with, by section.
+        template_lines (dict): The lines of sections that injection modifies,
+            by section, as they were before injection.
+
+    Returns:
+        dict: The indices of the lines of each section that were written
+            formatted and were added or changed by injection, by section.
+    """
+    injected_lines = {}
+    for section, section_layout in layout.iteritems():
+        lines = swmm_input[section]['lines']
+        section_template_lines = template_lines.get(section, [])
+        num_template_lines = len(section_template_lines)
+        injected_lines[section] = [
+            i
+            for i
+            in xrange(section_layout['first_line'], len(lines))
+            if i >= num_template_lines
+            or (
+                tuple(lines[i]['values']),
+                lines[i]['comment'],
+            ) != section_template_lines[i]
+        ]
+
+    return injected_lines
+
+
+def get_line_value_strings(section, line, num_columns):
+    """Format a line's values as they are written, padded to a column count.
+
+    Args:
+        section (string): The section of the line.
+        line (dict): The line.
+        num_columns (int): The number of columns the section is written with.
+
+    Returns:
+        list|None: The line's values formatted as strings, or None if the line
+            has more values than the section has columns.
+    """
+    line_values = line['values']
+    if len(line_values) > num_columns:
+        return None
+
+    section_format = si.get_section_format(section)
+    return [
+        siw.format_value_for_write(value, section_format)
+        for value
+        in line_values
+    ] + [''] * (num_columns - len(line_values))
+
+
+def get_injected_line_strings(swmm_input, layout, injected_lines):
+    """Format the injected lines of input as they are written.
+
+    Args:
+        swmm_input (OrderedDict): The input parameters were injected into.
+        layout (dict): The layout the input was written with, by section.
+        injected_lines (dict): The indices of the injected lines, by section.
+
+    Returns:
+        dict|None: The values formatted as strings and the comment of each
+            injected line, by section and index, or None if a line has more
+            values than its section has columns.
+    """
+    injected_line_strings = {}
+    for section, section_injected_lines in injected_lines.iteritems():
+        lines = swmm_input[section]['lines']
+        num_columns = len(layout[section]['widths'])
+        section_line_strings = {}
+        for i in section_injected_lines:
+            line_value_strings = get_line_value_strings(
+                section,
+                lines[i],
+                num_columns,
+            )
+            if line_value_strings is None:
+                return None
+            section_line_strings[i] = (line_value_strings, lines[i]['comment'])
+        injected_line_strings[section] = section_line_strings
+
+    return injected_line_strings
+
+
+def write_input(input_path, swmm_input, template_lines):
+    """Write input in full and get the state needed to patch it later.
+
+    Args:
+        input_path (string): The path to write the input file to.
+        swmm_input (OrderedDict): The input to write.
+        template_lines (dict): The lines of sections that injection modifies,
+            by section, as they were before injection.
+
+    Returns:
+        dict: The "layout" the input was written with, the number of lines
+            ("num_lines") in each section and the formatted strings of the
+            "injected_lines" of each section.
+
+    Raises:
+        IOError: An error occurred during writing.
+        OSError: An error occurred during writing.
+    """
+    layout = {}
+    with atomic.open_file(input_path) as input_file:
+        siw.write(swmm_input, input_file, layout)
+
+    injected_lines = get_injected_lines(swmm_input, layout, template_lines)
+    return {
+        'layout': layout,
+        'num_lines': get_num_lines(swmm_input),
+        'injected_lines': get_injected_line_strings(
+            swmm_input,
+            layout,
+            injected_lines,
+        ),
+    }
+
+
+def patch_input(input_path, swmm_input, template_lines, state):
+    """Patch the lines that changed since the previous input into its file.
+
+    Args:
+        input_path (string): The path to the previous input file.
+        swmm_input (OrderedDict): The input to patch into the file.
+        template_lines (dict): The lines of sections that injection modifies,
+            by section, as they were before injection.
+        state (dict): The state of the previous input, as returned by
+            write_input.
+
+    Returns:
+        dict|None: The state of the patched input, or None if the file could
+            not be patched into exactly the input, in which case the file is
+            left unchanged.
+
+    Raises:
+        IOError: An error occurred during reading or writing.
+        OSError: An error occurred during writing.
+    """
+    layout = state['layout']
+    if get_num_lines(swmm_input) != state['num_lines']:
+        return None
+
+    injected_lines = get_injected_lines(swmm_input, layout, template_lines)
+    if any(
+        sorted(section_injected_lines) != sorted(
+            state['injected_lines'][section]
+        )
+        for section, section_injected_lines
+        in injected_lines.iteritems()
+    ):
+        return None
+
+    injected_line_strings = get_injected_line_strings(
+        swmm_input,
+        layout,
+        injected_lines,
+    )
+    if injected_line_strings is None:
+        return None
+
+    # Find the lines that changed, updating the counts of values of each
+    # length in each column to check that no column has to be realigned.
+    replacements = []
+    new_layout = {}
+    for section, section_line_strings in injected_line_strings.iteritems():
+        section_layout = layout[section]
+        previous_line_strings = state['injected_lines'][section]
+        length_counts = [
+            dict(column_length_counts)
+            for column_length_counts
+            in section_layout['length_counts']
+        ]
+        changed_lines = []
+        for i, line_strings in section_line_strings.iteritems():
+            previous_line_value_strings = previous_line_strings[i][0]
+            if line_strings == previous_line_strings[i]:
+                continue
+            changed_lines.append(i)
+
+            for column_length_counts, value, previous_value in zip(
+                length_counts,
+                line_strings[0],
+                previous_line_value_strings,
+            ):
+                if len(value) == len(previous_value):
+                    continue
+                column_length_counts[len(previous_value)] -= 1
+                if not column_length_counts[len(previous_value)]:
+                    del column_length_counts[len(previous_value)]
+                column_length_counts[len(value)] = (
+                    column_length_counts.get(len(value), 0) + 1
+                )
+
+        widths = siw.get_pretty_column_widths([
+            max(column_length_counts)
+            for column_length_counts
+            in length_counts
+        ])
+        if widths != section_layout['widths']:
+            return None
+
+        offsets = section_layout['offsets']
+        first_line = section_layout['first_line']
+        for i in changed_lines:
+            line_value_strings, line_comment = section_line_strings[i]
+            replacements.append((
+                offsets[i - first_line],
+                offsets[i - first_line + 1],
+                '{0}\n'.format(siw.format_values_for_write(
+                    line_value_strings,
+                    widths,
+                    line_comment,
+                )),
+            ))
+
+        new_layout[section] = dict(
+            section_layout,
+            length_counts=length_counts,
+        )
+
+    with open(input_path, 'rb') as input_file:
+        previous_input = input_file.read()
+
+    # Splice the changed lines into the previous input, shifting the offsets
+    # of the lines after each changed line by the change in length.
+    replacements.sort()
+    input_parts = []
+    shifts = []
+    position = 0
+    shift = 0
+    for start, end, line_str in replacements:
+        input_parts.append(previous_input[position:start])
+        input_parts.append(line_str)
+        position = end
+        shift += len(line_str) - (end - start)
+        shifts.append((end, shift))
+    input_parts.append(previous_input[position:])
+
+    for section_layout in new_layout.itervalues():
+        offsets = []
+        offset_shift = 0
+        shift_index = 0
+        for offset in section_layout['offsets']:
+            while (
+                shift_index < len(shifts)
+                and shifts[shift_index][0] <= offset
+            ):
+                offset_shift = shifts[shift_index][1]
+                shift_index += 1
+            offsets.append(offset + offset_shift)
+        section_layout['offsets'] = offsets
+
+    with atomic.open_file(input_path, 'wb') as input_file:
+        input_file.write(b''.join(input_parts))
+
+    return {
+        'layout': new_layout,
+        'num_lines': state['num_lines'],
+        'injected_lines': injected_line_strings,
+    }
+
+
+def perform_injection(config, validate=True, input_template=None):
+    """Perform the injection as specified in a configuration.
+
+    Injects incrementally if enabled in the configuration, and otherwise
+    performs a full injection.
+
+    Args:
+        config: The config to get injection configuration from.
+        validate (boolean): Validate the configuration before attempting
+            to use it. Defaults to True.
+        input_template (OrderedDict): An already read input template to inject
+            parameters into, which will be modified. Defaults to reading the
+            template specified in the configuration.
+
+    Returns:
+        dict: The injected parameters, as adjusted by injection.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+        IOError: An error occurred during reading or writing.
+        OSError: An error occurred during writing.
+    """
+    if not config.get('inject', {}).get('incremental', False):
+        return inject.perform_injection(config, validate, input_template)
+
+    if validate:
+        inject.validate_config(config)
+
+    if input_template is None:
+        input_template = inject.read_input_template(config)
+
+    with open(config['input_parameters_path']) as input_parameters_file:
+        input_parameters = json.load(input_parameters_file)
+
+    input_path = config['input_path']
+    state_path = get_state_path(input_path)
+    template_key = [
+        get_file_key(config['input_template_path']),
+        inject.get_report_objects(config),
+        (
+            spin_up.get_hotstart_path(config, input_parameters)
+            if 'spin_up' in config
+            else None
+        ),
+    ]
+
+    # Only use the previous state if it was stored for the same template,
+    # reporting the same objects and starting from the same hotstart file, and
+    # the input file has not changed since.
+    state = read_state(state_path)
+    if state is not None and (
+        state['template_key'] != template_key
+        or not os.path.isfile(input_path)
+        or state['input_key'] != get_file_key(input_path)
+    ):
+        state = None
+
+    # Parameters that did not change were already validated.
+    if state is None:
+        parameters_to_validate = input_parameters
+    else:
+        parameters_to_validate = get_changed_parameters(
+            input_parameters,
+            state['parameters'],
+        )
+    cfg.validate_against_json_schema(
+        parameters_to_validate,
+        inject.get_input_parameters_schema_path(),
+    )
+
+    # Injection modifies its parameters, so keep a copy to compare against.
+    parameters = json.loads(json.dumps(input_parameters))
+    template_lines = get_section_lines(
+        input_template,
+        inject.modified_sections,
+    )
+    inject.inject_configured_parameters(
+        config,
+        input_parameters,
+        input_template,
+        validate=False,
+    )
+
+    # Stop using the previous state until the input file matches a new one.
+    remove_state(state_path)
+
+    input_state = None
+    if state is not None:
+        input_state = patch_input(
+            input_path,
+            input_template,
+            template_lines,
+            state['input'],
+        )
+    if input_state is None:
+        input_state = write_input(input_path, input_template, template_lines)
+
+    write_state(state_path, {
+        'template_key': template_key,
+        'input_key': get_file_key(input_path),
+        'parameters': parameters,
+        'input': input_state,
+    })
+
+    return input_parameters
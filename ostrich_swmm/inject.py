@@ -4,26 +4,63 @@ from collections import Counter, defaultdict
 import json
 import logging
 import csv
+import os
 
 import shapely.geometry
+import shapely.prepared
+import shapely.strtree
 
 from math import floor
 
+from . import atomic
 from . import config as cfg
+from . import extract
+from . import polygon_cache
+from . import spin_up
 from . import units
 
 from .swmm import input as si
+from .swmm import input_cache as sic
 from .swmm import input_reader as sir
 from .swmm import input_writer as siw
 
 #import LID addition codes
 from . import LID
-from . import RB
-from . import PP
+from . import placement
 
 input_parameters_schema_path = None
 """The path to the JSON Schema used to validate input parameters."""
 
+default_lid_summary_path = 'num_lid.csv'
+"""The default path of the LID summary, relative to the summary directory."""
+
+modified_sections = [
+    'SUBCATCHMENTS',
+]
+"""The sections of an input template with lines modified by injection."""
+
+appended_sections = [
+    'SUBAREAS',
+    'LID_USAGE',
+]
+"""The sections of an input template only added to by injection."""
+
+parsed_sections = [
+    'OPTIONS',
+    'LID_CONTROLS',
+] + modified_sections + appended_sections
+"""The sections of an input template parsed when injecting parameters."""
+
+report_object_options = [
+    ('subcatchment', 'SUBCATCHMENTS'),
+    ('node', 'NODES'),
+    ('link', 'LINKS'),
+]
+"""The REPORT section option listing the reported objects of each type."""
+
+report_names_per_line = 10
+"""The number of object names listed on each line of the REPORT section."""
+
 
 def extract_subcatchment_polygons(swmm_input):
     """Extract subcatchment polygons from SWMM input.
@@ -72,16 +109,7 @@ def get_subcatchment_definition(swmm_input, sc_name):
         list|None: The input file definition for the subcatchment or None if
             not found.
     """
-    if 'SUBCATCHMENTS' not in swmm_input:
-        return None
-
-    sc_name_index = si.data_indices['SUBCATCHMENTS']['Name']
-    return next((
-        line['values']
-        for line
-        in swmm_input['SUBCATCHMENTS']['lines']
-        if line['values'] and line['values'][sc_name_index] == sc_name
-    ), None)
+    return si.get_subcatchment_index(swmm_input).get(sc_name)
 
 
 def get_subcatchment_from_map_coords(coordinates, subcatchments):
@@ -110,17 +138,188 @@ def get_subcatchment_from_map_coords(coordinates, subcatchments):
     )
 
 
-def inject_parameters_into_input(input_parameters, input_template):
-    """Inject parameters into a SWMM input template.
+def index_subcatchment_polygons(subcatchments):
+    """Build a spatial index of subcatchment polygons.
 
     Args:
-        input_parameters (dict): The parameters to inject.
-        input_template (dict): The input to inject parameters into.
+        subcatchments (dict): A mapping of subcatchments to Shapely Polygons.
+
+    Returns:
+        dict: The spatial index. Keys are "subcatchments", the names of the
+            subcatchments in the order they were given; "polygons", their
+            prepared polygons in the same order; "positions", a mapping of the
+            identity of each polygon to its position in that order; and
+            "tree", an STRtree of the polygons.
+    """
+    subcatchment_names = []
+    polygons = []
+    for subcatchment, polygon in subcatchments.iteritems():
+        subcatchment_names.append(subcatchment)
+        polygons.append(polygon)
+
+    return {
+        'subcatchments': subcatchment_names,
+        'polygons': [
+            shapely.prepared.prep(polygon)
+            for polygon
+            in polygons
+        ],
+        'positions': {
+            id(polygon): position
+            for position, polygon
+            in enumerate(polygons)
+        },
+        'tree': shapely.strtree.STRtree(polygons),
+    }
+
+
+def query_subcatchment_polygon_index(sc_polygon_index, point):
+    """Find the polygons in a spatial index with bounds containing a point.
+
+    Args:
+        sc_polygon_index (dict): A spatial index of subcatchment polygons, as
+            built by index_subcatchment_polygons or read from a polygon cache.
+        point (Point): The point to find polygons for.
+
+    Returns:
+        Iterable: The positions of the polygons in the index, in order.
+    """
+    positions = sc_polygon_index['positions']
+    return sorted(
+        positions[id(geometry)]
+        for geometry
+        in sc_polygon_index['tree'].query(point)
+    )
+
+
+def get_subcatchments_from_map_coords(coordinates_list, sc_polygon_index):
+    """Get the subcatchments each of a list of map coordinates fall within.
+
+    Only polygons with bounds containing a point are checked for whether they
+    contain it. If more than one polygon contains a point, the one given first
+    when the index was built is used, as with get_subcatchment_from_map_coords.
+
+    Args:
+        coordinates_list (list): Sets of map coordinates. (Keys are x, y.)
+        sc_polygon_index (dict): A spatial index of subcatchment polygons, as
+            built by index_subcatchment_polygons or read from a polygon cache.
+
+    Returns:
+        list: The subcatchment each point falls within.
 
     Raises:
-        ConfigException: The configuration is invalid.
+        ValueError: A point did not fall within any given subcatchments.
+    """
+    subcatchment_names = sc_polygon_index['subcatchments']
+    polygons = sc_polygon_index['polygons']
+
+    found_subcatchments = []
+    for coordinates in coordinates_list:
+        point = shapely.geometry.Point(coordinates['x'], coordinates['y'])
+        for position in query_subcatchment_polygon_index(
+            sc_polygon_index,
+            point,
+        ):
+            polygon = polygons[position]
+            if polygon is None:
+                polygon = polygon_cache.load_polygon(
+                    sc_polygon_index,
+                    position,
+                )
+            if polygon.contains(point):
+                found_subcatchments.append(subcatchment_names[position])
+                break
+        else:
+            raise ValueError(
+                "Coordinates ({0}, {1}) not found in subcatchments.".format(
+                    point.x,
+                    point.y,
+                )
+            )
+
+    return found_subcatchments
+
+
+def get_subcatchment_polygon_index(swmm_input, input_path=None):
+    """Get a spatial index of the subcatchment polygons in SWMM input.
+
+    Args:
+        swmm_input (dict): The input to index subcatchment polygons of.
+        input_path (string): The path of the file the input was read from,
+            next to which polygons are cached. Defaults to not caching them.
+
     Returns:
-        excess_rb for input into extract csv
+        dict: A spatial index of the subcatchment polygons. If the polygons
+            are cached, the index is kept in memory and shared with later
+            callers for the same input file.
+    """
+    if input_path is None:
+        return index_subcatchment_polygons(
+            extract_subcatchment_polygons(swmm_input),
+        )
+
+    cache_key = polygon_cache.get_cache_key(input_path)
+    sc_polygon_index = polygon_cache.read_memory_cache(input_path, cache_key)
+    if sc_polygon_index is not None:
+        return sc_polygon_index
+
+    cache_path = polygon_cache.get_cache_path(input_path)
+    sc_polygon_index = polygon_cache.read_cache(cache_path, cache_key)
+    if sc_polygon_index is None:
+        subcatchments = extract_subcatchment_polygons(swmm_input)
+        polygon_cache.try_write_cache(cache_path, cache_key, subcatchments)
+        sc_polygon_index = index_subcatchment_polygons(subcatchments)
+    polygon_cache.write_memory_cache(input_path, cache_key, sc_polygon_index)
+
+    return sc_polygon_index
+
+
+def resolve_map_locations(input_parameters, swmm_input, input_path=None):
+    """Find the subcatchments of locations given in map coordinates.
+
+    The subcatchment containing each LID location, LID drain point and roof
+    location given in map coordinates is stored in it as its "subcatchment".
+    The subcatchment polygons are only extracted and indexed if there are
+    locations given in map coordinates, and all of them are found at once.
+
+    Args:
+        input_parameters (dict): The parameters with locations to resolve.
+        swmm_input (dict): The input to get subcatchment polygons from.
+        input_path (string): The path of the file the input was read from,
+            next to which polygons are cached. Defaults to not caching them.
+
+    Raises:
+        ValueError: A location did not fall within any subcatchments.
+    """
+    map_locations = []
+    for lid in input_parameters.get('lids', []):
+        map_locations.append(lid['location'])
+        if 'drainTo' in lid:
+            map_locations.append(lid['drainTo'])
+    for roof in input_parameters.get('roofs', []):
+        map_locations.append(roof['location'])
+    map_locations = [
+        location
+        for location
+        in map_locations
+        if 'map' in location
+    ]
+    if not map_locations:
+        return
+
+    subcatchments = get_subcatchments_from_map_coords(
+        [location['map'] for location in map_locations],
+        get_subcatchment_polygon_index(swmm_input, input_path),
+    )
+    for location, subcatchment in zip(map_locations, subcatchments):
+        location['subcatchment'] = subcatchment
+
+
+def get_input_parameters_schema_path():
+    """Get the path to the JSON Schema used to validate input parameters.
+
+    Returns:
+        string: The path to the JSON Schema file.
     """
     global input_parameters_schema_path
     if input_parameters_schema_path is None:
@@ -128,52 +327,76 @@ def inject_parameters_into_input(input_parameters, input_template):
             'parameters.schema.json',
         )
 
+    return input_parameters_schema_path
+
+
+def inject_parameters_into_input(
+    input_parameters,
+    input_template,
+    input_template_path=None,
+    validate=True,
+    lid_summary_path=default_lid_summary_path,
+    compact=False,
+):
+    """Inject parameters into a SWMM input template.
+
+    If compacting, the objects of LIDs that do not change simulated results
+    are removed from the input once the LIDs are placed, and LIDs that differ
+    only in their numbers of units are merged (see placement.compact_lids).
+
+    Args:
+        input_parameters (dict): The parameters to inject.
+        input_template (dict): The input to inject parameters into.
+        input_template_path (string): The path of the file the input template
+            was read from, next to which its subcatchment polygons are cached.
+            Defaults to not caching them.
+        validate (boolean): Validate the parameters against the JSON Schema
+            before injecting them. Defaults to True.
+        lid_summary_path (string): The path to write the number of units of
+            each LID in each subcatchment to. Defaults to "num_lid.csv" in the
+            working directory.
+        compact (boolean): Remove and merge the objects of LIDs that do not
+            change simulated results. Defaults to False.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+    Returns:
+        excess_rb for input into extract csv
+    """
     # Validate the input parameters against the JSON Schema.
-    cfg.validate_against_json_schema(
-        input_parameters,
-        input_parameters_schema_path,
-    )
+    if validate:
+        cfg.validate_against_json_schema(
+            input_parameters,
+            get_input_parameters_schema_path(),
+        )
 
     # Get useful input options.
     input_unit_system = si.get_unit_system(input_template)
 
-    # Create a variable to hold the subcatchment polygons, but wait to populate
-    # it until needed.
-    sc_polygons = None
+    # Convert locations given in map coordinates to subcatchments.
+    resolve_map_locations(
+        input_parameters,
+        input_template,
+        input_template_path,
+    )
 
     # For each LID in the input parameters...
     lids = input_parameters.get("lids", [])
     lid_counter = Counter()
     #add in rooftop connections
     roofs = input_parameters.get("roofs", [])
-    count = -1
     rbcount = -1
 
     excess_lid =[]
     nlid = []
     sc_names_list = []
+    sc_names_seen = set()
     all_lid_types = []
+    placements = []
+    lid_placements = []
+    usage_lines = []
 
     for lid in lids:
-        count = count + 1
-        # If the location is given in map coordinates, convert to subcatchment.
-        if 'map' in lid['location']:
-            if sc_polygons is None:
-                sc_polygons = extract_subcatchment_polygons(input_template)
-            lid['location']['subcatchment'] = get_subcatchment_from_map_coords(
-                lid['location']['map'],
-                sc_polygons,
-            )
-
-        # If the drain point is given in map coordinates, convert to subcatch.
-        if 'drainTo' in lid and 'map' in lid['drainTo']:
-            if sc_polygons is None:
-                sc_polygons = extract_subcatchment_polygons(input_template)
-            lid['drainTo']['subcatchment'] = get_subcatchment_from_map_coords(
-                lid['drainTo']['map'],
-                sc_polygons,
-            )
-
         # Get the LID's type.
         lid_type = lid['type']
         if lid_type not in all_lid_types:
@@ -203,27 +426,29 @@ def inject_parameters_into_input(input_parameters, input_template):
         # Adjust the LID's subcatchment as necessary.
         lid_type_type_index = si.data_indices['LID_CONTROLS']['Type']['Type']
         lid_type_type = lid_type_definition[0]['values'][lid_type_type_index]
-        if lid['location']['subcatchment'] not in sc_names_list:
+        if lid['location']['subcatchment'] not in sc_names_seen:
+            sc_names_seen.add(lid['location']['subcatchment'])
             sc_names_list.append(lid['location']['subcatchment'])
         
         # If the LID is a rain barrel...
         if lid_type_type == 'RB':
             rbcount = rbcount + 1
-            roof_sc = RB.add_roofs(input_template,roofs, rbcount)
-            rb_values = RB.add_rb(input_template, input_unit_system, lid, lid_id, roofs, roof_sc, rbcount)
-            lid = rb_values[0]
-            excess = rb_values[1]
-            lid_base_sc = rb_values[2]
-            excess_lid.append(excess)
-            lid_num_units=lid['number']
+            lid_placement = placement.add_rb(
+                placements,
+                input_template,
+                lid,
+                lid_id,
+                roofs,
+                rbcount,
+            )
         #permeable pavement
         elif lid_type_type == 'PP':
-            pp_values = PP.add_pp(input_template, input_unit_system, lid, lid_id, count)
-            lid = pp_values[0]
-            excess = pp_values[1]
-            lid_base_sc = pp_values[2]
-            excess_lid.append(excess)
-            lid_num_units=lid['number']
+            lid_placement = placement.add_pp(
+                placements,
+                input_template,
+                lid,
+                lid_id,
+            )
 ##        #rain garden
 ##        elif lid_type_type == 'RG':
 ##        #vegetative swale
@@ -237,6 +462,7 @@ def inject_parameters_into_input(input_parameters, input_template):
 ##        #trees?
 
         else:
+            lid_placement = None
             logging.warning(
                 (
                     'LID type "{0}" is not directly supported by this module. '
@@ -244,6 +470,15 @@ def inject_parameters_into_input(input_parameters, input_template):
                     'subcatchments, may be necessary.'
                 ).format(lid_type_type)
             )
+        lid_placements.append(lid_placement)
+
+    # Compute the areas of all the LIDs' subcatchments at once.
+    placement.place_lids(placements, input_unit_system)
+
+    for lid, lid_placement in zip(lids, lid_placements):
+        if lid_placement is not None:
+            excess_lid.append(lid_placement['excess'])
+            lid_num_units = lid['number']
 
         # Add the LID to the input.
         lid_drain_to = ''
@@ -274,12 +509,28 @@ def inject_parameters_into_input(input_parameters, input_template):
                 'comment': None,
             }
 
-        input_template['LID_USAGE']['lines'].append({
+        usage_line = {
             'values': lid_values,
             'comment': None,
-        })
+        }
+        input_template['LID_USAGE']['lines'].append(usage_line)
+        if lid_placement is not None:
+            usage_lines.append(usage_line)
         
-    with open('num_lid.csv', 'wb') as outcsv:
+    if compact:
+        placement.compact_lids(
+            input_template,
+            [
+                lid_placement
+                for lid_placement
+                in lid_placements
+                if lid_placement is not None
+            ],
+            usage_lines,
+            input_unit_system,
+        )
+
+    with atomic.open_file(lid_summary_path, 'wb') as outcsv:
         writer = csv.writer(outcsv)
         header = ["Subcat_Name"]
         nlid_col = []
@@ -306,32 +557,326 @@ def inject_parameters_into_input(input_parameters, input_template):
         
 
 
-def perform_injection(config, validate=True):
+def get_lid_summary_path(config):
+    """Get the path to write the LID summary to from a configuration.
+
+    Args:
+        config: The config to get the path from.
+
+    Returns:
+        string: The path of the LID summary.
+    """
+    return os.path.join(
+        config.get('summary_dir', os.curdir),
+        config.get('lid_summary_path', default_lid_summary_path),
+    )
+
+
+def get_report_objects(config):
+    """Get the objects to restrict the results reported by SWMM to.
+
+    Unless disabled in the configuration, only the objects read by the
+    enabled extraction steps are reported.
+
+    Args:
+        config: The config to get the extraction steps from.
+
+    Returns:
+        dict|None: The names of the objects to report for each object type, or
+            None if all objects are reported as set in the input template.
+    """
+    if (
+        'extract' not in config
+        or not config.get('inject', {}).get('restrict_report', True)
+    ):
+        return None
+
+    object_names, _ = extract.plan_extraction_steps(
+        config['extract']['steps'],
+    )
+    return {
+        object_type: object_names.get(object_type, [])
+        for object_type, _
+        in report_object_options
+    }
+
+
+def restrict_report(swmm_input, report_objects):
+    """Restrict the results reported in SWMM input to a set of objects.
+
+    The options of the REPORT section listing reported objects are replaced,
+    while its other options are kept. Objects of types without any objects to
+    report are not reported at all.
+
+    Args:
+        swmm_input (dict): The input to restrict the results of.
+        report_objects (dict): The names of the objects to report for each
+            object type.
+    """
+    report_options = set(option for _, option in report_object_options)
+    report_comment = None
+    report_lines = []
+    if 'REPORT' in swmm_input:
+        report_comment = swmm_input['REPORT']['comment']
+        report_lines = [
+            line
+            for line
+            in swmm_input['REPORT']['lines']
+            if not line['values']
+            or line['values'][0].upper() not in report_options
+        ]
+
+    # Blank lines ending the section are written after it anyway.
+    while report_lines and report_lines[-1] == {
+        'values': [],
+        'comment': None,
+    }:
+        report_lines.pop()
+
+    for object_type, option in report_object_options:
+        names = report_objects[object_type]
+        if not names:
+            report_lines.append({
+                'values': [option, 'NONE'],
+                'comment': None,
+            })
+        for line_start in xrange(0, len(names), report_names_per_line):
+            report_lines.append({
+                'values': (
+                    [option]
+                    + names[line_start:line_start + report_names_per_line]
+                ),
+                'comment': None,
+            })
+
+    swmm_input['REPORT'] = {
+        'lines': report_lines,
+        'comment': report_comment,
+    }
+
+
+def read_input_template(config):
+    """Read the SWMM input template specified in a configuration.
+
+    Unless disabled in the configuration, the parsed template is cached.
+    Only the sections changed by injection are copied from the template, and
+    they are flagged so that unchanged parts of the template are written out
+    as they were read.
+
+    Unless disabled in the configuration, the template's REPORT section is
+    replaced so that SWMM only reports results for the objects extracted
+    from, which keeps binary output small.
+
+    Args:
+        config: The config to get the input template path from.
+
+    Returns:
+        OrderedDict: The input template, ready for parameters to be injected.
+
+    Raises:
+        IOError: An error occurred during reading.
+    """
+    input_template_path = config['input_template_path']
+    if config.get('inject', {}).get('template_cache', True):
+        input_template = sic.read(input_template_path, parsed_sections)
+    else:
+        with open(input_template_path) as input_template_file:
+            input_template = sir.read(input_template_file)
+
+    input_template = si.copy_sections(
+        input_template,
+        modified_sections,
+        appended_sections,
+    )
+
+    report_objects = get_report_objects(config)
+    if report_objects is not None:
+        restrict_report(input_template, report_objects)
+
+    return input_template
+
+
+def start_from_spin_up(
+    config,
+    input_parameters,
+    input_template,
+    input_template_path=None,
+):
+    """Start input from the end of the spin-up configured for its parameters.
+
+    The spin-up is simulated first, unless it already was. Parameters must
+    not have been injected into the input yet.
+
+    Args:
+        config (dict): The configuration to get the spin-up from.
+        input_parameters (dict): The parameters that will be injected.
+        input_template (dict): The input that the parameters will be injected
+            into.
+        input_template_path (string): The path of the file the input template
+            was read from, next to which its subcatchment polygons are cached.
+            Defaults to not caching them.
+
+    Returns:
+        string: The path to the hotstart file the input starts from.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+        IOError: An error occurred during reading or writing.
+        OSError: An error occurred during writing.
+        ValueError: The spin-up does not end during the simulation, or SWMM
+            failed to simulate it.
+    """
+    hotstart_path = spin_up.get_hotstart_path(config, input_parameters)
+    if not os.path.isfile(hotstart_path):
+        spin_up_input = si.copy_sections(
+            input_template,
+            modified_sections,
+            appended_sections,
+        )
+        inject_parameters_into_input(
+            spin_up.get_spin_up_parameters(input_parameters),
+            spin_up_input,
+            input_template_path,
+            lid_summary_path=spin_up.get_spin_up_path(
+                hotstart_path,
+                spin_up.lid_summary_path_suffix,
+            ),
+        )
+        spin_up.perform_spin_up(config, spin_up_input, hotstart_path)
+
+    spin_up.use_hotstart(input_template, config, hotstart_path)
+
+    return hotstart_path
+
+
+def inject_configured_parameters(
+    config,
+    input_parameters,
+    input_template,
+    validate=True,
+):
+    """Inject parameters into an input template as a configuration specifies.
+
+    If a spin-up is configured, the input starts from the end of the spin-up,
+    which is simulated first unless it already was. Unless disabled in the
+    configuration, subcatchment polygons are cached next to the template.
+
+    Args:
+        config (dict): The configuration to get injection configuration from.
+        input_parameters (dict): The parameters to inject, which are adjusted
+            to what was injected.
+        input_template (OrderedDict): The input template to inject the
+            parameters into, which will be modified.
+        validate (boolean): Validate the parameters before injecting them.
+            Defaults to True.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+        IOError: An error occurred during reading or writing.
+        OSError: An error occurred during writing.
+        ValueError: The spin-up does not end during the simulation, or SWMM
+            failed to simulate it.
+    """
+    input_template_path = None
+    if config.get('inject', {}).get('polygon_cache', True):
+        input_template_path = config['input_template_path']
+
+    if 'spin_up' in config:
+        start_from_spin_up(
+            config,
+            input_parameters,
+            input_template,
+            input_template_path,
+        )
+
+    inject_parameters_into_input(
+        input_parameters,
+        input_template,
+        input_template_path,
+        validate=validate,
+        lid_summary_path=get_lid_summary_path(config),
+        compact=config.get('inject', {}).get('compact', False),
+    )
+
+
+def perform_injection(config, validate=True, input_template=None):
     """Perform the injection as specified in a configuration.
 
+    If a spin-up is configured, the input starts from the end of the spin-up,
+    which is simulated first unless it already was.
+
     Args:
         config: The config to get injection configuration from.
         validate (boolean): Validate the configuration before attempting
             to use it. Defaults to True.
+        input_template (OrderedDict): An already read input template to inject
+            parameters into, which will be modified. Defaults to reading the
+            template specified in the configuration.
+
+    Returns:
+        dict: The injected parameters, as adjusted by injection, such as the
+            numbers of LID units reduced to what fits.
 
     Raises:
         ConfigException: The configuration is invalid.
         IOError: An error occurred during reading or writing.
+        OSError: An error occurred during writing.
+        ValueError: The spin-up does not end during the simulation, or SWMM
+            failed to simulate it.
     """
     if validate:
         validate_config(config)
 
-    with open(config['input_template_path']) as input_template_file:
-        input_template = sir.read(input_template_file)
+    if input_template is None:
+        input_template = read_input_template(config)
 
     with open(config['input_parameters_path']) as input_parameters_file:
         input_parameters = json.load(input_parameters_file)
 
-    inject_parameters_into_input(input_parameters, input_template)
+    inject_configured_parameters(config, input_parameters, input_template)
 
-    with open(config['input_path'], 'w') as input_file:
+    with atomic.open_file(config['input_path']) as input_file:
         siw.write(input_template, input_file)
 
+    return input_parameters
+
+
+def perform_polygon_caching(config, validate=True):
+    """Cache the subcatchment polygons of the input template in a configuration.
+
+    Injection uses the cached polygons to find the subcatchments of locations
+    given in map coordinates, so caching them ahead of time saves the first
+    injections from building them.
+
+    Args:
+        config: The config to get the input template path from.
+        validate (boolean): Validate the configuration before attempting
+            to use it. Defaults to True.
+
+    Returns:
+        string: The path of the polygon cache.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+        IOError: An error occurred during reading or writing.
+        OSError: An error occurred during writing.
+    """
+    if validate:
+        validate_polygon_caching_config(config)
+
+    input_template_path = config['input_template_path']
+    with open(input_template_path) as input_template_file:
+        input_template = sir.read(input_template_file)
+
+    cache_path = polygon_cache.get_cache_path(input_template_path)
+    polygon_cache.write_cache(
+        cache_path,
+        polygon_cache.get_cache_key(input_template_path),
+        extract_subcatchment_polygons(input_template),
+    )
+
+    return cache_path
+
 
 def validate_config(config):
     """Validate a configuration for use with this functionality.
@@ -350,3 +895,30 @@ def validate_config(config):
     cfg.validate_file_exists(config, 'input_template_path')
     cfg.validate_file_exists(config, 'input_parameters_path')
     cfg.validate_dir_exists(config, 'input_path', path_is_file=True)
+    if 'summary_dir' in config:
+        cfg.validate_dir_exists(config, 'summary_dir')
+    if 'spin_up' in config:
+        spin_up.validate_config(config)
+
+        # Hotstart files can only be used by input with the same objects as
+        # the spin-up, which is simulated with no units of any LID.
+        if config.get('inject', {}).get('compact', False):
+            raise cfg.ConfigException(
+                'LIDs cannot be compacted when starting from a spin-up.',
+                'inject',
+            )
+
+
+def validate_polygon_caching_config(config):
+    """Validate a configuration for caching input template polygons.
+
+    Args:
+        config (dict): The configuration to validate.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+    """
+    cfg.validate_required_sections(config, [
+        'input_template_path',
+    ], 'cache-polygons')
+    cfg.validate_file_exists(config, 'input_template_path')
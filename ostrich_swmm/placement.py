@@ -0,0 +1,602 @@
+"""Functionality for placing LIDs in SWMM input in batches.
+
+Rain barrels (RB) and permeable pavement (PP) take area from the subcatchment
+they are placed in and move it to child subcatchments of their own. LIDs are
+first added one at a time, which names their child subcatchments and adds them
+to the input in order. The areas, imperviousness and widths of all the child
+and base subcatchments are then computed together as arrays.
+
+LIDs placed in the same subcatchment are computed in successive rounds, in the
+order they were added, so each one sees the changes made by those before it.
+Unit conversion factors are taken from the unit registry once per unit system
+and applied in the same order as unit conversions, so results match computing
+each LID with quantities.
+"""
+
+from __future__ import print_function
+
+from collections import defaultdict
+
+import numpy
+
+from . import LID
+from . import config as cfg
+from . import units
+from .swmm import input as si
+
+unit_factors = {}
+"""Unit conversion factors used to place LIDs, by unit system."""
+
+
+def get_unit_factors(input_unit_system):
+    """Get the unit conversion factors used to place LIDs in a unit system.
+
+    Args:
+        input_unit_system (string): The unit system of the SWMM input.
+
+    Returns:
+        dict: The factors converting impervious subcatchment areas (a percent
+            of a subcatchment area) to LID areas ("imperv_area_to_lid_area"),
+            LID areas to subcatchment areas ("lid_area_to_sc_area") and
+            inverse percentages to numbers ("inverse_percent").
+
+    Raises:
+        ConfigException: The unit system is unknown.
+    """
+    if input_unit_system not in unit_factors:
+        lid_area_unit, _, sc_area_unit = LID.area_units(input_unit_system)
+        percent = units.registry.percent
+        unit_factors[input_unit_system] = {
+            'imperv_area_to_lid_area': (
+                1.0 * percent * sc_area_unit
+            ).to(lid_area_unit).magnitude,
+            'lid_area_to_sc_area': (
+                1.0 * lid_area_unit
+            ).to(sc_area_unit).magnitude,
+            'inverse_percent': (1.0 / percent).to('').magnitude,
+        }
+
+    return unit_factors[input_unit_system]
+
+
+def get_lid_sc_name(input_template, lid_base_sc_name, lid_id):
+    """Get a unique name for the child subcatchment of a LID.
+
+    Args:
+        input_template (dict): The input the LID is being added to.
+        lid_base_sc_name (string): The name of the LID's base subcatchment.
+        lid_id (string): The ID of the LID.
+
+    Returns:
+        string: A name not used by any subcatchment in the input.
+    """
+    lid_sc_name_index = 0
+    lid_sc_name = '{0}##{1}'.format(lid_base_sc_name, lid_id)
+    sc_index = si.get_subcatchment_index(input_template)
+    while lid_sc_name in sc_index:
+        lid_sc_name_index += 1
+        lid_sc_name = '{0}##{1}###{2}'.format(
+            lid_base_sc_name,
+            lid_id,
+            lid_sc_name_index,
+        )
+
+    return lid_sc_name
+
+
+def add_lid_sc(input_template, lid, lid_id):
+    """Add the child subcatchment of a LID to SWMM input.
+
+    The child subcatchment's area, imperviousness and width are set when the
+    LID is placed.
+
+    Args:
+        input_template (dict): The input to add the subcatchment to.
+        lid (dict): The LID, which is moved to its child subcatchment.
+        lid_id (string): The ID of the LID.
+
+    Returns:
+        tuple: The definition of the LID's base subcatchment and the input
+            file line of its child subcatchment.
+
+    Raises:
+        ConfigException: The LID's base subcatchment was not found.
+    """
+    lid_base_sc_name = lid['location']['subcatchment']
+    lid_base_sc = si.get_subcatchment_index(input_template).get(
+        lid_base_sc_name,
+    )
+    if not lid_base_sc:
+        raise cfg.ConfigException(
+            'Subcatchment "{0}" not found.'.format(lid_base_sc_name),
+        )
+
+    lid_sc_name = get_lid_sc_name(input_template, lid_base_sc_name, lid_id)
+    lid_sc = list(lid_base_sc)
+    lid_sc[si.data_indices['SUBCATCHMENTS']['Name']] = lid_sc_name
+    lid_sc[si.data_indices['SUBCATCHMENTS']['OutID']] = lid_base_sc_name
+    lid_sc_line = {
+        'values': lid_sc,
+        'comment': None,
+    }
+    input_template['SUBCATCHMENTS']['lines'].append(lid_sc_line)
+
+    # Set the LID subcatchment to the child subcatchment.
+    lid['location']['subcatchment'] = lid_sc_name
+
+    return lid_base_sc, lid_sc_line
+
+
+def add_roofs(input_template, roofs, count):
+    """Get the child subcatchment of the roofs draining to a rain barrel.
+
+    Roof locations given in map coordinates must already be resolved to
+    subcatchments (see inject.resolve_map_locations).
+
+    Args:
+        input_template (dict): The input the rain barrel is being added to.
+        roofs (list): The roofs draining to each rain barrel.
+        count (int): The index of the rain barrel's roofs.
+
+    Returns:
+        list: The definition of the roofs' child subcatchment, copied from
+            their base subcatchment under a name not used in the input.
+
+    Raises:
+        ConfigException: The roofs' base subcatchment was not found.
+    """
+    roof = roofs[count]
+    roof_base_sc_name = roof['location']['subcatchment']
+    roof_base_sc = si.get_subcatchment_index(input_template).get(
+        roof_base_sc_name,
+    )
+    if not roof_base_sc:
+        raise cfg.ConfigException(
+            'Subcatchment "{0}" not found.'.format(roof_base_sc_name),
+        )
+
+    # Count this instance of this roof type and give it an ID.
+    roof_id = '{0}_{1}'.format(roof['type'], count + 1)
+    roof_sc = list(roof_base_sc)
+    roof_sc[si.data_indices['SUBCATCHMENTS']['Name']] = get_lid_sc_name(
+        input_template,
+        roof_base_sc_name,
+        roof_id,
+    )
+
+    return roof_sc
+
+
+def add_rb(placements, input_template, lid, lid_id, roofs, count):
+    """Add a rain barrel to SWMM input, to be placed with other LIDs.
+
+    Adds child subcatchments for the rain barrel and the roofs draining to
+    it, and the subarea of the roofs.
+
+    Args:
+        placements (list): The LIDs to be placed, which the rain barrel is
+            added to.
+        input_template (dict): The input to add the rain barrel to.
+        lid (dict): The rain barrel.
+        lid_id (string): The ID of the rain barrel.
+        roofs (list): The roofs draining to each rain barrel.
+        count (int): The index of the rain barrel's roofs.
+
+    Returns:
+        dict: The placement of the rain barrel.
+
+    Raises:
+        ConfigException: A base subcatchment was not found.
+    """
+    roof_sc = add_roofs(input_template, roofs, count)
+    lid_base_sc, lid_sc_line = add_lid_sc(input_template, lid, lid_id)
+
+    roof = roofs[count]
+    subarea_line = {
+        'values': [
+            roof['location']['subcatchment'],
+            roof['NImp'],
+            roof['NPerv'],
+            0,
+            0,
+            roof['PctZero'],
+            'OUTLET',
+        ],
+        'comment': None,
+    }
+    input_template['SUBAREAS']['lines'].append(subarea_line)
+    roof_sc[si.data_indices['SUBCATCHMENTS']['OutID']] = (
+        lid['location']['subcatchment']
+    )
+    roof_sc_line = {
+        'values': roof_sc,
+        'comment': None,
+    }
+    input_template['SUBCATCHMENTS']['lines'].append(roof_sc_line)
+
+    lid_placement = {
+        'type': 'RB',
+        'lid': lid,
+        'roof': roof,
+        'base_sc': lid_base_sc,
+        'lid_sc_line': lid_sc_line,
+        'roof_sc_line': roof_sc_line,
+        'subarea_line': subarea_line,
+    }
+    placements.append(lid_placement)
+
+    return lid_placement
+
+
+def add_pp(placements, input_template, lid, lid_id):
+    """Add permeable pavement to SWMM input, to be placed with other LIDs.
+
+    Args:
+        placements (list): The LIDs to be placed, which the permeable pavement
+            is added to.
+        input_template (dict): The input to add the permeable pavement to.
+        lid (dict): The permeable pavement.
+        lid_id (string): The ID of the permeable pavement.
+
+    Returns:
+        dict: The placement of the permeable pavement.
+
+    Raises:
+        ConfigException: The base subcatchment was not found.
+    """
+    lid_base_sc, lid_sc_line = add_lid_sc(input_template, lid, lid_id)
+
+    lid_placement = {
+        'type': 'PP',
+        'lid': lid,
+        'roof': None,
+        'base_sc': lid_base_sc,
+        'lid_sc_line': lid_sc_line,
+        'roof_sc_line': None,
+        'subarea_line': None,
+    }
+    placements.append(lid_placement)
+
+    return lid_placement
+
+
+def get_placement_rounds(placements):
+    """Group LIDs into rounds in which they can be placed together.
+
+    Each LID is placed in the round after the last one that changed its base
+    subcatchment, so no two LIDs in a round share a base subcatchment.
+
+    Args:
+        placements (list): The LIDs to place, in the order they were added.
+
+    Returns:
+        list: The LIDs placed in each round, in the order they were added.
+    """
+    sc_rounds = {}
+    rounds = defaultdict(list)
+    for lid_placement in placements:
+        placement_round = sc_rounds.get(id(lid_placement['base_sc']), 0)
+        rounds[placement_round].append(lid_placement)
+
+        changed_scs = [
+            lid_placement['base_sc'],
+            lid_placement['lid_sc_line']['values'],
+        ]
+        if lid_placement['roof_sc_line'] is not None:
+            changed_scs.append(lid_placement['roof_sc_line']['values'])
+        for changed_sc in changed_scs:
+            sc_rounds[id(changed_sc)] = placement_round + 1
+
+    return [rounds[i] for i in range(len(rounds))]
+
+
+def place_round(placements, factors):
+    """Place LIDs that each have a different base subcatchment.
+
+    Args:
+        placements (list): The LIDs to place, all of one type.
+        factors (dict): The unit conversion factors of the input.
+
+    Returns:
+        list: The number of excess units of each LID.
+    """
+    sc_area_index = si.data_indices['SUBCATCHMENTS']['Area']
+    sc_imperv_index = si.data_indices['SUBCATCHMENTS']['%Imperv']
+    sc_width_index = si.data_indices['SUBCATCHMENTS']['Width']
+    is_rb = placements[0]['type'] == 'RB'
+
+    base_scs = [lid_placement['base_sc'] for lid_placement in placements]
+    lids = [lid_placement['lid'] for lid_placement in placements]
+    base_sc_area = numpy.array([
+        float(base_sc[sc_area_index])
+        for base_sc
+        in base_scs
+    ])
+    base_sc_imperv_area = numpy.array([
+        float(base_sc[sc_imperv_index])
+        for base_sc
+        in base_scs
+    ]) * base_sc_area
+    base_sc_width = numpy.array([
+        float(base_sc[sc_width_index])
+        for base_sc
+        in base_scs
+    ])
+    lid_area = numpy.array([lid['area'] for lid in lids], dtype=float)
+    lid_num_units = numpy.array([lid['number'] for lid in lids], dtype=float)
+    if is_rb:
+        roof_area = numpy.array([
+            lid_placement['roof']['area']
+            for lid_placement
+            in placements
+        ], dtype=float)
+        unit_area = roof_area + lid_area
+    else:
+        unit_area = lid_area
+
+    # Figure out if there are too many units for the impervious area.
+    upper_bound = numpy.floor(
+        base_sc_imperv_area * factors['imperv_area_to_lid_area'] / unit_area
+    )
+    upper_bound[upper_bound < 0] = 0
+    excess = numpy.trunc(lid_num_units - upper_bound)
+    excess[excess <= 0] = 0
+    lid_num_units -= excess
+
+    # Adjust subcatchment areas after LIDs are added.
+    lid_total_area = lid_num_units * lid_area
+    lid_sc_area = lid_total_area * factors['lid_area_to_sc_area']
+    new_base_sc_area = base_sc_area - lid_sc_area
+    new_base_sc_imperv_area = (
+        base_sc_imperv_area - lid_sc_area * factors['inverse_percent']
+    )
+    if is_rb:
+        roof_total_area = lid_num_units * roof_area
+        roof_sc_area = roof_total_area * factors['lid_area_to_sc_area']
+        new_base_sc_area -= roof_sc_area
+        new_base_sc_imperv_area -= roof_sc_area * factors['inverse_percent']
+    new_base_sc_imperv = new_base_sc_imperv_area / new_base_sc_area
+
+    # Adjust subcatchment widths. New subcatchment width = old width *
+    # non-LID area / original area.
+    lid_sc_width = numpy.sqrt(lid_total_area)
+    new_base_sc_width = base_sc_width * (new_base_sc_area / base_sc_area)
+
+    # Adjust the fromImp parameter according to the subcatchment area and
+    # number of roofs. Units treating only direct rainfall have none.
+    if is_rb:
+        from_imp = (
+            lid_num_units
+            * (roof_area * factors['lid_area_to_sc_area'])
+            / base_sc_imperv_area
+            * 100
+            * factors['inverse_percent']
+        )
+
+    for i, lid_placement in enumerate(placements):
+        lid = lid_placement['lid']
+        base_sc = lid_placement['base_sc']
+        lid_sc = lid_placement['lid_sc_line']['values']
+
+        lid['number'] = int(lid_num_units[i])
+        base_sc[sc_area_index] = float(new_base_sc_area[i])
+        base_sc[sc_imperv_index] = float(new_base_sc_imperv[i])
+        base_sc[sc_width_index] = float(new_base_sc_width[i])
+        lid_sc[sc_area_index] = float(lid_sc_area[i])
+        lid_sc[sc_imperv_index] = 0
+        lid_sc[sc_width_index] = float(lid_sc_width[i])
+        lid_placement['lid_sc_line']['comment'] = (
+            '{0} LID units. (Added by OSTRICH-SWMM.)'.format(lid['number'])
+        )
+
+        if is_rb:
+            roof_sc = lid_placement['roof_sc_line']['values']
+            roof_sc[sc_area_index] = float(roof_sc_area[i])
+            roof_sc[sc_imperv_index] = 100
+            roof_sc[sc_width_index] = float(numpy.sqrt(roof_total_area[i]))
+            lid_placement['roof_sc_line']['comment'] = (
+                '{0} roof units. (Added by OSTRICH-SWMM.)'.format(
+                    lid['number'],
+                )
+            )
+            lid['fromImp'] = float(from_imp[i])
+        else:
+            lid['fromImp'] = 0
+
+    return [int(lid_excess) for lid_excess in excess]
+
+
+def place_lids(placements, input_unit_system):
+    """Place LIDs added to SWMM input.
+
+    Sets the areas, imperviousness and widths of the LIDs' child and base
+    subcatchments, and reduces the number of units of each LID to what fits
+    in the impervious area of its base subcatchment. The number of excess
+    units removed from each LID is stored in its placement as its "excess".
+
+    Args:
+        placements (list): The LIDs to place, in the order they were added.
+        input_unit_system (string): The unit system of the input.
+
+    Raises:
+        ConfigException: The unit system is unknown.
+        FloatingPointError: A LID or subcatchment has no area.
+    """
+    if not placements:
+        return
+
+    factors = get_unit_factors(input_unit_system)
+    with numpy.errstate(divide='raise', invalid='raise'):
+        for placement_round in get_placement_rounds(placements):
+            for lid_type in ['RB', 'PP']:
+                type_placements = [
+                    lid_placement
+                    for lid_placement
+                    in placement_round
+                    if lid_placement['type'] == lid_type
+                ]
+                if not type_placements:
+                    continue
+
+                excess = place_round(type_placements, factors)
+                for lid_placement, lid_excess in zip(type_placements, excess):
+                    lid_placement['excess'] = lid_excess
+
+    for lid_placement in placements:
+        if lid_placement['excess'] > 0:
+            print(
+                (
+                    'OSTRICH input for subcat {0} had too many lid units, '
+                    'changing to max number {1}'
+                ).format(
+                    lid_placement['lid']['location']['subcatchment'],
+                    lid_placement['lid']['number'],
+                )
+            )
+
+
+def get_merge_key(lid_placement, usage_line):
+    """Get what a LID must share with the LIDs it can be merged with.
+
+    Args:
+        lid_placement (dict): The placement of the LID.
+        usage_line (dict): The LID_USAGE line of the LID.
+
+    Returns:
+        tuple: The values of the LID's child subcatchment other than its name,
+            area and width, and of its LID_USAGE line other than its
+            subcatchment and number of units.
+    """
+    lid_sc = lid_placement['lid_sc_line']['values']
+    sc_indices = si.data_indices['SUBCATCHMENTS']
+    usage_values = usage_line['values']
+    usage_indices = si.data_indices['LID_USAGE']
+    return (
+        tuple(
+            value
+            for i, value
+            in enumerate(lid_sc)
+            if i not in (
+                sc_indices['Name'],
+                sc_indices['Area'],
+                sc_indices['Width'],
+            )
+        ),
+        tuple(
+            value
+            for i, value
+            in enumerate(usage_values)
+            if i not in (
+                usage_indices['Subcat'],
+                usage_indices['Number'],
+            )
+        ),
+    )
+
+
+def compact_lids(input_template, placements, usage_lines, input_unit_system):
+    """Remove the objects of placed LIDs that do not change simulated results.
+
+    LIDs left without units have their child subcatchments, roofs and
+    LID_USAGE lines removed. Roof subareas are only removed where a later line
+    defines the subareas of the same subcatchment, as SWMM uses the last one.
+    LIDs without roofs that differ only in their numbers of units are merged
+    into the child subcatchment of the first of them, as SWMM simulates one
+    unit of each LID and scales it by the number of units. Roofs are not
+    merged, as the width of a roof changes with the square root of its area.
+
+    Args:
+        input_template (dict): The input the LIDs were placed in.
+        placements (list): The placements of the LIDs, as returned by add_rb
+            and add_pp.
+        usage_lines (list): The LID_USAGE line of each LID.
+        input_unit_system (string): The unit system of the input.
+
+    Raises:
+        ConfigException: The unit system is unknown.
+    """
+    sc_area_index = si.data_indices['SUBCATCHMENTS']['Area']
+    sc_width_index = si.data_indices['SUBCATCHMENTS']['Width']
+    usage_number_index = si.data_indices['LID_USAGE']['Number']
+    usage_area_index = si.data_indices['LID_USAGE']['Area']
+
+    removed_lines = set()
+    subarea_lines = set()
+    merged_lids = {}
+    for lid_placement, usage_line in zip(placements, usage_lines):
+        if lid_placement['subarea_line'] is not None:
+            subarea_lines.add(id(lid_placement['subarea_line']))
+
+        if lid_placement['lid']['number'] == 0:
+            removed_lines.add(id(lid_placement['lid_sc_line']))
+            removed_lines.add(id(usage_line))
+            if lid_placement['roof_sc_line'] is not None:
+                removed_lines.add(id(lid_placement['roof_sc_line']))
+            continue
+
+        if lid_placement['roof_sc_line'] is not None:
+            continue
+
+        merge_key = get_merge_key(lid_placement, usage_line)
+        if merge_key not in merged_lids:
+            merged_lids[merge_key] = (lid_placement, usage_line, [])
+        else:
+            merged_lids[merge_key][2].append(lid_placement)
+            removed_lines.add(id(lid_placement['lid_sc_line']))
+            removed_lines.add(id(usage_line))
+
+    # Size the child subcatchments of merged LIDs as if placed as one LID.
+    factors = get_unit_factors(input_unit_system)
+    for lid_placement, usage_line, merged_placements in (
+        merged_lids.itervalues()
+    ):
+        if not merged_placements:
+            continue
+
+        lid_num_units = lid_placement['lid']['number'] + sum(
+            merged_placement['lid']['number']
+            for merged_placement
+            in merged_placements
+        )
+        lid_total_area = float(lid_num_units) * float(
+            usage_line['values'][usage_area_index],
+        )
+        lid_sc_line = lid_placement['lid_sc_line']
+        lid_sc_line['values'][sc_area_index] = float(
+            lid_total_area * factors['lid_area_to_sc_area']
+        )
+        lid_sc_line['values'][sc_width_index] = float(
+            numpy.sqrt(lid_total_area)
+        )
+        lid_sc_line['comment'] = (
+            '{0} LID units. (Added by OSTRICH-SWMM.)'.format(lid_num_units)
+        )
+        usage_line['values'][usage_number_index] = lid_num_units
+
+    # Only the last subareas of a subcatchment are used.
+    sa_name_index = si.data_indices['SUBAREAS']['Subcat']
+    sa_names = set()
+    sa_lines = []
+    if 'SUBAREAS' in input_template:
+        sa_lines = input_template['SUBAREAS']['lines']
+    for line in reversed(sa_lines):
+        if not line['values']:
+            continue
+        sa_name = line['values'][sa_name_index]
+        if sa_name in sa_names and id(line) in subarea_lines:
+            removed_lines.add(id(line))
+        sa_names.add(sa_name)
+
+    if not removed_lines:
+        return
+
+    # Replace the lines of each section, so indices of them are rebuilt.
+    for section in ['SUBCATCHMENTS', 'SUBAREAS', 'LID_USAGE']:
+        if section not in input_template:
+            continue
+        input_template[section]['lines'] = [
+            line
+            for line
+            in input_template[section]['lines']
+            if id(line) not in removed_lines
+        ]
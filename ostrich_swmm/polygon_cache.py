@@ -0,0 +1,305 @@
+"""Functionality for caching the subcatchment polygons of SWMM input files.
+
+Polygons are stored next to the input file as well-known binary (WKB), along
+with arrays of their bounds. Loading the cache only reads these into memory
+and builds an STRtree of the bounds, so it takes far less time than building
+the polygons from the input. Each polygon is only loaded from WKB once a point
+falls within its bounds. Cached polygons are only used if the content hash of
+the input file matches that of the input they were cached from.
+
+The content hash of each input file and its spatial index are also kept in
+memory, so finding subcatchments in the same input again within a process
+costs only checking that the input file is unchanged.
+"""
+
+import hashlib
+import logging
+import marshal
+import os
+
+import numpy
+import shapely.geometry
+import shapely.prepared
+import shapely.strtree
+import shapely.wkb
+
+from . import atomic
+
+cache_path_suffix = '.polygons'
+"""The suffix added to an input file's path to get its cache's path."""
+
+cache_format_version = 1
+"""The version of the structure stored in caches."""
+
+cache_keys = {}
+"""The size, modification time and cache key of each input file hashed by
+this process, by the absolute path of the input."""
+
+memory_cache = {}
+"""The cache key and spatial index of each input file indexed by this
+process, by the absolute path of the input."""
+
+bounds_dtype = numpy.dtype('<f8')
+"""The data type of polygon bounds stored in caches."""
+
+offsets_dtype = numpy.dtype('<i8')
+"""The data type of offsets of polygons in the WKB stored in caches."""
+
+
+def get_cache_path(input_path):
+    """Get the path of the polygon cache for an input file.
+
+    Args:
+        input_path (string): The path to the input file.
+
+    Returns:
+        string: The path to the input file's polygon cache.
+    """
+    return '{0}{1}'.format(input_path, cache_path_suffix)
+
+
+def get_cache_key(input_path):
+    """Get the key identifying an input file's contents in a polygon cache.
+
+    The input file is only hashed again if its size or modification time
+    changed since this process last hashed it.
+
+    Args:
+        input_path (string): The path to the input file.
+
+    Returns:
+        tuple: The versions of the cache structure and marshal format,
+            followed by the content hash of the input file.
+
+    Raises:
+        IOError: The input file could not be read.
+        OSError: The input file could not be read.
+    """
+    absolute_input_path = os.path.abspath(input_path)
+    input_stat = os.stat(input_path)
+    if absolute_input_path in cache_keys:
+        size, mtime, cache_key = cache_keys[absolute_input_path]
+        if size == input_stat.st_size and mtime == input_stat.st_mtime:
+            return cache_key
+
+    input_hash = hashlib.sha1()
+    with open(input_path, 'rb') as input_file:
+        for chunk in iter(lambda: input_file.read(1 << 20), b''):
+            input_hash.update(chunk)
+
+    cache_key = (
+        cache_format_version,
+        marshal.version,
+        input_hash.hexdigest(),
+    )
+    cache_keys[absolute_input_path] = (
+        input_stat.st_size,
+        input_stat.st_mtime,
+        cache_key,
+    )
+
+    return cache_key
+
+
+def pack(subcatchments):
+    """Convert subcatchment polygons to the structure stored in a cache.
+
+    Args:
+        subcatchments (dict): A mapping of subcatchments to Shapely Polygons.
+
+    Returns:
+        tuple: The names of the subcatchments, the concatenated WKB of their
+            polygons, the offsets of each polygon in the WKB followed by its
+            total length, and the minimum x, minimum y, maximum x and maximum y
+            of each polygon. Arrays are stored as bytes.
+    """
+    subcatchment_names = []
+    polygon_wkbs = []
+    polygon_bounds = []
+    for subcatchment, polygon in subcatchments.iteritems():
+        subcatchment_names.append(subcatchment)
+        polygon_wkbs.append(polygon.wkb)
+        polygon_bounds.append(polygon.bounds)
+
+    offsets = numpy.cumsum(
+        [0] + [len(polygon_wkb) for polygon_wkb in polygon_wkbs],
+        dtype=offsets_dtype,
+    )
+
+    return (
+        subcatchment_names,
+        b''.join(polygon_wkbs),
+        offsets.tobytes(),
+        numpy.array(
+            polygon_bounds,
+            dtype=bounds_dtype,
+        ).reshape(-1, 4).tobytes(),
+    )
+
+
+def unpack(packed_subcatchments):
+    """Convert the structure stored in a cache to a spatial index.
+
+    Args:
+        packed_subcatchments (tuple): The structure to convert.
+
+    Returns:
+        dict: A spatial index of the subcatchment polygons. Keys are
+            "subcatchments", the names of the subcatchments; "polygons", the
+            prepared polygons of the subcatchments, which are None until
+            loaded by load_polygon; "positions", a mapping of the identity of
+            each polygon's bounding box to its position; "tree", an STRtree of
+            the bounding boxes; "wkb", the concatenated WKB of the polygons;
+            and "wkb_offsets", the offset of each polygon in the WKB followed
+            by its total length.
+
+    Raises:
+        ValueError: The structure is not valid.
+    """
+    subcatchment_names, polygons_wkb, offsets, bounds = packed_subcatchments
+    wkb_offsets = numpy.frombuffer(offsets, dtype=offsets_dtype)
+    polygon_bounds = numpy.frombuffer(
+        bounds,
+        dtype=bounds_dtype,
+    ).reshape(-1, 4)
+    if (
+        len(wkb_offsets) != len(subcatchment_names) + 1
+        or len(polygon_bounds) != len(subcatchment_names)
+        or wkb_offsets[-1] != len(polygons_wkb)
+    ):
+        raise ValueError('Cached polygons are not consistent.')
+
+    bounding_boxes = [
+        shapely.geometry.box(*box_bounds)
+        for box_bounds
+        in polygon_bounds
+    ]
+
+    return {
+        'subcatchments': subcatchment_names,
+        'polygons': [None] * len(subcatchment_names),
+        'positions': {
+            id(bounding_box): position
+            for position, bounding_box
+            in enumerate(bounding_boxes)
+        },
+        'tree': shapely.strtree.STRtree(bounding_boxes),
+        'wkb': polygons_wkb,
+        'wkb_offsets': wkb_offsets,
+    }
+
+
+def load_polygon(sc_polygon_index, position):
+    """Load a polygon in a spatial index read from a cache.
+
+    Args:
+        sc_polygon_index (dict): The spatial index, as returned by unpack.
+        position (int): The position of the polygon in the index.
+
+    Returns:
+        PreparedGeometry: The prepared polygon, which is also stored in the
+            index.
+    """
+    wkb_offsets = sc_polygon_index['wkb_offsets']
+    polygon = shapely.prepared.prep(shapely.wkb.loads(
+        sc_polygon_index['wkb'][
+            wkb_offsets[position]:wkb_offsets[position + 1]
+        ],
+    ))
+    sc_polygon_index['polygons'][position] = polygon
+
+    return polygon
+
+
+def read_cache(cache_path, cache_key):
+    """Read subcatchment polygons from a cache file.
+
+    Args:
+        cache_path (string): The path to the cache file.
+        cache_key (tuple): The key the cached polygons must match.
+
+    Returns:
+        dict|None: A spatial index of the cached polygons, as returned by
+            unpack, or None if the cache file is missing, unreadable or does
+            not match the key.
+    """
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            if marshal.load(cache_file) != cache_key:
+                return None
+            return unpack(marshal.load(cache_file))
+    except (IOError, EOFError, ValueError, TypeError):
+        return None
+
+
+def write_cache(cache_path, cache_key, subcatchments):
+    """Write subcatchment polygons to a cache file.
+
+    The cache is written to a temporary file first and moved into place, so
+    concurrent readers never see a partially written cache.
+
+    Args:
+        cache_path (string): The path to the cache file.
+        cache_key (tuple): The key identifying the input.
+        subcatchments (dict): A mapping of subcatchments to Shapely Polygons.
+
+    Raises:
+        IOError: The cache could not be written.
+        OSError: The cache could not be written.
+    """
+    with atomic.open_file(cache_path, 'wb') as cache_file:
+        marshal.dump(cache_key, cache_file)
+        marshal.dump(pack(subcatchments), cache_file)
+
+
+def try_write_cache(cache_path, cache_key, subcatchments):
+    """Write subcatchment polygons to a cache file, if possible.
+
+    Failing to write the cache is not an error, since the polygons can always
+    be built from the input again.
+
+    Args:
+        cache_path (string): The path to the cache file.
+        cache_key (tuple): The key identifying the input.
+        subcatchments (dict): A mapping of subcatchments to Shapely Polygons.
+    """
+    try:
+        write_cache(cache_path, cache_key, subcatchments)
+    except (IOError, OSError) as e:
+        logging.warning(
+            'Could not cache polygons at "{0}": {1}'.format(cache_path, e)
+        )
+
+
+def read_memory_cache(input_path, cache_key):
+    """Get the spatial index this process last kept for an input file.
+
+    Args:
+        input_path (string): The path to the input file.
+        cache_key (tuple): The key the kept spatial index must match.
+
+    Returns:
+        dict|None: The spatial index, which is shared with other callers, or
+            None if no spatial index matching the key was kept.
+    """
+    absolute_input_path = os.path.abspath(input_path)
+    if absolute_input_path not in memory_cache:
+        return None
+
+    cached_key, sc_polygon_index = memory_cache[absolute_input_path]
+    if cached_key != cache_key:
+        return None
+
+    return sc_polygon_index
+
+
+def write_memory_cache(input_path, cache_key, sc_polygon_index):
+    """Keep the spatial index of an input file for the rest of this process.
+
+    Args:
+        input_path (string): The path to the input file.
+        cache_key (tuple): The key identifying the input.
+        sc_polygon_index (dict): The spatial index of the subcatchment
+            polygons in the input.
+    """
+    memory_cache[os.path.abspath(input_path)] = (cache_key, sc_polygon_index)
@@ -0,0 +1,470 @@
+"""Functionality for caching the results of runs.
+
+Searches often evaluate the same parameters more than once. Runs store the
+summaries extracted from SWMM's output in a cache directory, keyed both by the
+parameters as adjusted by injection along with the content of the input
+template, and by the data of the input file written for them, ignoring its
+comments and spacing. Both keys also cover the SWMM executable and the
+extraction steps. A run matching either key restores the stored summaries
+instead of running SWMM and extracting them again, so different parameters
+that produce the same model are only simulated once.
+
+The number of runs that found their results in the cache, and by which key, is
+counted in the cache directory across all runs using it.
+
+Each entry is a single file that is written to a temporary file first and
+moved into place, so runs in other processes sharing the cache never see a
+partially written entry. Entries are touched whenever they are used, and once
+the cache grows past its maximum size the least recently used entries are
+removed.
+"""
+
+import distutils.spawn
+import fcntl
+import hashlib
+import json
+import logging
+import marshal
+import os
+
+from . import atomic
+from . import extract
+
+from .swmm import input_reader as sir
+
+entry_path_suffix = '.result'
+"""The suffix of the names of entry files in cache directories."""
+
+cache_format_version = 1
+"""The version of the structure stored in entries."""
+
+default_max_size = 100 * 1024 * 1024
+"""The default maximum total size of the entries in a cache, in bytes."""
+
+file_hashes = {}
+"""Content hashes of files hashed by this process, by file metadata."""
+
+key_types = ['parameters', 'input']
+"""The types of keys runs are looked up by, in the order they are tried."""
+
+stats_file_name = 'stats.json'
+"""The name of the file counting lookups in cache directories."""
+
+
+def get_file_hash(path):
+    """Get the content hash of a file, reusing it if the file is unchanged.
+
+    Args:
+        path (string): The path to the file.
+
+    Returns:
+        string: The content hash of the file.
+
+    Raises:
+        IOError: The file could not be read.
+        OSError: The file could not be found.
+    """
+    file_stat = os.stat(path)
+    file_key = (
+        os.path.abspath(path),
+        file_stat.st_size,
+        file_stat.st_mtime,
+    )
+    if file_key not in file_hashes:
+        file_hash = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                file_hash.update(chunk)
+        file_hashes[file_key] = file_hash.hexdigest()
+
+    return file_hashes[file_key]
+
+
+def get_swmm_hash(swmm_path):
+    """Get the content hash of the SWMM executable.
+
+    Args:
+        swmm_path (string): The path or name of the SWMM executable.
+
+    Returns:
+        string: The content hash of the executable.
+
+    Raises:
+        IOError: The executable could not be read.
+        OSError: The executable could not be found.
+    """
+    executable_path = distutils.spawn.find_executable(swmm_path) or swmm_path
+    return get_file_hash(os.path.realpath(executable_path))
+
+
+def canonicalize(o):
+    """Convert parameters to a form that is equal for equal parameters.
+
+    Args:
+        o (mixed): The parameters, as loaded from JSON.
+
+    Returns:
+        mixed: The parameters, with integers converted to floats so that
+            numbers compare by value when serialized.
+    """
+    if isinstance(o, dict):
+        return {key: canonicalize(value) for key, value in o.iteritems()}
+    elif isinstance(o, list):
+        return [canonicalize(item) for item in o]
+    elif isinstance(o, (int, long)) and not isinstance(o, bool):
+        return float(o)
+
+    return o
+
+
+def get_input_hash(input_path):
+    """Get the hash of the data in an input file.
+
+    Comments, blank lines and the spacing between values do not change the
+    hash, so input written for equivalent models hashes the same even if
+    their comments or column alignment differ.
+
+    Args:
+        input_path (string): The path to the input file.
+
+    Returns:
+        string: The hash of the input file's data.
+
+    Raises:
+        IOError: The input file could not be read.
+    """
+    input_hash = hashlib.sha1()
+    with open(input_path, 'rb') as input_file:
+        for line in input_file:
+            line_data, _ = sir.split_line(line)
+            try:
+                line_values = sir.split_ssv_values(line_data)
+            except ValueError:
+                line_values = [line_data.strip()]
+            if line_values:
+                input_hash.update(b'\0'.join(line_values))
+                input_hash.update(b'\n')
+
+    return input_hash.hexdigest()
+
+
+def get_cache_key(config, input_parameters, key_type):
+    """Get a key identifying the results of a run in a cache.
+
+    Args:
+        config (dict): The configuration of the run.
+        input_parameters (dict): The parameters of the run, as adjusted by
+            injection.
+        key_type (string): The type of key, either "parameters" to key the run
+            by its parameters and input template, or "input" to key it by the
+            input file written for it.
+
+    Returns:
+        string: The key.
+
+    Raises:
+        IOError: An input file or the SWMM executable could not be read.
+        OSError: An input file or the SWMM executable could not be found.
+        ValueError: The type of key is unknown.
+    """
+    if key_type == 'parameters':
+        model = [
+            canonicalize(input_parameters),
+            get_file_hash(config['input_template_path']),
+        ]
+        if 'spin_up' in config:
+            model.append([
+                config['spin_up']['end_date'],
+                config['spin_up'].get('end_time'),
+            ])
+    elif key_type == 'input':
+        model = get_input_hash(config['input_path'])
+    else:
+        raise ValueError('Unknown cache key type: {0}'.format(key_type))
+
+    return hashlib.sha1(json.dumps(
+        [
+            cache_format_version,
+            key_type,
+            model,
+            get_swmm_hash(config['swmm_path']),
+            config['extract']['steps'],
+        ],
+        sort_keys=True,
+        separators=(',', ':'),
+    )).hexdigest()
+
+
+def get_entry_path(cache_dir, cache_key):
+    """Get the path of the entry for a key in a cache.
+
+    Args:
+        cache_dir (string): The path to the cache directory.
+        cache_key (string): The key of the entry.
+
+    Returns:
+        string: The path to the entry file.
+    """
+    return os.path.join(
+        cache_dir,
+        '{0}{1}'.format(cache_key, entry_path_suffix),
+    )
+
+
+def read_entry(entry_path, cache_key):
+    """Read the summaries stored in a cache entry, marking it as used.
+
+    Args:
+        entry_path (string): The path to the entry file.
+        cache_key (string): The key the entry must match.
+
+    Returns:
+        dict|None: The contents of each summary, by its output path in the
+            extraction steps, or None if the entry is missing, unreadable or
+            does not match the key.
+    """
+    try:
+        with open(entry_path, 'rb') as entry_file:
+            if marshal.load(entry_file) != (
+                cache_format_version,
+                marshal.version,
+                cache_key,
+            ):
+                return None
+            summaries = marshal.load(entry_file)
+    except (IOError, EOFError, ValueError, TypeError):
+        return None
+
+    # Entries are removed least recently used first, by modification time.
+    try:
+        os.utime(entry_path, None)
+    except OSError:
+        pass
+
+    return summaries
+
+
+def write_entry(entry_path, cache_key, summaries):
+    """Write summaries to a cache entry.
+
+    Failing to write the entry is not an error, since the summaries can
+    always be extracted again.
+
+    Args:
+        entry_path (string): The path to the entry file.
+        cache_key (string): The key of the entry.
+        summaries (dict): The contents of each summary, by its output path in
+            the extraction steps.
+    """
+    try:
+        with atomic.open_file(entry_path, 'wb') as entry_file:
+            marshal.dump(
+                (cache_format_version, marshal.version, cache_key),
+                entry_file,
+            )
+            marshal.dump(summaries, entry_file)
+    except (IOError, OSError) as e:
+        logging.warning(
+            'Could not cache results at "{0}": {1}'.format(entry_path, e)
+        )
+
+
+def evict_entries(cache_dir, max_size):
+    """Remove the least recently used entries until a cache fits its size.
+
+    Entries removed by other processes in the meantime are skipped.
+
+    Args:
+        cache_dir (string): The path to the cache directory.
+        max_size (int): The maximum total size of the entries, in bytes.
+    """
+    try:
+        entry_names = os.listdir(cache_dir)
+    except OSError:
+        return
+
+    entries = []
+    for entry_name in entry_names:
+        if (
+            entry_name.startswith('.')
+            or not entry_name.endswith(entry_path_suffix)
+        ):
+            continue
+        entry_path = os.path.join(cache_dir, entry_name)
+        try:
+            entry_stat = os.stat(entry_path)
+        except OSError:
+            continue
+        entries.append((entry_stat.st_mtime, entry_stat.st_size, entry_path))
+
+    total_size = sum(entry_size for _, entry_size, _ in entries)
+    for _, entry_size, entry_path in sorted(entries):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+        total_size -= entry_size
+
+
+def record_lookup(cache_dir, outcome):
+    """Count a lookup in a cache.
+
+    The counts are locked while they are updated, so runs in other processes
+    sharing the cache can count their lookups at the same time. Failing to
+    count a lookup is not an error.
+
+    Args:
+        cache_dir (string): The path to the cache directory.
+        outcome (string): The outcome of the lookup, either the type of key
+            the results were found by or "miss".
+    """
+    stats_path = os.path.join(cache_dir, stats_file_name)
+    try:
+        stats_fd = os.open(stats_path, os.O_RDWR | os.O_CREAT, 0o666)
+        with os.fdopen(stats_fd, 'r+') as stats_file:
+            fcntl.flock(stats_file, fcntl.LOCK_EX)
+            try:
+                stats = json.load(stats_file)
+            except ValueError:
+                stats = {}
+            stats[outcome] = stats.get(outcome, 0) + 1
+            stats_file.seek(0)
+            stats_file.truncate()
+            json.dump(stats, stats_file)
+    except (IOError, OSError) as e:
+        logging.warning(
+            'Could not count lookup at "{0}": {1}'.format(stats_path, e)
+        )
+
+
+def read_stats(cache_dir):
+    """Read the counts of lookups in a cache.
+
+    Args:
+        cache_dir (string): The path to the cache directory.
+
+    Returns:
+        dict: The number of lookups with each outcome: each type of key
+            results were found by, and "miss".
+    """
+    stats = dict.fromkeys(key_types + ['miss'], 0)
+    try:
+        with open(os.path.join(cache_dir, stats_file_name)) as stats_file:
+            fcntl.flock(stats_file, fcntl.LOCK_SH)
+            stats.update(json.load(stats_file))
+    except (IOError, ValueError):
+        pass
+
+    return stats
+
+
+def format_stats(stats):
+    """Format counts of lookups in a cache for printing.
+
+    Args:
+        stats (dict): The number of lookups with each outcome, as returned by
+            read_stats.
+
+    Returns:
+        string: A summary of the counts.
+    """
+    return (
+        'Result cache: {0} hits ({1} by parameters, {2} by input), '
+        '{3} misses.'
+    ).format(
+        sum(stats[key_type] for key_type in key_types),
+        stats['parameters'],
+        stats['input'],
+        stats['miss'],
+    )
+
+
+def get_enabled_key_types(config):
+    """Get the types of keys enabled in a configuration.
+
+    Args:
+        config (dict): The configuration of the run.
+
+    Returns:
+        list: The enabled types of keys, in the order they are tried.
+    """
+    cache_config = config.get('cache', {})
+    return [
+        key_type
+        for key_type
+        in key_types
+        if cache_config.get(key_type, True)
+    ]
+
+
+def restore_results(config, input_parameters):
+    """Restore the summaries of a run from the cache, if they are cached.
+
+    Keys are tried in order, and the summaries found by a later key are also
+    stored under the earlier keys that missed.
+
+    Args:
+        config (dict): The configuration of the run.
+        input_parameters (dict): The parameters of the run, as adjusted by
+            injection.
+
+    Returns:
+        tuple: Whether the summaries were restored, and the keys to store the
+            run's results under if not.
+
+    Raises:
+        IOError: A summary could not be written, or an input file or the SWMM
+            executable could not be read.
+        OSError: An input file or the SWMM executable could not be found.
+    """
+    cache_dir = config['cache_dir']
+    summary_paths = extract.get_summary_paths(config)
+    cache_keys = []
+    for key_type in get_enabled_key_types(config):
+        cache_key = get_cache_key(config, input_parameters, key_type)
+        summaries = read_entry(get_entry_path(cache_dir, cache_key), cache_key)
+        if summaries is None or set(summaries) != set(summary_paths):
+            cache_keys.append(cache_key)
+            continue
+
+        for output_path, summary_path in summary_paths.iteritems():
+            with atomic.open_file(summary_path, 'wb') as summary_file:
+                summary_file.write(summaries[output_path])
+        for missed_cache_key in cache_keys:
+            write_entry(
+                get_entry_path(cache_dir, missed_cache_key),
+                missed_cache_key,
+                summaries,
+            )
+        record_lookup(cache_dir, key_type)
+        return True, []
+
+    record_lookup(cache_dir, 'miss')
+    return False, cache_keys
+
+
+def store_results(config, cache_keys):
+    """Store the summaries of a run in the cache.
+
+    Args:
+        config (dict): The configuration of the run.
+        cache_keys (list): The keys to store the run's results under.
+
+    Raises:
+        IOError: A summary could not be read.
+    """
+    summaries = {}
+    summary_paths = extract.get_summary_paths(config)
+    for output_path, summary_path in summary_paths.iteritems():
+        with open(summary_path, 'rb') as summary_file:
+            summaries[output_path] = summary_file.read()
+
+    cache_dir = config['cache_dir']
+    for cache_key in cache_keys:
+        write_entry(get_entry_path(cache_dir, cache_key), cache_key, summaries)
+    evict_entries(
+        cache_dir,
+        config.get('cache', {}).get('max_size', default_max_size),
+    )
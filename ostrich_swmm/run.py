@@ -1,19 +1,47 @@
 """Functionality for running SWMM with pre- and post-processing steps."""
 
+import logging
+import os
 import subprocess
 
+from . import atomic
 from . import config as cfg
 from . import extract
+from . import incremental
 from . import inject
+from . import result_cache
+from . import screen
+from . import spin_up
 
+from .swmm import input_reader as sir
+from .swmm import library as swmm_library
 
-def perform_run(config, validate=True):
+
+def perform_run(config, validate=True, input_template=None):
     """Perform a run as specified by a configuration.
 
+    If a cache directory is configured, a run whose parameters injection
+    adjusted to the same parameters as a cached run, or whose input file has
+    the same data as a cached run's, restores the cached run's summaries
+    instead of running SWMM. Injection still runs first, so the number of LID
+    units written by it always reflects this run's parameters.
+
+    If extraction is pipelined, the binary output is extracted from while
+    SWMM writes it instead of once SWMM exits. If a SWMM library is
+    configured, SWMM is run in-process instead and extracted from as it
+    computes each reporting period, falling back to running the SWMM
+    executable if the library cannot be loaded.
+
+    If screening is configured, parameters violating its constraints once
+    injected are given penalty summaries without running SWMM.
+
     Args:
         config: The config to get run information from.
         validate (boolean): Validate the configuration before attempting
             to use it. Defaults to True.
+        input_template (OrderedDict): An already read input template to inject
+            parameters into, which will be modified. Defaults to reading the
+            template specified in the configuration.
 
     Raises:
         ConfigException: The configuration is invalid.
@@ -21,9 +49,31 @@ def perform_run(config, validate=True):
     if validate:
         validate_config(config)
 
-    inject.perform_injection(config, validate=False)
+    input_parameters = incremental.perform_injection(
+        config,
+        validate=False,
+        input_template=input_template,
+    )
+
+    # Parameters violating the screening constraints are not worth
+    # simulating, so they are given penalty summaries instead.
+    if 'screen' in config and not screen.perform_screening(
+        config,
+        input_parameters,
+    ):
+        return
+
+    # Parameters that injection adjusted to the same model as a previous run
+    # reuse that run's results.
+    cache_keys = []
+    if 'cache_dir' in config:
+        restored, cache_keys = result_cache.restore_results(
+            config,
+            input_parameters,
+        )
+        if restored:
+            return
 
-    input_path = config['input_path']
     binary_output_path = config['binary_output_path']
     report_output_path = config.get('report_output_path')
     if report_output_path is None:
@@ -33,14 +83,182 @@ def perform_run(config, validate=True):
             report_base_path = binary_output_path
         report_output_path = '{0}.rpt'.format(report_base_path)
 
-    subprocess.call([
+    # SWMM writes to temporary files that are moved into place once it exits,
+    # so its outputs are never seen partially written.
+    library = load_swmm_library(config)
+    temp_report_output_path = atomic.make_temp_file(report_output_path)
+    temp_binary_output_path = atomic.make_temp_file(binary_output_path)
+    try:
+        if library is not None:
+            swmm_return_code = run_swmm_library(
+                config,
+                library,
+                temp_report_output_path,
+                temp_binary_output_path,
+                report_output_path,
+            )
+        else:
+            swmm_return_code = run_swmm_process(
+                config,
+                temp_report_output_path,
+                temp_binary_output_path,
+                report_output_path,
+                binary_output_path,
+            )
+    finally:
+        atomic.remove_temp_file(temp_report_output_path)
+        atomic.remove_temp_file(temp_binary_output_path)
+
+    if library is None and not config['extract'].get('pipelined', False):
+        extract.perform_extraction_steps(config, validate=False)
+
+    if cache_keys and swmm_return_code == 0:
+        result_cache.store_results(config, cache_keys)
+
+
+def load_swmm_library(config):
+    """Load the SWMM shared library to run SWMM in-process with, if configured.
+
+    Args:
+        config (dict): The configuration of the run.
+
+    Returns:
+        ctypes.CDLL: The library, or None if SWMM is to be run as a separate
+            process, either because no library is configured or because it
+            could not be loaded.
+    """
+    if 'swmm_library_path' not in config:
+        return None
+
+    try:
+        return swmm_library.load_library(config['swmm_library_path'])
+    except OSError as e:
+        logging.warning(
+            'Could not load SWMM library, running "{0}" instead: {1}'.format(
+                config['swmm_path'],
+                e,
+            )
+        )
+        return None
+
+
+def get_simulation_dates(input_path):
+    """Get the dates a SWMM input file's simulation reports from and ends at.
+
+    Args:
+        input_path (string): The path to the SWMM input file.
+
+    Returns:
+        tuple: The SWMM timestamps of the report start and of the end.
+
+    Raises:
+        IOError: The input file could not be read.
+        ValueError: The input file does not give the dates of the
+            simulation, or they are not recognized.
+    """
+    with open(input_path, 'r') as input_file:
+        swmm_input = sir.read(input_file)
+    _, report_start, end = spin_up.get_simulation_dates(swmm_input)
+
+    return (
+        extract.convert_datetime_to_swmm_ts(report_start),
+        extract.convert_datetime_to_swmm_ts(end),
+    )
+
+
+def run_swmm_library(
+    config,
+    library,
+    temp_report_output_path,
+    temp_binary_output_path,
+    report_output_path,
+):
+    """Run SWMM in-process, extracting from each reporting period as it runs.
+
+    Results are not saved to binary output, so none is left at the
+    configured path.
+
+    Args:
+        config (dict): The configuration of the run.
+        library (ctypes.CDLL): The SWMM library.
+        temp_report_output_path (string): The path for SWMM to write the
+            report to.
+        temp_binary_output_path (string): The path for SWMM to open binary
+            output at.
+        report_output_path (string): The path to move the report to.
+
+    Returns:
+        int: Zero, as SWMM errors are raised.
+
+    Raises:
+        ValueError: SWMM encountered an error.
+    """
+    report_start_date, end_date = get_simulation_dates(config['input_path'])
+    try:
+        with swmm_library.Simulation(
+            library,
+            config['input_path'],
+            temp_report_output_path,
+            temp_binary_output_path,
+        ) as simulation:
+            simulation.start(report_start_date, end_date)
+            extract.perform_simulated_extraction(
+                config,
+                simulation,
+                validate=False,
+            )
+    finally:
+        os.rename(temp_report_output_path, report_output_path)
+
+    return 0
+
+
+def run_swmm_process(
+    config,
+    temp_report_output_path,
+    temp_binary_output_path,
+    report_output_path,
+    binary_output_path,
+):
+    """Run SWMM as a separate process.
+
+    If extraction is pipelined, the binary output is extracted from while
+    SWMM writes it.
+
+    Args:
+        config (dict): The configuration of the run.
+        temp_report_output_path (string): The path for SWMM to write the
+            report to.
+        temp_binary_output_path (string): The path for SWMM to write binary
+            output to.
+        report_output_path (string): The path to move the report to.
+        binary_output_path (string): The path to move the binary output to.
+
+    Returns:
+        int: The exit code of SWMM.
+    """
+    swmm_process = subprocess.Popen([
         config['swmm_path'],
-        input_path,
-        report_output_path,
-        binary_output_path,
+        config['input_path'],
+        temp_report_output_path,
+        temp_binary_output_path,
     ])
+    try:
+        # Extract from the binary output as SWMM writes it, so that only
+        # the last periods are left to extract once it exits.
+        if config['extract'].get('pipelined', False):
+            extract.perform_tailed_extraction(
+                config,
+                temp_binary_output_path,
+                lambda: swmm_process.poll() is None,
+                validate=False,
+            )
+    finally:
+        swmm_return_code = swmm_process.wait()
+        os.rename(temp_report_output_path, report_output_path)
+        os.rename(temp_binary_output_path, binary_output_path)
 
-    extract.perform_extraction_steps(config, validate=False)
+    return swmm_return_code
 
 
 def validate_config(config):
@@ -58,6 +276,10 @@ def validate_config(config):
         'swmm_path',
     ], 'run')
     cfg.validate_executable_path(config, 'swmm_path')
+    if 'cache_dir' in config:
+        cfg.validate_dir_exists(config, 'cache_dir')
+    if 'screen' in config:
+        screen.validate_config(config)
 
     # Validate with modules used by this module.
     inject.validate_config(config)
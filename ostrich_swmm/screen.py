@@ -0,0 +1,173 @@
+"""Functionality for screening out infeasible parameters before running SWMM.
+
+Injection reduces the number of units of each LID to what fits in its
+subcatchment, and a search treating the units removed as a violated
+constraint gains nothing from simulating the parameters. Screening checks the
+parameters against the configured constraints once they are injected, and
+parameters violating any of them are given summaries with every statistic set
+to a penalty value instead of being simulated.
+
+The constraints are the total number of excess LID units, and the total cost
+of the LID units injected, priced per unit of each LID type.
+"""
+
+import json
+import logging
+
+from . import config as cfg
+from . import extract
+
+default_penalty_value = 1.0e10
+"""The value given to every statistic of parameters that are screened out."""
+
+
+def get_excess_units(input_parameters, injected_parameters):
+    """Get the number of units injection removed from each LID.
+
+    Args:
+        input_parameters (dict): The parameters, before they were injected.
+        injected_parameters (dict): The parameters, as adjusted by injection.
+
+    Returns:
+        list: The number of excess units of each LID, in the order given.
+    """
+    return [
+        lid['number'] - injected_lid['number']
+        for lid, injected_lid
+        in zip(
+            input_parameters.get('lids', []),
+            injected_parameters.get('lids', []),
+        )
+    ]
+
+
+def get_lid_cost(config, injected_parameters):
+    """Get the total cost of the LID units in injected parameters.
+
+    Args:
+        config (dict): The configuration giving the cost of a unit of each
+            LID type.
+        injected_parameters (dict): The parameters, as adjusted by injection.
+
+    Returns:
+        float: The total cost of the LID units.
+
+    Raises:
+        ConfigException: No cost is given for a type of LID in the
+            parameters.
+    """
+    unit_costs = config['screen'].get('unit_costs', {})
+    lid_cost = 0.0
+    for lid in injected_parameters.get('lids', []):
+        if lid['type'] not in unit_costs:
+            raise cfg.ConfigException(
+                'No unit cost given for LID type "{0}".'.format(lid['type']),
+                'screen',
+            )
+        lid_cost += lid['number'] * unit_costs[lid['type']]
+
+    return lid_cost
+
+
+def get_violations(config, input_parameters, injected_parameters):
+    """Get the screening constraints violated by injected parameters.
+
+    Args:
+        config (dict): The configuration giving the constraints.
+        input_parameters (dict): The parameters, before they were injected.
+        injected_parameters (dict): The parameters, as adjusted by injection.
+
+    Returns:
+        list: A description of each violated constraint.
+
+    Raises:
+        ConfigException: No cost is given for a type of LID in the
+            parameters.
+    """
+    screen_config = config['screen']
+    violations = []
+
+    if 'max_excess_units' in screen_config:
+        excess_units = sum(get_excess_units(
+            input_parameters,
+            injected_parameters,
+        ))
+        if excess_units > screen_config['max_excess_units']:
+            violations.append(
+                '{0} excess LID units exceed the maximum of {1}.'.format(
+                    excess_units,
+                    screen_config['max_excess_units'],
+                )
+            )
+
+    if 'max_cost' in screen_config:
+        lid_cost = get_lid_cost(config, injected_parameters)
+        if lid_cost > screen_config['max_cost']:
+            violations.append(
+                'LID cost of {0} exceeds the maximum of {1}.'.format(
+                    lid_cost,
+                    screen_config['max_cost'],
+                )
+            )
+
+    return violations
+
+
+def perform_screening(config, injected_parameters):
+    """Screen injected parameters, penalizing them if they are infeasible.
+
+    Args:
+        config (dict): The configuration giving the constraints.
+        injected_parameters (dict): The parameters, as adjusted by injection.
+
+    Returns:
+        boolean: Whether the parameters satisfy every constraint. If not,
+            the summary of each extraction step has been written with
+            penalty values.
+
+    Raises:
+        ConfigException: No cost is given for a type of LID in the
+            parameters.
+        IOError: The parameters could not be read, or a summary could not be
+            written.
+    """
+    with open(config['input_parameters_path']) as input_parameters_file:
+        input_parameters = json.load(input_parameters_file)
+
+    violations = get_violations(config, input_parameters, injected_parameters)
+    if not violations:
+        return True
+
+    logging.warning('Parameters screened out without running SWMM: {0}'.format(
+        ' '.join(violations),
+    ))
+    extract.write_penalty_summaries(
+        config,
+        config['screen'].get('penalty_value', default_penalty_value),
+    )
+
+    return False
+
+
+def validate_config(config):
+    """Validate a configuration for use with this functionality.
+
+    Args:
+        config (dict): The configuration to validate.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+    """
+    cfg.validate_required_sections(config, [
+        'input_parameters_path',
+        'summary_dir',
+        'extract',
+    ], 'screen')
+    if (
+        'max_cost' in config['screen']
+        and 'unit_costs' not in config['screen']
+    ):
+        raise cfg.ConfigException(
+            'Missing required section for max_cost: "unit_costs"',
+            'screen',
+        )
@@ -0,0 +1,199 @@
+"""Functionality for serving model evaluations from a persistent process.
+
+A server imports its dependencies, loads its JSON Schemas and reads its input
+template once, then runs each requested evaluation in a process forked from
+itself. Evaluations therefore start without any of this setup, and changes an
+evaluation makes to the input template never reach the server or other
+evaluations.
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import socket
+import SocketServer
+import traceback
+
+from . import client
+from . import config as cfg
+from . import inject
+from . import result_cache
+from . import run
+
+
+class EvaluationRequestHandler(SocketServer.StreamRequestHandler):
+    """Handles a request to run an evaluation in a directory.
+
+    Requests and responses are each a single line of JSON. A request holds the
+    "directory" to run the evaluation in, and a response holds the evaluation's
+    "exit_code" and any "error" message.
+    """
+
+    def handle(self):
+        """Handle a request in the process forked for it."""
+        # Connections closed without a request only check the server is up.
+        request_line = self.rfile.readline()
+        if not request_line:
+            return
+
+        try:
+            request = json.loads(request_line)
+            response = self.server.evaluate(request['directory'])
+        except (KeyError, TypeError, ValueError):
+            response = {
+                'exit_code': 2,
+                'error': 'Invalid evaluation request.',
+            }
+
+        self.wfile.write(json.dumps(response) + '\n')
+
+
+class EvaluationServer(
+    SocketServer.ForkingMixIn,
+    SocketServer.UnixStreamServer,
+):
+    """Serves evaluations over a Unix socket, forking for each request."""
+
+    def __init__(self, socket_path, config, input_template):
+        """Constructor.
+
+        Args:
+            socket_path (string): The path of the socket to listen on.
+            config (dict): The configuration to run evaluations with.
+            input_template (OrderedDict): The input template to inject
+                parameters into for each evaluation.
+        """
+        SocketServer.UnixStreamServer.__init__(
+            self,
+            socket_path,
+            EvaluationRequestHandler,
+        )
+        self.config = config
+        self.input_template = input_template
+
+    def evaluate(self, directory):
+        """Run an evaluation in a directory.
+
+        This is only called from processes forked for a request, so it may
+        change the working directory, configuration and input template.
+
+        Args:
+            directory (string): The directory to run the evaluation in.
+
+        Returns:
+            dict: The evaluation's "exit_code" and any "error" message.
+        """
+        try:
+            os.chdir(directory)
+            run.perform_run(self.config, input_template=self.input_template)
+        except cfg.ConfigException as e:
+            return {
+                'exit_code': 2,
+                'error': e.msg,
+            }
+        except Exception:
+            return {
+                'exit_code': 1,
+                'error': traceback.format_exc(),
+            }
+
+        return {
+            'exit_code': 0,
+        }
+
+
+def remove_stale_socket(socket_path):
+    """Remove a socket left behind by a server that is no longer running.
+
+    Args:
+        socket_path (string): The path of the socket.
+
+    Raises:
+        ConfigException: A server is already listening on the socket.
+    """
+    if not os.path.exists(socket_path):
+        return
+
+    test_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        test_socket.connect(socket_path)
+    except socket.error:
+        os.remove(socket_path)
+    else:
+        raise cfg.ConfigException(
+            'A server is already listening on "{0}".'.format(socket_path),
+            'socket_path',
+        )
+    finally:
+        test_socket.close()
+
+
+def serve(config, validate=True):
+    """Serve evaluations as specified by a configuration until interrupted.
+
+    Args:
+        config: The config to run evaluations with.
+        validate (boolean): Validate the configuration before attempting
+            to use it. Defaults to True.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+        IOError: The input template could not be read.
+    """
+    if validate:
+        validate_config(config)
+
+    # Evaluations run in their own directories, so keep the files shared by
+    # all evaluations reachable from them.
+    config = cfg.make_shared_paths_absolute(config)
+    input_template = inject.read_input_template(config)
+    cfg.load_json_schema(inject.get_input_parameters_schema_path())
+
+    socket_path = config.get('socket_path', client.default_socket_path)
+    remove_stale_socket(socket_path)
+    server = EvaluationServer(socket_path, config, input_template)
+    print('Serving evaluations on "{0}".'.format(os.path.abspath(socket_path)))
+    if 'cache_dir' in config:
+        initial_cache_stats = result_cache.read_stats(config['cache_dir'])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+    # Report how many evaluations served found their results in the cache.
+    if 'cache_dir' in config:
+        cache_stats = result_cache.read_stats(config['cache_dir'])
+        print(result_cache.format_stats({
+            outcome: count - initial_cache_stats[outcome]
+            for outcome, count
+            in cache_stats.iteritems()
+        }))
+
+
+def validate_config(config):
+    """Validate a configuration for use with this functionality.
+
+    Files used by each evaluation are checked when it runs, since they are
+    found relative to the evaluation's directory.
+
+    Args:
+        config (dict): The configuration to validate.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+    """
+    cfg.validate_required_sections(config, [
+        'binary_output_path',
+        'input_path',
+        'input_template_path',
+        'input_parameters_path',
+        'swmm_path',
+        'summary_dir',
+        'extract',
+    ], 'serve')
+    cfg.validate_file_exists(config, 'input_template_path')
+    cfg.validate_executable_path(config, 'swmm_path')
@@ -0,0 +1,596 @@
+"""Functionality for sharing a spin-up simulation between runs.
+
+Continuous simulations often begin with a spin-up period that only brings the
+model to a realistic state, such as its soil moisture and groundwater, before
+the period of interest. The spin-up is simulated once, with every LID given no
+units, and the model's state at its end saved to a SWMM hotstart file. The
+input written for each run then starts where the spin-up ended, from the saved
+state, so runs no longer simulate the spin-up themselves.
+
+SWMM only starts from hotstart files saved by a model with the same objects,
+and injecting LIDs adds subcatchments for them, so the spin-up is simulated
+with the LIDs and roofs of the parameters being injected. Hotstart files are
+named by a key covering the content of the input template, the parameters
+other than the numbers of LID units, the end of the spin-up and the SWMM
+executable. Runs of parameters only differing in their numbers of units, as
+when searching for the best numbers, share one spin-up.
+
+Hotstart files are stored next to the input template unless configured
+otherwise, along with the input, report and LID summary of their spin-up.
+Spin-ups are locked while they run, so runs in other processes needing the
+same hotstart file wait for it instead of simulating the spin-up again.
+"""
+
+import datetime as dt
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import subprocess
+
+from . import atomic
+from . import config as cfg
+from . import result_cache
+
+from .swmm import input as si
+from .swmm import input_writer as siw
+
+hotstart_format_version = 1
+"""The version of the way hotstart files are keyed."""
+
+hotstart_path_suffix = '.hsf'
+"""The suffix of hotstart files."""
+
+lid_summary_path_suffix = '.num_lid.csv'
+"""The suffix of the LID summary written when injecting a spin-up."""
+
+default_time = '00:00:00'
+"""The time of day used where only a date is given."""
+
+date_format = '%m/%d/%Y'
+"""The format of dates in SWMM input."""
+
+time_format = '%H:%M:%S'
+"""The format of times in SWMM input."""
+
+report_options = [
+    'SUBCATCHMENTS',
+    'NODES',
+    'LINKS',
+]
+"""The REPORT section options listing the reported objects of each type."""
+
+
+def parse_date_time(date_string, time_string):
+    """Parse a date and time as given in SWMM input.
+
+    Args:
+        date_string (string): The date, as month/day/year.
+        time_string (string): The time of day, as hours:minutes[:seconds] or
+            as decimal hours.
+
+    Returns:
+        datetime: The date and time.
+
+    Raises:
+        ValueError: The date or time is not recognized.
+    """
+    try:
+        month, day, year = (int(part) for part in date_string.split('/'))
+        date = dt.datetime(year, month, day)
+        if ':' in time_string:
+            time_parts = [int(part) for part in time_string.split(':')]
+            if len(time_parts) > 3:
+                raise ValueError()
+            time_parts += [0] * (3 - len(time_parts))
+            time = dt.timedelta(
+                hours=time_parts[0],
+                minutes=time_parts[1],
+                seconds=time_parts[2],
+            )
+        else:
+            time = dt.timedelta(hours=float(time_string))
+    except ValueError:
+        raise ValueError('Unrecognized date and time "{0} {1}".'.format(
+            date_string,
+            time_string,
+        ))
+
+    return date + time
+
+
+def get_spin_up_end(config):
+    """Get the end of the spin-up in a configuration.
+
+    Args:
+        config (dict): The configuration to get the spin-up from.
+
+    Returns:
+        datetime: The date and time at which the spin-up ends.
+
+    Raises:
+        ConfigException: The end of the spin-up is not recognized.
+    """
+    spin_up_config = config['spin_up']
+    try:
+        return parse_date_time(
+            spin_up_config['end_date'],
+            spin_up_config.get('end_time', default_time),
+        )
+    except ValueError as e:
+        raise cfg.ConfigException(str(e), 'spin_up')
+
+
+def get_options(swmm_input):
+    """Get the values of the options in SWMM input.
+
+    Args:
+        swmm_input (dict): The input to get the options of.
+
+    Returns:
+        dict: The value of each option given, by its name in upper case.
+    """
+    if 'OPTIONS' not in swmm_input:
+        return {}
+
+    options_name_index = si.data_indices['OPTIONS']['Name']
+    options_value_index = si.data_indices['OPTIONS']['Value']
+    return {
+        line['values'][options_name_index].upper():
+            line['values'][options_value_index]
+        for line
+        in swmm_input['OPTIONS']['lines']
+        if len(line['values']) > options_value_index
+    }
+
+
+def get_simulation_dates(swmm_input):
+    """Get the dates a simulation starts, starts reporting and ends at.
+
+    Args:
+        swmm_input (dict): The input of the simulation.
+
+    Returns:
+        tuple: The start, report start and end dates and times.
+
+    Raises:
+        ValueError: The input does not give the start and end of the
+            simulation, or they are not recognized.
+    """
+    options = get_options(swmm_input)
+    if 'START_DATE' not in options or 'END_DATE' not in options:
+        raise ValueError(
+            'The SWMM input file does not give the start and end dates of '
+            'the simulation.'
+        )
+
+    start = parse_date_time(
+        options['START_DATE'],
+        options.get('START_TIME', default_time),
+    )
+    report_start = parse_date_time(
+        options.get('REPORT_START_DATE', options['START_DATE']),
+        options.get(
+            'REPORT_START_TIME',
+            options.get('START_TIME', default_time),
+        ),
+    )
+    end = parse_date_time(
+        options['END_DATE'],
+        options.get('END_TIME', default_time),
+    )
+
+    return start, report_start, end
+
+
+def get_relative_time_series(swmm_input):
+    """Get the time series in SWMM input timed from the simulation's start.
+
+    The dates of a time series are given on its first line, or in an external
+    file named on it. Time series without dates are timed from the start of
+    the simulation.
+
+    Args:
+        swmm_input (dict): The input to get the time series of.
+
+    Returns:
+        list: The names of the time series without dates.
+    """
+    if 'TIMESERIES' not in swmm_input:
+        return []
+
+    relative_time_series = []
+    seen_time_series = set()
+    for line in swmm_input['TIMESERIES']['lines']:
+        values = line['values']
+        if len(values) < 2 or values[0] in seen_time_series:
+            continue
+        seen_time_series.add(values[0])
+        if '/' not in values[1] and values[1].upper() != 'FILE':
+            relative_time_series.append(values[0])
+
+    return relative_time_series
+
+
+def set_options(swmm_input, options):
+    """Set options in SWMM input.
+
+    The OPTIONS section is replaced, so it may be shared with other input.
+    Options already given have their values replaced, and the rest are added
+    after the last option.
+
+    Args:
+        swmm_input (dict): The input to set the options of.
+        options (dict): The values of the options to set, by their names.
+    """
+    options_name_index = si.data_indices['OPTIONS']['Name']
+    options_value_index = si.data_indices['OPTIONS']['Value']
+    options_comment = None
+    options_lines = []
+    if 'OPTIONS' in swmm_input:
+        options_comment = swmm_input['OPTIONS']['comment']
+        options_lines = list(swmm_input['OPTIONS']['lines'])
+
+    options_to_add = dict(options)
+    num_options_lines = 0
+    for line_index, line in enumerate(options_lines):
+        values = line['values']
+        if not values:
+            continue
+        num_options_lines = line_index + 1
+
+        name = values[options_name_index].upper()
+        if name not in options_to_add:
+            continue
+        values = list(values)
+        values[options_value_index:] = [options_to_add.pop(name)]
+        options_lines[line_index] = {
+            'values': values,
+            'comment': line['comment'],
+        }
+
+    options_lines[num_options_lines:num_options_lines] = [
+        {
+            'values': [option_name, option_value],
+            'comment': None,
+        }
+        for option_name, option_value
+        in sorted(options_to_add.iteritems())
+    ]
+
+    swmm_input['OPTIONS'] = {
+        'lines': options_lines,
+        'comment': options_comment,
+    }
+
+
+def set_hotstart_file(swmm_input, usage, hotstart_path, removed_usages):
+    """Set a hotstart file used or saved by SWMM input.
+
+    The FILES section is replaced, so it may be shared with other input.
+
+    Args:
+        swmm_input (dict): The input to set the hotstart file of.
+        usage (string): Either "USE" to start the simulation from the hotstart
+            file or "SAVE" to save the simulation's final state to it.
+        hotstart_path (string): The path to the hotstart file.
+        removed_usages (Iterable): The usages of other files to remove from
+            the input, such as "SAVE" to not save any other files.
+    """
+    removed_usages = set(removed_usages)
+    files_comment = None
+    files_lines = []
+    if 'FILES' in swmm_input:
+        files_comment = swmm_input['FILES']['comment']
+        files_lines = [
+            line
+            for line
+            in swmm_input['FILES']['lines']
+            if not line['values']
+            or (
+                line['values'][0].upper() not in removed_usages
+                and not (
+                    line['values'][0].upper() == usage
+                    and len(line['values']) > 1
+                    and line['values'][1].upper() == 'HOTSTART'
+                )
+            )
+        ]
+
+    files_lines.append({
+        'values': [usage, 'HOTSTART', hotstart_path],
+        'comment': None,
+    })
+
+    swmm_input['FILES'] = {
+        'lines': files_lines,
+        'comment': files_comment,
+    }
+
+
+def get_spin_up_parameters(input_parameters):
+    """Get the parameters to simulate the spin-up of parameters with.
+
+    Args:
+        input_parameters (dict): The parameters, before they are injected.
+
+    Returns:
+        dict: A copy of the parameters with no units of any LID.
+    """
+    spin_up_parameters = json.loads(json.dumps(input_parameters))
+    for lid in spin_up_parameters.get('lids', []):
+        lid['number'] = 0
+
+    return spin_up_parameters
+
+
+def get_hotstart_path(config, input_parameters):
+    """Get the path of the hotstart file saved by a spin-up.
+
+    Args:
+        config (dict): The configuration to get the spin-up from.
+        input_parameters (dict): The parameters the spin-up is for, before
+            they are injected.
+
+    Returns:
+        string: The absolute path to the hotstart file.
+
+    Raises:
+        ConfigException: The end of the spin-up is not recognized.
+        IOError: The input template or the SWMM executable could not be read.
+        OSError: The input template or the SWMM executable could not be
+            found.
+    """
+    input_template_path = os.path.abspath(config['input_template_path'])
+    hotstart_key = hashlib.sha1(json.dumps(
+        [
+            hotstart_format_version,
+            result_cache.get_file_hash(input_template_path),
+            result_cache.canonicalize(
+                get_spin_up_parameters(input_parameters),
+            ),
+            get_spin_up_end(config).isoformat(),
+            result_cache.get_swmm_hash(config['swmm_path']),
+        ],
+        sort_keys=True,
+        separators=(',', ':'),
+    )).hexdigest()
+
+    hotstart_dir = config['spin_up'].get(
+        'hotstart_dir',
+        os.path.dirname(input_template_path),
+    )
+    return os.path.abspath(os.path.join(
+        hotstart_dir,
+        '{0}.spin-up.{1}{2}'.format(
+            os.path.basename(input_template_path),
+            hotstart_key,
+            hotstart_path_suffix,
+        ),
+    ))
+
+
+def get_spin_up_path(hotstart_path, suffix):
+    """Get the path of a file written by the spin-up saving a hotstart file.
+
+    Args:
+        hotstart_path (string): The path to the hotstart file.
+        suffix (string): The suffix of the file, such as ".inp".
+
+    Returns:
+        string: The path to the file.
+    """
+    return '{0}{1}'.format(
+        hotstart_path[:-len(hotstart_path_suffix)],
+        suffix,
+    )
+
+
+def use_hotstart(swmm_input, config, hotstart_path):
+    """Start SWMM input from the end of the spin-up of a configuration.
+
+    The input's OPTIONS and FILES sections are replaced. If the input's
+    reporting starts before the spin-up ends, it is moved to the end of the
+    spin-up.
+
+    Args:
+        swmm_input (dict): The input to start from the end of the spin-up.
+        config (dict): The configuration to get the spin-up from.
+        hotstart_path (string): The path to the hotstart file saved by the
+            spin-up.
+
+    Raises:
+        ConfigException: The end of the spin-up is not recognized.
+        ValueError: The spin-up does not end during the simulation.
+    """
+    start, report_start, end = get_simulation_dates(swmm_input)
+    spin_up_end = get_spin_up_end(config)
+    if not start < spin_up_end < end:
+        raise ValueError(
+            'The spin-up must end between the start and end of the '
+            'simulation.'
+        )
+
+    options = {
+        'START_DATE': spin_up_end.strftime(date_format),
+        'START_TIME': spin_up_end.strftime(time_format),
+    }
+    if report_start < spin_up_end:
+        logging.warning(
+            'Reporting starts before the spin-up ends, so it will start when '
+            'the spin-up ends instead.'
+        )
+        options.update({
+            'REPORT_START_DATE': spin_up_end.strftime(date_format),
+            'REPORT_START_TIME': spin_up_end.strftime(time_format),
+        })
+    set_options(swmm_input, options)
+
+    set_hotstart_file(swmm_input, 'USE', hotstart_path, [])
+
+
+def perform_spin_up(config, spin_up_input, hotstart_path):
+    """Simulate a spin-up, unless its hotstart file was already saved.
+
+    If the spin-up fails, its LID summary is removed, leaving its input and
+    report to diagnose it with.
+
+    Args:
+        config (dict): The configuration to get the spin-up from.
+        spin_up_input (dict): The input to simulate the spin-up with, as
+            injected with the spin-up's parameters. Its OPTIONS, REPORT and
+            FILES sections are replaced.
+        hotstart_path (string): The path to save the hotstart file to.
+
+    Raises:
+        ConfigException: The end of the spin-up is not recognized.
+        IOError: An error occurred during writing.
+        OSError: An error occurred during writing.
+        ValueError: The spin-up does not end during the simulation, or SWMM
+            failed to simulate it.
+    """
+    if os.path.isfile(hotstart_path):
+        return
+
+    lock_path = get_spin_up_path(hotstart_path, '.lock')
+    lock_fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+    with os.fdopen(lock_fd, 'r+') as lock_file:
+        # Another process may have simulated the spin-up while waiting.
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if os.path.isfile(hotstart_path):
+            return
+
+        try:
+            simulate_spin_up(config, spin_up_input, hotstart_path)
+        except BaseException:
+            # The lock file is kept, since other processes may be waiting for
+            # the lock on it. Whether the hotstart file exists once they hold
+            # the lock decides whether they simulate the spin-up.
+            try:
+                os.remove(
+                    get_spin_up_path(hotstart_path, lid_summary_path_suffix),
+                )
+            except OSError:
+                pass
+            raise
+
+
+def simulate_spin_up(config, spin_up_input, hotstart_path):
+    """Simulate a spin-up, saving its hotstart file.
+
+    Args:
+        config (dict): The configuration to get the spin-up from.
+        spin_up_input (dict): The input to simulate the spin-up with, as
+            injected with the spin-up's parameters. Its OPTIONS, REPORT and
+            FILES sections are replaced.
+        hotstart_path (string): The path to save the hotstart file to.
+
+    Raises:
+        ConfigException: The end of the spin-up is not recognized.
+        IOError: An error occurred during writing.
+        OSError: An error occurred during writing.
+        ValueError: The spin-up does not end during the simulation, or SWMM
+            failed to simulate it.
+    """
+    start, _, end = get_simulation_dates(spin_up_input)
+    spin_up_end = get_spin_up_end(config)
+    if not start < spin_up_end < end:
+        raise ValueError(
+            'The spin-up must end between the start and end of the '
+            'simulation.'
+        )
+
+    # Runs start later than the spin-up, which would shift time series
+    # timed from the start of the simulation.
+    relative_time_series = get_relative_time_series(spin_up_input)
+    if relative_time_series:
+        raise ValueError(
+            'Time series "{0}" has no dates, so it cannot be used with a '
+            'spin-up.'.format(relative_time_series[0])
+        )
+
+    # Only simulate the spin-up, and only save its final state.
+    set_options(spin_up_input, {
+        'REPORT_START_DATE': start.strftime(date_format),
+        'REPORT_START_TIME': start.strftime(time_format),
+        'END_DATE': spin_up_end.strftime(date_format),
+        'END_TIME': spin_up_end.strftime(time_format),
+    })
+    spin_up_input['REPORT'] = {
+        'lines': [
+            {
+                'values': [option, 'NONE'],
+                'comment': None,
+            }
+            for option
+            in report_options
+        ],
+        'comment': None,
+    }
+    temp_hotstart_path = atomic.make_temp_file(hotstart_path)
+    set_hotstart_file(
+        spin_up_input,
+        'SAVE',
+        temp_hotstart_path,
+        ['SAVE'],
+    )
+
+    # The spin-up's binary output is not needed, but SWMM needs somewhere
+    # to write it.
+    spin_up_input_path = get_spin_up_path(hotstart_path, '.inp')
+    spin_up_report_path = get_spin_up_path(hotstart_path, '.rpt')
+    temp_report_path = atomic.make_temp_file(spin_up_report_path)
+    temp_binary_output_path = atomic.make_temp_file(
+        get_spin_up_path(hotstart_path, '.out'),
+    )
+    try:
+        with atomic.open_file(spin_up_input_path) as spin_up_input_file:
+            siw.write(spin_up_input, spin_up_input_file)
+
+        swmm_return_code = subprocess.call([
+            config['swmm_path'],
+            spin_up_input_path,
+            temp_report_path,
+            temp_binary_output_path,
+        ])
+        os.rename(temp_report_path, spin_up_report_path)
+
+        if (
+            swmm_return_code != 0
+            or os.path.getsize(temp_hotstart_path) == 0
+        ):
+            raise ValueError(
+                'SWMM failed to simulate the spin-up. See "{0}".'.format(
+                    spin_up_report_path,
+                )
+            )
+        os.rename(temp_hotstart_path, hotstart_path)
+    finally:
+        atomic.remove_temp_file(temp_hotstart_path)
+        atomic.remove_temp_file(temp_report_path)
+        atomic.remove_temp_file(temp_binary_output_path)
+
+
+def validate_config(config):
+    """Validate a configuration for use with this functionality.
+
+    Args:
+        config (dict): The configuration to validate.
+
+    Raises:
+        ConfigException: The configuration is invalid.
+    """
+    cfg.validate_required_sections(config, [
+        'input_template_path',
+        'swmm_path',
+    ], 'spin_up')
+    if 'end_date' not in config['spin_up']:
+        raise cfg.ConfigException(
+            'Missing required section for spin_up: "end_date"',
+            'spin_up',
+        )
+    get_spin_up_end(config)
+    if 'hotstart_dir' in config['spin_up']:
+        if not os.path.isdir(config['spin_up']['hotstart_dir']):
+            os.makedirs(config['spin_up']['hotstart_dir'])
@@ -1,5 +1,7 @@
 """Common functionality for handling SWMM input."""
 
+import copy
+
 section_formats = {
     '': 'txt',
     'TITLE': 'txt',
@@ -23,6 +25,28 @@ data_indices = {
         'Clength': 7,
         'Spack': 8,
     },
+    'SUBAREAS': {
+        'Subcat': 0,
+        'Nimp': 1,
+        'Nperv': 2,
+        'Simp': 3,
+        'Sperv': 4,
+        '%Zero': 5,
+        'RouteTo': 6,
+        '%Routed': 7,
+    },
+    'LID_USAGE': {
+        'Subcat': 0,
+        'LID': 1,
+        'Number': 2,
+        'Area': 3,
+        'Width': 4,
+        'InitSat': 5,
+        'FromImp': 6,
+        'ToPerv': 7,
+        'RptFile': 8,
+        'DrainTo': 9,
+    },
     'LID_CONTROLS': {
         'Common': {
             'Name': 0,
@@ -99,3 +123,96 @@ def get_unit_system(swmm_input):
         return 'SI'
 
     raise ValueError('Unrecognized flow units "{0}".'.format(flow_units))
+
+
+def get_subcatchment_index(swmm_input):
+    """Get the subcatchment definitions in SWMM input, indexed by name.
+
+    The index is kept with the input's SUBCATCHMENTS section. Lines added to
+    the section since the index was last used are indexed before it is
+    returned, so it stays in sync as subcatchments are added, and each line is
+    only ever indexed once.
+
+    Args:
+        swmm_input (dict): The input to index subcatchment definitions of.
+
+    Returns:
+        dict: A mapping of subcatchment names to their input file definitions.
+            Where a name is defined more than once, its first definition is
+            used.
+    """
+    if 'SUBCATCHMENTS' not in swmm_input:
+        return {}
+
+    section_content = swmm_input['SUBCATCHMENTS']
+    lines = section_content['lines']
+    name_index = section_content.get('name_index')
+    if name_index is None or name_index['lines'] is not lines:
+        name_index = {
+            'lines': lines,
+            'definitions': {},
+            'num_lines': 0,
+        }
+        section_content['name_index'] = name_index
+
+    sc_name_index = data_indices['SUBCATCHMENTS']['Name']
+    definitions = name_index['definitions']
+    for line in lines[name_index['num_lines']:]:
+        values = line['values']
+        if values:
+            definitions.setdefault(values[sc_name_index], values)
+    name_index['num_lines'] = len(lines)
+
+    return definitions
+
+
+def copy_sections(swmm_input, modified_sections, appended_sections=()):
+    """Copy input so that some of its sections can be changed.
+
+    Sections with modified lines are copied down to the values of each line
+    and will be formatted when written. Sections that will only have lines
+    added only have their list of lines copied, so any lines read from a file
+    can still be written out as they were read. Other sections are shared with
+    the original input and must not be changed. Sections may be freely added
+    to or removed from the copy.
+
+    Args:
+        swmm_input (OrderedDict): The input to copy.
+        modified_sections (Iterable): The sections with lines that will be
+            modified.
+        appended_sections (Iterable): The sections that will only have lines
+            added to them. Defaults to none.
+
+    Returns:
+        OrderedDict: The copy of the input.
+    """
+    input_copy = swmm_input.copy()
+    for section in modified_sections:
+        if section not in input_copy:
+            continue
+
+        section_content = input_copy[section]
+        input_copy[section] = {
+            'lines': [
+                {
+                    'values': list(line['values']),
+                    'comment': line['comment'],
+                }
+                for line
+                in section_content['lines']
+            ],
+            'comment': section_content['comment'],
+        }
+
+    for section in appended_sections:
+        if section not in input_copy:
+            continue
+
+        # Parse the original's lines before copying, so they are parsed once.
+        section_content = input_copy[section]
+        lines = section_content['lines']
+        section_copy = copy.copy(section_content)
+        section_copy['lines'] = list(lines)
+        input_copy[section] = section_copy
+
+    return input_copy
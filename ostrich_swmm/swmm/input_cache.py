@@ -0,0 +1,216 @@
+"""Functionality for caching parsed SWMM input files.
+
+Input is stored next to the input file in a compact binary form that loads
+faster than the input can be parsed. Each section is stored as its raw text,
+along with its parsed lines if they were parsed when the input was cached.
+Cached input is only used if the input file's path, size, modification time
+and content hash all match those it was cached from.
+
+Parsed input is also kept in memory, so reading the same input again within a
+process costs only checking that it is unchanged. Input read through this
+module is shared between callers and must be copied before it is modified.
+"""
+
+from collections import OrderedDict
+import hashlib
+import io
+import logging
+import marshal
+import os
+
+from .. import atomic
+
+from . import input_reader as sir
+
+cache_path_suffix = '.parsed'
+"""The suffix added to an input file's path to get its cache's path."""
+
+cache_format_version = 2
+"""The version of the structure stored in caches."""
+
+memory_cache = {}
+"""Parsed input read by this process, by the absolute path of the input."""
+
+
+def get_cache_path(input_path):
+    """Get the path of the cache for an input file.
+
+    Args:
+        input_path (string): The path to the input file.
+
+    Returns:
+        string: The path to the input file's cache.
+    """
+    return '{0}{1}'.format(input_path, cache_path_suffix)
+
+
+def get_cache_key(input_path, input_contents):
+    """Get the key identifying an input file's contents in a cache.
+
+    Args:
+        input_path (string): The path to the input file.
+        input_contents (string): The contents of the input file.
+
+    Returns:
+        tuple: The versions of the cache structure and marshal format,
+            followed by the absolute path, size, modification time and content
+            hash of the input file.
+    """
+    input_stat = os.stat(input_path)
+    return (
+        cache_format_version,
+        marshal.version,
+        os.path.abspath(input_path),
+        input_stat.st_size,
+        input_stat.st_mtime,
+        hashlib.sha1(input_contents).hexdigest(),
+    )
+
+
+def pack(swmm_input):
+    """Convert input to the structure stored in a cache.
+
+    Args:
+        swmm_input (OrderedDict): The input to convert.
+
+    Returns:
+        list: The name, comment, raw header, raw text and lines of each
+            section. Each line is its list of values and its comment. Sections
+            that have not been parsed have no lines.
+    """
+    return [
+        (
+            section,
+            section_content.get('comment'),
+            section_content.get_raw_header(),
+            section_content.get_raw_text(),
+            [
+                (line['values'], line['comment'])
+                for line
+                in section_content['lines']
+            ]
+            if section_content.is_parsed()
+            else None,
+        )
+        for section, section_content
+        in swmm_input.iteritems()
+    ]
+
+
+def unpack(packed_input):
+    """Convert the structure stored in a cache to input.
+
+    Args:
+        packed_input (list): The structure to convert.
+
+    Returns:
+        OrderedDict: The input.
+    """
+    swmm_input = OrderedDict()
+    for section, section_comment, raw_header, raw_text, lines in packed_input:
+        if raw_header is None:
+            source = raw_text
+            header_range = None
+        else:
+            source = raw_header + raw_text
+            header_range = (0, len(raw_header))
+        swmm_input[section] = sir.LazySection(
+            section,
+            section_comment,
+            source,
+            header_range,
+            [(len(source) - len(raw_text), len(source))],
+            [
+                {
+                    'values': values,
+                    'comment': comment,
+                }
+                for values, comment
+                in lines
+            ]
+            if lines is not None
+            else None,
+        )
+
+    return swmm_input
+
+
+def read_cache(cache_path, cache_key):
+    """Read parsed input from a cache file.
+
+    Args:
+        cache_path (string): The path to the cache file.
+        cache_key (tuple): The key the cached input must match.
+
+    Returns:
+        OrderedDict|None: The cached input, or None if the cache file is
+            missing, unreadable or does not match the key.
+    """
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            if marshal.load(cache_file) != cache_key:
+                return None
+            return unpack(marshal.load(cache_file))
+    except (IOError, EOFError, ValueError, TypeError):
+        return None
+
+
+def write_cache(cache_path, cache_key, swmm_input):
+    """Write parsed input to a cache file.
+
+    The cache is written to a temporary file first and moved into place, so
+    concurrent readers never see a partially written cache. Failing to write
+    the cache is not an error, since the input can always be parsed again.
+
+    Args:
+        cache_path (string): The path to the cache file.
+        cache_key (tuple): The key identifying the input.
+        swmm_input (OrderedDict): The input to cache.
+    """
+    try:
+        with atomic.open_file(cache_path, 'wb') as cache_file:
+            marshal.dump(cache_key, cache_file)
+            marshal.dump(pack(swmm_input), cache_file)
+    except (IOError, OSError) as e:
+        logging.warning(
+            'Could not cache parsed input at "{0}": {1}'.format(cache_path, e)
+        )
+
+
+def read(input_path, parsed_sections=()):
+    """Read an input file, using cached input if it is unchanged.
+
+    Args:
+        input_path (string): The path to the input file.
+        parsed_sections (Iterable): Sections to parse before caching newly
+            read input, so they are cached in parsed form. Defaults to none.
+
+    Returns:
+        OrderedDict: The input, which is shared with other callers and must
+            not be modified.
+
+    Raises:
+        IOError: The input file could not be read.
+    """
+    with open(input_path, 'rb') as input_file:
+        input_contents = input_file.read()
+    cache_key = get_cache_key(input_path, input_contents)
+
+    absolute_input_path = os.path.abspath(input_path)
+    if absolute_input_path in memory_cache:
+        cached_key, swmm_input = memory_cache[absolute_input_path]
+        if cached_key == cache_key:
+            return swmm_input
+
+    cache_path = get_cache_path(input_path)
+    swmm_input = read_cache(cache_path, cache_key)
+    if swmm_input is None:
+        swmm_input = sir.read(io.BytesIO(input_contents))
+        for section in parsed_sections:
+            if section in swmm_input:
+                # Looking up a section's lines parses them.
+                swmm_input[section]['lines']
+        write_cache(cache_path, cache_key, swmm_input)
+
+    memory_cache[absolute_input_path] = (cache_key, swmm_input)
+    return swmm_input
@@ -6,66 +6,309 @@ import shlex
 
 from . import input as si
 
+section_header_re = re.compile(r'^\[.*', re.MULTILINE)
+"""Matches the lines of a SWMM input file that are section headers."""
+
+ssv_special_chars_re = re.compile('[\'"\x0b\x0c]')
+"""Characters that prevent splitting a space-separated line with str.split."""
+
+ssv_line_re = re.compile(
+    r'(?:[ \t\r\n]*'
+    r'(?:"[^"]*"|\'[^\']*\'|[^ \t\r\n"\'][^ \t\r\n]*(?![^ \t\r\n])))*'
+    r'[ \t\r\n]*\Z'
+)
+"""Matches space-separated lines that can be split with ssv_value_re."""
+
+ssv_value_re = re.compile(r'"[^"]*"|\'[^\']*\'|[^ \t\r\n"\'][^ \t\r\n]*')
+"""Matches each value in a space-separated line."""
+
+
+def split_ssv_values_with_shlex(line_data):
+    """Split the data portion of a space-separated line into values.
+
+    Args:
+        line_data (string): The data portion of the line.
+
+    Returns:
+        list: The values in the line.
+
+    Raises:
+        ValueError: The line contains a quotation that is not closed.
+    """
+    line_parser = shlex.shlex(line_data)
+    line_parser.commenters = ''
+    line_parser.whitespace_split = True
+    return list(line_parser)
+
+
+def split_ssv_values(line_data):
+    """Split the data portion of a space-separated line into values.
+
+    Values are split the same way as split_ssv_values_with_shlex, so quoted
+    values may contain whitespace and keep their quotes, but most lines are
+    split without constructing a tokenizer. Lines without quotes are split
+    with str.split, lines with well-formed quotes with a regular expression,
+    and only anything else with shlex.
+
+    Args:
+        line_data (string): The data portion of the line.
+
+    Returns:
+        list: The values in the line.
+
+    Raises:
+        ValueError: The line contains a quotation that is not closed.
+    """
+    if not ssv_special_chars_re.search(line_data):
+        return line_data.split()
+    if ssv_line_re.match(line_data):
+        return ssv_value_re.findall(line_data)
+    return split_ssv_values_with_shlex(line_data)
+
+
+def split_line(line):
+    """Split a line of a SWMM input file into its data and comment.
+
+    Args:
+        line (string): The line to split.
+
+    Returns:
+        tuple: The data portion of the line and its comment, or None if the
+            line has no comment.
+    """
+    line_parts = line.split(';', 1)
+    line_data = line_parts[0].rstrip('\r\n')
+    line_comment = (
+        line_parts[1].rstrip('\r\n')
+        if len(line_parts) > 1
+        else None
+    )
+    return line_data, line_comment
+
+
+def read_section_lines(section, raw_text):
+    """Parse the lines of a section of a SWMM input file.
+
+    Args:
+        section (string): The name of the section.
+        raw_text (string): The text of the section, without its header.
+
+    Returns:
+        list: The lines of the section. Each line is an object with a list of
+            values and any comment.
+    """
+    section_format = si.get_section_format(section)
+    raw_lines = raw_text.split('\n')
+    if raw_lines[-1] == '':
+        raw_lines.pop()
+
+    lines = []
+    for raw_line in raw_lines:
+        line_data, line_comment = split_line(raw_line)
+
+        # Parse the line according to the section's formatting.
+        if section_format == 'ssv':
+            line_values = split_ssv_values(line_data)
+        else:
+            line_values = [line_data]
+
+        lines.append({
+            'values': line_values,
+            'comment': line_comment,
+        })
+
+    return lines
+
+
+class LazySection(dict):
+    """A section of SWMM input that is only parsed when its lines are used.
+
+    A lazy section is a dict with the same "lines" and "comment" keys as any
+    other section, but its lines are only parsed from the section's raw text
+    the first time they are looked up. Until then, the raw text can be used
+    in place of the lines.
+
+    Once parsed, lines may be added after those parsed from the raw text
+    without affecting it. Any other change to the section, such as editing,
+    replacing or removing its lines or changing its comment, is found by
+    is_modified, so that the raw text is no longer used in its place.
+    """
+
+    def __init__(
+        self,
+        section,
+        comment,
+        source,
+        header_range,
+        raw_ranges,
+        lines=None,
+    ):
+        """Constructor.
+
+        Args:
+            section (string): The name of the section.
+            comment (string|None): The comment for the section's header.
+            source (string): The text the section was read from.
+            header_range (tuple|None): The start and end positions of the
+                section's header line in the source, or None if the section
+                has no header.
+            raw_ranges (list): The start and end positions of each part of
+                the source holding the section's lines, in order.
+            lines (list): The lines already parsed from the raw text, if any.
+        """
+        dict.__init__(self, comment=comment)
+        self.section = section
+        self.source = source
+        self.header_range = header_range
+        self.raw_ranges = raw_ranges
+        self.raw_comment = comment
+        self.raw_lines = None
+        self.num_raw_lines = None
+        if lines is not None:
+            self.set_raw_lines(lines)
+
+    def __missing__(self, key):
+        """Parse the section's lines if they are looked up."""
+        if key != 'lines':
+            raise KeyError(key)
+
+        lines = read_section_lines(self.section, self.get_raw_text())
+        self.set_raw_lines(lines)
+        return lines
+
+    def set_raw_lines(self, lines):
+        """Set the lines parsed from the section's raw text.
+
+        A copy of the values and comment of each line is kept, to find
+        changes to the lines by.
+
+        Args:
+            lines (list): The lines parsed from the raw text.
+        """
+        self['lines'] = lines
+        self.raw_lines = [
+            (list(line['values']), line['comment'])
+            for line
+            in lines
+        ]
+        self.num_raw_lines = len(lines)
+
+    def __contains__(self, key):
+        """Check for a key, counting unparsed lines as present."""
+        return key == 'lines' or dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        """Get the value for a key, parsing the section's lines if needed."""
+        return self[key] if key in self else default
+
+    def is_parsed(self):
+        """Check if the section's lines have been parsed.
+
+        Returns:
+            boolean: True if the lines have been parsed.
+        """
+        return dict.__contains__(self, 'lines')
+
+    def get_raw_header(self):
+        """Get the raw text of the section's header line.
+
+        Returns:
+            string|None: The header line as read, including its line break, or
+                None if the section has no header.
+        """
+        if self.header_range is None:
+            return None
+
+        start, end = self.header_range
+        return self.source[start:end]
+
+    def get_raw_text(self):
+        """Get the raw text of the section's lines.
+
+        Returns:
+            string: The text of the section as read, without its header.
+        """
+        return ''.join(
+            self.source[start:end]
+            for start, end
+            in self.raw_ranges
+        )
+
+    def is_modified(self):
+        """Check if the section was changed other than by adding lines.
+
+        Returns:
+            boolean: True if the section's comment, or any of the lines parsed
+                from its raw text, has been changed, replaced or removed.
+        """
+        if dict.get(self, 'comment') != self.raw_comment:
+            return True
+        if not self.is_parsed():
+            return False
+
+        lines = self['lines']
+        if len(lines) < self.num_raw_lines:
+            return True
+
+        for line, (raw_values, raw_comment) in zip(lines, self.raw_lines):
+            if line['values'] != raw_values or line['comment'] != raw_comment:
+                return True
+
+        return False
+
+    def get_added_lines(self):
+        """Get the lines added after those parsed from the raw text.
+
+        Returns:
+            list: The added lines.
+        """
+        if not self.is_parsed():
+            return []
+
+        return self['lines'][self.num_raw_lines:]
+
 
 def read(f):
     """Read the contents of a SWMM input file into memory.
 
+    Only section headers are parsed when the file is read. The lines of each
+    section are parsed when the section's lines are first used, so sections
+    that are never used are never parsed.
+
     Args:
         f (file): The file to read.
 
     Returns:
         OrderedDict: The input data, structured similar to how it's written.
-            Each key is a section header in all-caps, and each value is an
-            object with a list of lines and any comment for that section.
+            Each key is a section header in all-caps, and each value is a
+            LazySection with a list of lines and any comment for that section.
             Each line is an object with a list of values and any comment.
     """
+    source = f.read()
     file_dict = OrderedDict({
-        '': {
-            'lines': [],
-            'comment': None,
-        },
+        '': LazySection('', None, source, None, []),
     })
-    current_section = ''
-    current_section_format = si.get_section_format(current_section)
-    current_section_lines = file_dict[current_section]['lines']
-    for line in f:
-        # Split the line into data and comment.
-        line_parts = line.split(';', 1)
-        line_data = line_parts[0].rstrip('\r\n')
-        line_comment = (
-            line_parts[1].rstrip('\r\n')
-            if len(line_parts) > 1
-            else None
-        )
+    current_section = file_dict['']
+    position = 0
+    for header_match in section_header_re.finditer(source):
+        current_section.raw_ranges.append((position, header_match.start()))
+
+        # Start the section's lines after the header's line break.
+        position = min(header_match.end() + 1, len(source))
 
-        # If the line starts with "[", it is a section header.
-        if line.startswith('['):
-            section_re_match = re.search(r'\[(?P<section>[^\]]*)\]', line_data)
-            current_section = section_re_match.group('section').upper()
-            current_section_format = si.get_section_format(
-                current_section,
+        line_data, line_comment = split_line(header_match.group())
+        section_re_match = re.search(r'\[(?P<section>[^\]]*)\]', line_data)
+        section = section_re_match.group('section').upper()
+        if section not in file_dict:
+            file_dict[section] = LazySection(
+                section,
+                line_comment,
+                source,
+                (header_match.start(), position),
+                [],
             )
-            if current_section not in file_dict:
-                file_dict[current_section] = {
-                    'lines': [],
-                    'comment': line_comment,
-                }
-            current_section_lines = file_dict[current_section]['lines']
-            continue
-
-        # If the line is not a section header, parse it as a line according to
-        # the section's formatting.
-        if current_section_format == 'ssv':
-            line_parser = shlex.shlex(line_data)
-            line_parser.commenters = ''
-            line_parser.whitespace_split = True
-            line_values = list(line_parser)
-        else:
-            line_values = [line_data]
+        current_section = file_dict[section]
 
-        current_section_lines.append({
-            'values': line_values,
-            'comment': line_comment,
-        })
+    current_section.raw_ranges.append((position, len(source)))
 
     return file_dict
@@ -2,7 +2,10 @@
 
 from __future__ import print_function
 
+from collections import Counter
+
 from . import input as si
+from . import input_reader as sir
 
 
 def format_line_for_write(data, comment):
@@ -45,28 +48,102 @@ def format_value_for_write(value, section_format):
         raise ValueError("Unknown section format: {0}".format(section_format))
 
 
-def write(content, f):
+def get_pretty_column_widths(column_widths):
+    """Get the widths to pad columns to, so they align on soft tabs.
+
+    Args:
+        column_widths (list): The maximum string length of each column.
+
+    Returns:
+        list: The width to pad each column to.
+    """
+    soft_tab_width = 4
+    return [
+        w + (soft_tab_width - (w % soft_tab_width)) - 1
+        for w
+        in column_widths
+    ]
+
+
+def format_values_for_write(value_strings, column_widths, comment):
+    """Format a line's values into aligned columns for writing.
+
+    Args:
+        value_strings (list): The line's values, formatted as strings.
+        column_widths (list): The width to pad each column to.
+        comment (string|None): The comment portion of the line.
+
+    Returns:
+        string: A string ready to be written to a file.
+    """
+    line_data_str = ' '.join(
+        value.ljust(column_width)
+        for value, column_width
+        in zip(value_strings, column_widths)
+    ).rstrip()
+
+    if line_data_str != '' and comment is not None:
+        line_data_str = '{0} '.format(line_data_str)
+
+    return format_line_for_write(line_data_str, comment)
+
+
+def write(content, f, layout=None):
     """Write the contents of a SWMM input file into a file.
 
+    Sections that were read from a file and not modified are written out
+    exactly as they were read, followed by any lines added to them. All other
+    sections and added lines are formatted into aligned columns.
+
     Args:
         content (dict): The SWMM input file contents.
         f (file): The file to write to.
+        layout (dict): If given, the layout of the lines formatted in each
+            section is stored in it by section, so they can be replaced in the
+            file later. Each layout holds the index in the section's lines of
+            the "first_line" formatted, the "widths" its columns are padded to,
+            the "length_counts" of values of each length in each column, and
+            the "offsets" in the file of each formatted line, followed by the
+            offset of the end of the last.
     """
     for section, section_content in content.iteritems():
-        # Print the section header if it exists.
+        # If this section was read and not modified, write it out as it was
+        # read, and only format lines added to it.
         is_empty_section = section == ''
-        if not is_empty_section:
-            section_comment = section_content['comment']
-            print(format_line_for_write(
-                '[{0}]{1}'.format(
-                    section,
-                    '' if section_comment is None else ' ',
-                ),
-                section_comment,
-            ), file=f)
+        is_raw_section = (
+            isinstance(section_content, sir.LazySection)
+            and not section_content.is_modified()
+        )
+        if is_raw_section:
+            raw_header = section_content.get_raw_header()
+            if raw_header is not None:
+                f.write(raw_header)
+                if not raw_header.endswith('\n'):
+                    f.write('\n')
+
+            raw_text = section_content.get_raw_text()
+            f.write(raw_text)
+            if raw_text and not raw_text.endswith('\n'):
+                f.write('\n')
+
+            lines = section_content.get_added_lines()
+            if not lines:
+                continue
+        else:
+            # Print the section header if it exists.
+            if not is_empty_section:
+                section_comment = section_content['comment']
+                print(format_line_for_write(
+                    '[{0}]{1}'.format(
+                        section,
+                        '' if section_comment is None else ' ',
+                    ),
+                    section_comment,
+                ), file=f)
+
+            lines = section_content['lines']
 
         # If this section has no content...
-        lines = section_content['lines']
         if not lines:
             # If this is not the "empty" section, print an empty line.
             if not is_empty_section:
@@ -96,34 +173,39 @@ def write(content, f):
         ]
 
         # Figure out the maximum string length of each column.
+        columns = zip(*lines_value_strings)
         column_widths = [
             max(map(len, column))
             for column
-            in zip(*lines_value_strings)
-        ]
-        soft_tab_width = 4
-        pretty_column_widths = [
-            w + (soft_tab_width - (w % soft_tab_width)) - 1
-            for w
-            in column_widths
+            in columns
         ]
+        pretty_column_widths = get_pretty_column_widths(column_widths)
+
+        if layout is not None:
+            line_offsets = []
+            layout[section] = {
+                'first_line': len(section_content['lines']) - len(lines),
+                'widths': pretty_column_widths,
+                'length_counts': [
+                    dict(Counter(map(len, column)))
+                    for column
+                    in columns
+                ],
+                'offsets': line_offsets,
+            }
 
         # Print each line in the section.
         for line, line_value_strings in zip(lines, lines_value_strings):
-            line_comment = line['comment']
-            line_data_str = ' '.join(
-                value.ljust(column_width)
-                for value, column_width
-                in zip(line_value_strings, pretty_column_widths)
-            ).rstrip()
-
-            if line_data_str != '' and line_comment is not None:
-                line_data_str = '{0} '.format(line_data_str)
-
-            print(format_line_for_write(
-                line_data_str,
-                line_comment,
+            if layout is not None:
+                line_offsets.append(f.tell())
+            print(format_values_for_write(
+                line_value_strings,
+                pretty_column_widths,
+                line['comment'],
             ), file=f)
 
+        if layout is not None:
+            line_offsets.append(f.tell())
+
         # Print a blank line at the end of the section for readability.
         print('', file=f)
@@ -0,0 +1,361 @@
+"""Functionality for running SWMM in-process through its shared library.
+
+The SWMM 5.2 API is used to step through a simulation and read the results of
+objects between routing steps, so that results can be used as they are
+computed without SWMM writing them to binary output first. Reported results
+are reconstructed exactly as SWMM writes them to binary output: interpolated
+between the routing steps either side of each reporting time, rounded to
+single precision and dated with SWMM's own date arithmetic.
+"""
+
+import ctypes
+import math
+
+import numpy as np
+
+object_types = {
+    'subcatchment': 1,
+    'node': 2,
+    'link': 3,
+}
+"""The SWMM API code of each type of object."""
+
+result_properties = {
+    'node': {
+        'Total_inflow': 307,
+    },
+    'link': {
+        'Flow_rate': 410,
+    },
+}
+"""The SWMM API code of each supported result of each type of object."""
+
+start_date_property = 0
+"""The SWMM API code of the date and time a simulation starts at."""
+
+report_step_property = 5
+"""The SWMM API code of the number of seconds between reporting periods."""
+
+seconds_per_day = 86400
+"""The number of seconds in a day."""
+
+error_message_length = 240
+"""The maximum length of error messages read from SWMM."""
+
+function_prototypes = {
+    'swmm_open': (ctypes.c_int, [
+        ctypes.c_char_p,
+        ctypes.c_char_p,
+        ctypes.c_char_p,
+    ]),
+    'swmm_start': (ctypes.c_int, [ctypes.c_int]),
+    'swmm_step': (ctypes.c_int, [ctypes.POINTER(ctypes.c_double)]),
+    'swmm_end': (ctypes.c_int, []),
+    'swmm_report': (ctypes.c_int, []),
+    'swmm_close': (ctypes.c_int, []),
+    'swmm_getError': (ctypes.c_int, [ctypes.c_char_p, ctypes.c_int]),
+    'swmm_getIndex': (ctypes.c_int, [ctypes.c_int, ctypes.c_char_p]),
+    'swmm_getValue': (ctypes.c_double, [ctypes.c_int, ctypes.c_int]),
+}
+"""The return and argument types of the SWMM API functions used."""
+
+libraries = {}
+"""The SWMM libraries loaded by this process, by path."""
+
+
+def load_library(library_path):
+    """Load the SWMM shared library, reusing it if already loaded.
+
+    Args:
+        library_path (string): The path or name of the library.
+
+    Returns:
+        ctypes.CDLL: The library, with the prototypes of the functions used
+            set.
+
+    Raises:
+        OSError: The library could not be loaded, or does not provide the
+            SWMM 5.2 API.
+    """
+    if library_path not in libraries:
+        library = ctypes.CDLL(library_path)
+        for function_name, (restype, argtypes) in (
+            function_prototypes.iteritems()
+        ):
+            try:
+                function = getattr(library, function_name)
+            except AttributeError:
+                raise OSError(
+                    'SWMM library "{0}" does not provide {1}.'.format(
+                        library_path,
+                        function_name,
+                    )
+                )
+            function.restype = restype
+            function.argtypes = argtypes
+        libraries[library_path] = library
+
+    return libraries[library_path]
+
+
+class Simulation(object):
+    """A SWMM simulation run in-process through the SWMM shared library.
+
+    SWMM keeps the state of a simulation in global variables, so only one
+    simulation can be open in a process at a time.
+    """
+
+    def __init__(
+        self,
+        library,
+        input_path,
+        report_output_path,
+        binary_output_path,
+    ):
+        """Open a simulation.
+
+        Args:
+            library (ctypes.CDLL): The SWMM library, as returned by
+                load_library.
+            input_path (string): The path to the SWMM input file.
+            report_output_path (string): The path to write the report to.
+            binary_output_path (string): The path for SWMM to open binary
+                output at. Results are not saved to it.
+
+        Raises:
+            ValueError: SWMM could not open the input file.
+        """
+        self._library = library
+        self._started = False
+        self._closed = False
+        self._library.swmm_open(
+            input_path,
+            report_output_path,
+            binary_output_path,
+        )
+        try:
+            self._check_error()
+        except ValueError:
+            self._closed = True
+            self._library.swmm_close()
+            raise
+
+    def __enter__(self):
+        """Use the simulation as a context manager."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the simulation, leaving any exception raised to propagate."""
+        if exc_type is None:
+            self.close()
+        else:
+            try:
+                self.close()
+            except ValueError:
+                pass
+
+    def _check_error(self):
+        """Check whether SWMM has encountered an error.
+
+        Raises:
+            ValueError: SWMM has encountered an error.
+        """
+        error_message = ctypes.create_string_buffer(error_message_length)
+        error_code = self._library.swmm_getError(
+            error_message,
+            error_message_length,
+        )
+        if error_code:
+            raise ValueError('SWMM failed: {0}'.format(
+                error_message.value.strip() or 'error {0}'.format(error_code),
+            ))
+
+    def start(self, report_start_date, end_date):
+        """Start the simulation, without saving results to binary output.
+
+        Args:
+            report_start_date (float): The SWMM timestamp reporting starts at.
+            end_date (float): The SWMM timestamp the simulation ends at.
+
+        Raises:
+            ValueError: SWMM could not start the simulation.
+        """
+        self._library.swmm_start(0)
+        self._started = True
+        self._check_error()
+
+        self.start_date = self._library.swmm_getValue(start_date_property, 0)
+        self.report_step = int(
+            self._library.swmm_getValue(report_step_property, 0),
+        )
+        self.report_start_date = max(report_start_date, self.start_date)
+        self.total_duration = 1000.0 * math.floor(
+            (end_date - self.start_date) * seconds_per_day,
+        )
+
+    def get_object_indices(self, object_type, names):
+        """Get the indices of objects within the simulation.
+
+        Args:
+            object_type (string): The type of the objects.
+            names (Iterable): The names of the objects.
+
+        Returns:
+            list: The index of each object, in the order given.
+
+        Raises:
+            ValueError: An object was not found in the simulation.
+        """
+        indices = []
+        for name in names:
+            index = self._library.swmm_getIndex(
+                object_types[object_type],
+                name,
+            )
+            if index < 0:
+                raise ValueError(
+                    '{0} "{1}" not found in SWMM input.'.format(
+                        object_type.capitalize(),
+                        name,
+                    )
+                )
+            indices.append(index)
+
+        return indices
+
+    def get_date_time(self, elapsed_time):
+        """Get the date and time of a time during the simulation.
+
+        Args:
+            elapsed_time (float): The number of milliseconds since the
+                simulation started.
+
+        Returns:
+            float: The SWMM timestamp, calculated as SWMM dates results.
+        """
+        start_day = math.floor(self.start_date)
+        start_seconds = int(
+            math.floor((self.start_date - start_day) * seconds_per_day + 0.5),
+        )
+        return start_day + (
+            start_seconds + (elapsed_time + 1) / 1000.0
+        ) / seconds_per_day
+
+    def _get_values(self, results):
+        """Get the current values of results.
+
+        Args:
+            results (list): The property code and object indices of each
+                result.
+
+        Returns:
+            list: The values of each result's objects.
+        """
+        get_value = self._library.swmm_getValue
+        return [
+            np.array([get_value(code, index) for index in indices])
+            for code, indices in results
+        ]
+
+    def read_period_blocks(self, object_indices, variables, period_block_size):
+        """Run the simulation, reading results for each reporting period.
+
+        Args:
+            object_indices (dict): The indices of the objects to read results
+                for, by object type.
+            variables (dict): The name of the result to read for each object
+                type.
+            period_block_size (int): The maximum number of periods in each
+                block.
+
+        Yields:
+            tuple: The index of the first period in the block, a dict mapping
+                each object type to its results with shape
+                (periods in block, objects) and the SWMM timestamp at the end
+                of each period in the block.
+
+        Raises:
+            ValueError: SWMM encountered an error.
+        """
+        object_type_list = list(object_indices)
+        results = [
+            (
+                result_properties[object_type][variables[object_type]],
+                object_indices[object_type],
+            )
+            for object_type in object_type_list
+        ]
+
+        block_start = 0
+        block_values = [[] for _ in object_type_list]
+        block_dates = []
+
+        report_time = 1000.0 * self.report_step
+        old_time = 0.0
+        old_values = self._get_values(results)
+        elapsed_days = ctypes.c_double()
+        while True:
+            self._library.swmm_step(ctypes.byref(elapsed_days))
+            self._check_error()
+
+            # The final step reports an elapsed time of zero, but ends at the
+            # end of the simulation.
+            if elapsed_days.value:
+                new_time = elapsed_days.value * seconds_per_day * 1000.0
+            else:
+                new_time = self.total_duration
+            new_values = self._get_values(results)
+
+            # Report as SWMM does when saving results to binary output.
+            if new_time >= report_time:
+                report_date = self.get_date_time(report_time)
+                if report_date >= self.report_start_date:
+                    f = (report_time - old_time) / (new_time - old_time)
+                    for type_values, old, new in zip(
+                        block_values,
+                        old_values,
+                        new_values,
+                    ):
+                        type_values.append(
+                            ((1.0 - f) * old + f * new).astype(np.float32),
+                        )
+                    block_dates.append(report_date)
+                report_time += 1000.0 * self.report_step
+
+            if len(block_dates) == period_block_size or (
+                block_dates and not elapsed_days.value
+            ):
+                yield block_start, {
+                    object_type: np.array(type_values, np.float32).reshape(
+                        len(block_dates),
+                        len(object_indices[object_type]),
+                    )
+                    for object_type, type_values
+                    in zip(object_type_list, block_values)
+                }, np.array(block_dates, np.float64)
+                block_start += len(block_dates)
+                block_values = [[] for _ in object_type_list]
+                block_dates = []
+
+            if not elapsed_days.value:
+                break
+            old_time = new_time
+            old_values = new_values
+
+    def close(self):
+        """End and close the simulation, writing its report.
+
+        Raises:
+            ValueError: SWMM encountered an error.
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        try:
+            if self._started:
+                self._library.swmm_end()
+                self._library.swmm_report()
+            self._check_error()
+        finally:
+            self._library.swmm_close()
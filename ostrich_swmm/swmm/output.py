@@ -0,0 +1,67 @@
+"""Common functionality for handling SWMM binary output."""
+
+record_size = 4
+"""The size in bytes of integer and single-precision records."""
+
+magic_number = 516114522
+"""The number found at the start and end of every SWMM binary output file."""
+
+object_types = [
+    'subcatchment',
+    'node',
+    'link',
+    'system',
+]
+"""The types of objects in a binary output file, in the order they are stored
+within each reporting period."""
+
+variable_codes = {
+    'subcatchment': {
+        'Rainfall': 0,
+        'Snow_depth': 1,
+        'Evaporation_loss': 2,
+        'Infiltration_loss': 3,
+        'Runoff_rate': 4,
+        'Groundwater_outflow': 5,
+        'Groundwater_elevation': 6,
+        'Soil_moisture': 7,
+    },
+    'node': {
+        'Depth_above_invert': 0,
+        'Hydraulic_head': 1,
+        'Volume_stored_ponded': 2,
+        'Lateral_inflow': 3,
+        'Total_inflow': 4,
+        'Flow_lost_flooding': 5,
+    },
+    'link': {
+        'Flow_rate': 0,
+        'Flow_depth': 1,
+        'Flow_velocity': 2,
+        'Flow_volume': 3,
+        'Capacity': 4,
+    },
+}
+"""The codes SWMM uses to identify the variables reported for each object."""
+
+
+def get_variable_code(object_type, variable):
+    """Get the code SWMM uses to identify a reported variable.
+
+    Args:
+        object_type (string): The type of object the variable is reported for.
+        variable (string): The name of the variable.
+
+    Returns:
+        int: The code for the variable.
+
+    Raises:
+        ValueError: The object type or variable is not recognized.
+    """
+    try:
+        return variable_codes[object_type][variable]
+    except KeyError:
+        raise ValueError('Unrecognized {0} variable "{1}".'.format(
+            object_type,
+            variable,
+        ))
@@ -0,0 +1,564 @@
+"""Functionality for reading a SWMM binary output file."""
+
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from . import output as so
+
+
+def read_prolog(buf):
+    """Read the prolog at the start of a SWMM binary output file.
+
+    The prolog holds everything written before the first reporting period:
+    object counts and names, object properties, the codes of the variables
+    reported for each object type, the start date and the report step.
+
+    Args:
+        buf (buffer): The contents of the file, starting from its first byte.
+
+    Returns:
+        dict: The values read from the prolog, including the position of the
+            first reporting period ("results_pos") and the size of each
+            reporting period in bytes ("bytes_per_period").
+
+    Raises:
+        ValueError: The contents are not those of a SWMM binary output file.
+        struct.error: The contents end before the prolog does.
+    """
+    pos = 0
+
+    def unpack(fmt):
+        """Unpack values from the buffer and advance past them."""
+        values = struct.unpack_from(fmt, buf, pos)
+        return values, pos + struct.calcsize(fmt)
+
+    (
+        magic,
+        version,
+        flow_units,
+        num_subcatchments,
+        num_nodes,
+        num_links,
+        num_pollutants,
+    ), pos = unpack('<7i')
+    if magic != so.magic_number:
+        raise ValueError('Not a SWMM binary output file.')
+
+    num_objects = {
+        'subcatchment': num_subcatchments,
+        'node': num_nodes,
+        'link': num_links,
+        'pollutant': num_pollutants,
+    }
+
+    # Read the names of each object.
+    names = {}
+    for object_type in ['subcatchment', 'node', 'link', 'pollutant']:
+        object_names = []
+        for i in range(num_objects[object_type]):
+            (name_length,), pos = unpack('<i')
+            if pos + name_length > len(buf):
+                raise struct.error('Prolog is incomplete.')
+            object_names.append(buf[pos:pos + name_length])
+            pos += name_length
+        names[object_type] = object_names
+
+    # Skip the pollutant units.
+    pos += num_pollutants * so.record_size
+
+    # Skip the object properties.
+    for object_type in ['subcatchment', 'node', 'link']:
+        (num_properties,), pos = unpack('<i')
+        pos += (
+            (num_properties + num_properties * num_objects[object_type])
+            * so.record_size
+        )
+
+    # Read the codes of the variables reported for each object type.
+    variable_codes = {}
+    for object_type in ['subcatchment', 'node', 'link', 'system']:
+        (num_variables,), pos = unpack('<i')
+        codes, pos = unpack('<{0}i'.format(num_variables))
+        variable_codes[object_type] = list(codes)
+
+    (start_date, report_step), pos = unpack('<di')
+
+    num_objects['system'] = 1
+    bytes_per_period = 2 * so.record_size + so.record_size * sum(
+        num_objects[object_type] * len(variable_codes[object_type])
+        for object_type
+        in so.object_types
+    )
+
+    return {
+        'version': version,
+        'flow_units': flow_units,
+        'num_objects': num_objects,
+        'names': names,
+        'variable_codes': variable_codes,
+        'start_date': start_date,
+        'report_step': report_step,
+        'results_pos': pos,
+        'bytes_per_period': bytes_per_period,
+    }
+
+
+def read_epilog(buf, results_pos):
+    """Read the epilog at the end of a SWMM binary output file.
+
+    Args:
+        buf (buffer): The contents of the file, ending with its last byte.
+            Only the end of the file needs to be given.
+        results_pos (int): The position of the first reporting period, as
+            read from the prolog.
+
+    Returns:
+        tuple: The number of reporting periods and the error code of the
+            simulation.
+
+    Raises:
+        ValueError: The contents do not end with an epilog for the prolog.
+    """
+    epilog_size = 6 * so.record_size
+    if len(buf) < epilog_size:
+        raise ValueError('SWMM binary output file is truncated.')
+    (
+        _,
+        _,
+        epilog_results_pos,
+        num_periods,
+        error_code,
+        magic,
+    ) = struct.unpack_from('<6i', buf, len(buf) - epilog_size)
+    if magic != so.magic_number or epilog_results_pos != results_pos:
+        raise ValueError('SWMM binary output file is truncated.')
+
+    return num_periods, error_code
+
+
+def get_view(buf, shape, dtype, offset, strides):
+    """Get a view of values in a buffer.
+
+    Args:
+        buf (buffer): The buffer holding the values.
+        shape (tuple): The shape of the view.
+        dtype (string): The type of the values.
+        offset (int): The position of the first value in the buffer.
+        strides (tuple): The distance in bytes between values along each
+            dimension of the view.
+
+    Returns:
+        numpy.ndarray: The view of the values.
+    """
+    if 0 in shape:
+        return np.zeros(shape, dtype)
+
+    return np.ndarray(
+        shape=shape,
+        dtype=dtype,
+        buffer=buf,
+        offset=offset,
+        strides=strides,
+    )
+
+
+class BinaryOutputLayout(object):
+    """The layout of the values in a SWMM binary output file.
+
+    The layout is read from the file's prolog, and is used to find objects
+    and variables and to view the values of reporting periods.
+    """
+
+    def __init__(self, prolog):
+        """Constructor.
+
+        Args:
+            prolog (dict): The values read from the prolog of the file, as
+                returned by read_prolog.
+        """
+        self.version = prolog['version']
+        self.flow_units = prolog['flow_units']
+        self.num_objects = prolog['num_objects']
+        self.names = prolog['names']
+        self.variable_codes = prolog['variable_codes']
+        self.start_date = prolog['start_date']
+        self.report_step = prolog['report_step']
+        self.results_pos = prolog['results_pos']
+        self.bytes_per_period = prolog['bytes_per_period']
+
+        self._name_indices = {}
+
+    def get_object_indices(self, object_type, names):
+        """Get the indices of objects within the binary output.
+
+        Args:
+            object_type (string): The type of the objects.
+            names (Iterable): The names of the objects.
+
+        Returns:
+            numpy.ndarray: The index of each object, in the order given.
+
+        Raises:
+            ValueError: An object was not found in the binary output.
+        """
+        if object_type not in self._name_indices:
+            self._name_indices[object_type] = {
+                name: index
+                for index, name
+                in enumerate(self.names[object_type])
+            }
+        name_indices = self._name_indices[object_type]
+
+        indices = []
+        for name in names:
+            if name not in name_indices:
+                raise ValueError(
+                    '{0} "{1}" not found in binary output.'.format(
+                        object_type.capitalize(),
+                        name,
+                    )
+                )
+            indices.append(name_indices[name])
+
+        return np.array(indices, dtype=np.intp)
+
+    def get_variable_index(self, object_type, variable):
+        """Get the index of a variable within an object's reported values.
+
+        Args:
+            object_type (string): The type of object the variable is for.
+            variable (string): The name of the variable.
+
+        Returns:
+            int: The index of the variable.
+
+        Raises:
+            ValueError: The variable was not reported in the binary output.
+        """
+        code = so.get_variable_code(object_type, variable)
+        try:
+            return self.variable_codes[object_type].index(code)
+        except ValueError:
+            raise ValueError(
+                '{0} variable "{1}" not found in binary output.'.format(
+                    object_type.capitalize(),
+                    variable,
+                )
+            )
+
+    def get_period_dates_view(self, buf, offset, num_periods):
+        """Get a view of the SWMM timestamps of reporting periods in a buffer.
+
+        Args:
+            buf (buffer): The buffer holding the reporting periods.
+            offset (int): The position of the first period in the buffer.
+            num_periods (int): The number of periods.
+
+        Returns:
+            numpy.ndarray: A view of the timestamps with shape (periods,).
+        """
+        return get_view(
+            buf,
+            (num_periods,),
+            '<f8',
+            offset,
+            (self.bytes_per_period,),
+        )
+
+    def get_results_view(self, buf, offset, num_periods, object_type):
+        """Get a view of the values of reporting periods in a buffer.
+
+        Args:
+            buf (buffer): The buffer holding the reporting periods.
+            offset (int): The position of the first period in the buffer.
+            num_periods (int): The number of periods.
+            object_type (string): The type of objects to get values for.
+
+        Returns:
+            numpy.ndarray: A view of the values with shape
+                (periods, objects, variables).
+        """
+        num_variables = len(self.variable_codes[object_type])
+        offset += 2 * so.record_size
+        for preceding_type in so.object_types:
+            if preceding_type == object_type:
+                break
+            offset += so.record_size * (
+                self.num_objects[preceding_type]
+                * len(self.variable_codes[preceding_type])
+            )
+
+        return get_view(
+            buf,
+            (
+                num_periods,
+                self.num_objects[object_type],
+                num_variables,
+            ),
+            '<f4',
+            offset,
+            (
+                self.bytes_per_period,
+                num_variables * so.record_size,
+                so.record_size,
+            ),
+        )
+
+
+class BinaryOutput(BinaryOutputLayout):
+    """A memory-mapped SWMM binary output file.
+
+    The prolog is parsed once when the file is opened. Reported values are
+    then exposed as NumPy views onto the mapped file, so nothing is copied or
+    read from disk until it is accessed, and the whole time series of any set
+    of objects can be taken as a strided slice.
+
+    Views returned by this class are only valid until the file is closed.
+    """
+
+    def __init__(self, path):
+        """Constructor.
+
+        Args:
+            path (string): The path to the binary output file.
+
+        Raises:
+            IOError: The file could not be opened.
+            ValueError: The file is not a complete SWMM binary output file.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            prolog = read_prolog(self._mmap)
+        except struct.error:
+            self.close()
+            raise ValueError('SWMM binary output file is truncated.')
+        except ValueError:
+            self.close()
+            raise
+
+        BinaryOutputLayout.__init__(self, prolog)
+
+        # Read the epilog at the end of the file.
+        if len(self._mmap) < self.results_pos + 6 * so.record_size:
+            self.close()
+            raise ValueError('SWMM binary output file is truncated.')
+        try:
+            self.num_periods, self.error_code = read_epilog(
+                self._mmap,
+                self.results_pos,
+            )
+        except ValueError:
+            self.close()
+            raise
+
+    def __enter__(self):
+        """Enter a context managing this file."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit a context managing this file by closing it."""
+        self.close()
+
+    def close(self):
+        """Close the file, invalidating any views into it."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def get_period_dates(self):
+        """Get the SWMM timestamp of each reporting period.
+
+        Returns:
+            numpy.ndarray: A view of the timestamps with shape (periods,).
+        """
+        return self.get_period_dates_view(
+            self._mmap,
+            self.results_pos,
+            self.num_periods,
+        )
+
+    def get_results(self, object_type):
+        """Get the values reported for all objects of a type.
+
+        Args:
+            object_type (string): The type of objects to get values for.
+
+        Returns:
+            numpy.ndarray: A view of the values with shape
+                (periods, objects, variables).
+        """
+        return self.get_results_view(
+            self._mmap,
+            self.results_pos,
+            self.num_periods,
+            object_type,
+        )
+
+
+class TailedBinaryOutput(BinaryOutputLayout):
+    """A SWMM binary output file read while SWMM is still writing it.
+
+    SWMM writes the prolog when a simulation starts and each reporting period
+    as soon as it is computed, so periods can be read as they are written.
+    The epilog is only written once the simulation ends, so the number of
+    periods is only checked once SWMM has exited.
+    """
+
+    def __init__(self, path, is_writing, poll_interval):
+        """Constructor.
+
+        Waits until the prolog has been written.
+
+        Args:
+            path (string): The path to the binary output file.
+            is_writing (callable): Returns whether SWMM is still writing the
+                file.
+            poll_interval (float): The number of seconds to wait before
+                checking the file again when nothing new has been written.
+
+        Raises:
+            IOError: The file could not be opened.
+            ValueError: SWMM stopped writing before the prolog was complete,
+                or the file is not a SWMM binary output file.
+        """
+        self.path = path
+        self.is_writing = is_writing
+        self.poll_interval = poll_interval
+        self._file = open(path, 'rb')
+
+        try:
+            prolog = self._wait_for_prolog()
+        except ValueError:
+            self.close()
+            raise
+
+        BinaryOutputLayout.__init__(self, prolog)
+        self.num_periods = 0
+        self.error_code = None
+
+    def __enter__(self):
+        """Enter a context managing this file."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit a context managing this file by closing it."""
+        self.close()
+
+    def close(self):
+        """Close the file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _wait_for_prolog(self):
+        """Wait until the prolog has been written and read it.
+
+        Returns:
+            dict: The values read from the prolog, as returned by read_prolog.
+
+        Raises:
+            ValueError: SWMM stopped writing before the prolog was complete,
+                or the file is not a SWMM binary output file.
+        """
+        while True:
+            # Check before reading, so the last read sees everything written.
+            is_writing = self.is_writing()
+            self._file.seek(0)
+            try:
+                return read_prolog(self._file.read())
+            except struct.error:
+                if not is_writing:
+                    raise ValueError('SWMM binary output file is truncated.')
+            time.sleep(self.poll_interval)
+
+    def _read_periods(self, num_periods):
+        """Read the next reporting periods after those already read.
+
+        Args:
+            num_periods (int): The number of periods to read.
+
+        Returns:
+            string: The contents of the periods.
+
+        Raises:
+            ValueError: The file ends before the periods do.
+        """
+        self._file.seek(
+            self.results_pos + self.num_periods * self.bytes_per_period,
+        )
+        num_bytes = num_periods * self.bytes_per_period
+        periods = self._file.read(num_bytes)
+        if len(periods) != num_bytes:
+            raise ValueError('SWMM binary output file is truncated.')
+        self.num_periods += num_periods
+
+        return periods
+
+    def read_period_blocks(self, period_block_size):
+        """Read reporting periods as they are written.
+
+        Waits for more periods whenever all periods written so far have been
+        read, until SWMM stops writing. The epilog is then read to check that
+        the file is complete.
+
+        Args:
+            period_block_size (int): The maximum number of periods in each
+                block.
+
+        Yields:
+            tuple: The index of the first period in the block, the contents of
+                the periods and the number of periods.
+
+        Raises:
+            ValueError: The file is not a complete SWMM binary output file.
+        """
+        epilog_size = 6 * so.record_size
+        while True:
+            # Check before reading, so the last read sees everything written.
+            is_writing = self.is_writing()
+            if not is_writing:
+                break
+
+            # Leave room for the epilog, in case SWMM just finished writing.
+            file_size = os.fstat(self._file.fileno()).st_size
+            num_written = (
+                (file_size - self.results_pos - epilog_size)
+                // self.bytes_per_period
+            )
+            if num_written <= self.num_periods:
+                time.sleep(self.poll_interval)
+                continue
+
+            block_start = self.num_periods
+            num_periods = min(num_written - block_start, period_block_size)
+            yield (
+                block_start,
+                self._read_periods(num_periods),
+                num_periods,
+            )
+
+        self._file.seek(0, os.SEEK_END)
+        file_size = self._file.tell()
+        self._file.seek(max(file_size - epilog_size, 0))
+        total_periods, self.error_code = read_epilog(
+            self._file.read(),
+            self.results_pos,
+        )
+        if total_periods < self.num_periods:
+            raise ValueError('SWMM binary output file is truncated.')
+
+        while self.num_periods < total_periods:
+            block_start = self.num_periods
+            num_periods = min(total_periods - block_start, period_block_size)
+            yield (
+                block_start,
+                self._read_periods(num_periods),
+                num_periods,
+            )
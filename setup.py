@@ -33,7 +33,6 @@ setup(
     ),
     packages=find_packages(),
     install_requires=[
-        'swmmtoolbox>=1.0.5.8,<2',
         'numpy>=1.12,<2',
         'jsonschema>=2.6.0,<3',
         'shapely>=1.5,<2',
@@ -48,6 +47,7 @@ setup(
     entry_points={
         'console_scripts': [
             'ostrich-swmm=ostrich_swmm.__main__:main',
+            'ostrich-swmm-client=ostrich_swmm.client:main',
         ],
     },
 )
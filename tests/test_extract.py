@@ -0,0 +1,139 @@
+"""Tests for extracting flow statistics from SWMM binary output."""
+
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+
+from ostrich_swmm import extract
+from ostrich_swmm.swmm import output_reader as sor
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+binary_output_path = os.path.join(data_dir, 'flows.out')
+"""Binary output with flows spanning many orders of magnitude, so that the
+sums of its flows depend on the order they are added in."""
+
+baseline_summary_path = os.path.join(data_dir, 'flows_nodes.csv')
+"""The node summary of the binary output, as written by extraction before it
+read blocks of periods, adding each period's flows one period at a time."""
+
+node_names = ['J1', 'J2', 'J3']
+
+statistics = [
+    'node_name',
+    'num_flow_events',
+    'total_flow_volume',
+    'total_flow_duration',
+] + [
+    '{0}_flow_{1}'.format(event_type, statistic)
+    for event_type in ['first', 'last', 'max_volume', 'max_duration']
+    for statistic in ['start', 'end', 'duration', 'volume']
+]
+
+
+class ExtractionTest(unittest.TestCase):
+    """Tests that extraction reproduces the baseline summary exactly."""
+
+    def setUp(self):
+        """Create a directory for summaries."""
+        self.summary_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the directory for summaries."""
+        shutil.rmtree(self.summary_dir)
+
+    def get_config(self, output_path, period_block_size):
+        """Get the configuration of a node extraction step.
+
+        Args:
+            output_path (string): The path of the binary output.
+            period_block_size (int): The number of periods in each block.
+
+        Returns:
+            dict: The configuration.
+        """
+        return {
+            'binary_output_path': output_path,
+            'summary_dir': self.summary_dir,
+            'extract': {
+                'period_block_size': period_block_size,
+                'tail_poll_interval': 0,
+                'steps': [{
+                    'type': 'node',
+                    'output_path': 'nodes.csv',
+                    'statistics': statistics,
+                    'nodes': node_names,
+                }],
+            },
+        }
+
+    def assert_summary_matches_baseline(self, summary_path):
+        """Assert that a summary is identical to the baseline summary.
+
+        Args:
+            summary_path (string): The path of the summary.
+        """
+        with open(baseline_summary_path, 'rb') as baseline_file:
+            baseline_summary = baseline_file.read()
+        with open(summary_path, 'rb') as summary_file:
+            self.assertEqual(summary_file.read(), baseline_summary)
+
+    def test_extraction_matches_baseline(self):
+        """Summaries do not depend on the number of periods in each block."""
+        for period_block_size in [1, 7, 1024]:
+            extract.perform_extraction_steps(
+                self.get_config(binary_output_path, period_block_size),
+            )
+            self.assert_summary_matches_baseline(
+                os.path.join(self.summary_dir, 'nodes.csv'),
+            )
+
+    def test_node_extraction_matches_baseline(self):
+        """Extracting a single set of nodes matches the baseline summary."""
+        summary_path = os.path.join(self.summary_dir, 'nodes.csv')
+        with sor.BinaryOutput(binary_output_path) as binary_output:
+            with open(summary_path, 'wb') as summary_file:
+                extract.perform_node_extraction(
+                    binary_output,
+                    summary_file,
+                    node_names,
+                    statistics,
+                )
+        self.assert_summary_matches_baseline(summary_path)
+
+    def test_tailed_extraction_matches_extraction(self):
+        """Extracting while output is written matches extracting after."""
+        with open(binary_output_path, 'rb') as binary_output_file:
+            contents = binary_output_file.read()
+
+        # Write the output in uneven chunks, one each time the writer is
+        # checked on, so that periods are read in blocks of varying size.
+        tailed_output_path = os.path.join(self.summary_dir, 'flows.out')
+        chunk_sizes = itertools.cycle([1000, 37, 5000, 491, 12345, 160])
+        written = [0]
+
+        with open(tailed_output_path, 'wb') as tailed_output_file:
+            def is_writing():
+                if written[0] >= len(contents):
+                    return False
+                chunk_end = written[0] + next(chunk_sizes)
+                tailed_output_file.write(contents[written[0]:chunk_end])
+                tailed_output_file.flush()
+                written[0] = chunk_end
+                return True
+
+            extract.perform_tailed_extraction(
+                self.get_config(tailed_output_path, 64),
+                tailed_output_path,
+                is_writing,
+            )
+
+        self.assert_summary_matches_baseline(
+            os.path.join(self.summary_dir, 'nodes.csv'),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
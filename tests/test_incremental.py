@@ -0,0 +1,215 @@
+"""Tests for injecting parameters into SWMM input incrementally."""
+
+import copy
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ostrich_swmm import incremental
+from ostrich_swmm import inject
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+input_template_path = os.path.join(data_dir, 'lids.inp')
+"""An input template with rain barrel and permeable pavement LID controls."""
+
+
+def get_lid(subcatchment, lid_type, number, area):
+    """Get the parameters of an LID.
+
+    Args:
+        subcatchment (string): The subcatchment of the LID.
+        lid_type (string): The type of the LID.
+        number (int): The number of units of the LID.
+        area (float): The area of each unit of the LID.
+
+    Returns:
+        dict: The parameters of the LID.
+    """
+    return {
+        'location': {'subcatchment': subcatchment},
+        'type': lid_type,
+        'number': number,
+        'area': area,
+        'width': 0,
+        'initSat': 0,
+        'fromImp': 1,
+        'toPerv': 1,
+    }
+
+
+def get_roof(subcatchment, area):
+    """Get the parameters of a roof draining to a rain barrel.
+
+    Args:
+        subcatchment (string): The subcatchment of the roof.
+        area (float): The area of the roof.
+
+    Returns:
+        dict: The parameters of the roof.
+    """
+    return {
+        'location': {'subcatchment': subcatchment},
+        'type': 'RF1',
+        'number': 1,
+        'area': area,
+        'width': 43,
+        'slope': 40,
+        'PctImperv': 100,
+        'PctZero': 100,
+        'NImp': 0.0115,
+        'NPerv': 0.1,
+        'OutID': 'RB1',
+    }
+
+
+base_parameters = {
+    'lids': [
+        get_lid('S1', 'RB1', 2, 20),
+        get_lid('S1', 'PP1', 3, 100),
+        get_lid('S2', 'RB1', 5, 20),
+        get_lid('S2', 'PP1', 4, 50),
+        get_lid('S3', 'RB1', 1, 20),
+        get_lid('S3', 'PP1', 2, 50),
+    ],
+    'roofs': [
+        get_roof('S1', 1006.07),
+        get_roof('S2', 2192.2),
+        get_roof('S3', 1655.23),
+    ],
+}
+"""Parameters with one LID of each type in each subcatchment."""
+
+
+class IncrementalInjectionTest(unittest.TestCase):
+    """Tests that incremental injection matches full injection."""
+
+    def setUp(self):
+        """Create directories to inject into, and record patched inputs."""
+        self.work_dir = tempfile.mkdtemp()
+        self.template_path = os.path.join(self.work_dir, 'lids.inp')
+        shutil.copy(input_template_path, self.template_path)
+        for injection_dir in ['incremental', 'full']:
+            os.mkdir(os.path.join(self.work_dir, injection_dir))
+
+        self.patched = []
+        self.patch_input = incremental.patch_input
+
+        def patch_input(*args):
+            input_state = self.patch_input(*args)
+            self.patched.append(input_state is not None)
+            return input_state
+
+        incremental.patch_input = patch_input
+
+    def tearDown(self):
+        """Remove the directories injected into, and stop recording."""
+        incremental.patch_input = self.patch_input
+        shutil.rmtree(self.work_dir)
+
+    def get_config(self, injection_dir, is_incremental):
+        """Get the configuration of an injection.
+
+        Args:
+            injection_dir (string): The name of the directory to inject into.
+            is_incremental (boolean): Whether to inject incrementally.
+
+        Returns:
+            dict: The configuration.
+        """
+        injection_path = os.path.join(self.work_dir, injection_dir)
+        return {
+            'input_template_path': self.template_path,
+            'input_parameters_path': os.path.join(
+                injection_path,
+                'parameters.json',
+            ),
+            'input_path': os.path.join(injection_path, 'swmm.inp'),
+            'summary_dir': injection_path,
+            'inject': {
+                'incremental': is_incremental,
+            },
+        }
+
+    def read_outputs(self, config):
+        """Read the input file and LID summary written by an injection.
+
+        Args:
+            config (dict): The configuration of the injection.
+
+        Returns:
+            tuple: The contents of the input file and the LID summary.
+        """
+        with open(config['input_path'], 'rb') as input_file:
+            input_contents = input_file.read()
+        with open(inject.get_lid_summary_path(config), 'rb') as summary_file:
+            summary_contents = summary_file.read()
+
+        return input_contents, summary_contents
+
+    def assert_matches_full_injection(self, parameters):
+        """Assert that injecting incrementally matches injecting in full.
+
+        Args:
+            parameters (dict): The parameters to inject.
+        """
+        outputs = []
+        for injection_dir, is_incremental, perform_injection in [
+            ('incremental', True, incremental.perform_injection),
+            ('full', False, inject.perform_injection),
+        ]:
+            config = self.get_config(injection_dir, is_incremental)
+            with open(config['input_parameters_path'], 'w') as parameters_file:
+                json.dump(parameters, parameters_file)
+            perform_injection(copy.deepcopy(config))
+            outputs.append(self.read_outputs(config))
+
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_patched_changes_match_full_injection(self):
+        """Changing numbers of units, including to and from 0, is patched."""
+        parameters = copy.deepcopy(base_parameters)
+        self.assert_matches_full_injection(parameters)
+
+        for lid_index, number in [(0, 3), (1, 0), (1, 7), (5, 0), (5, 2)]:
+            parameters['lids'][lid_index]['number'] = number
+            self.assert_matches_full_injection(parameters)
+
+        self.assertEqual(self.patched, [True] * 5)
+
+    def test_realigned_columns_match_full_injection(self):
+        """Widening and narrowing a column rewrites the input file."""
+        parameters = copy.deepcopy(base_parameters)
+        self.assert_matches_full_injection(parameters)
+
+        # The area is wider than any other in its column.
+        parameters['lids'][2]['area'] = 123.456789
+        self.assert_matches_full_injection(parameters)
+        parameters['lids'][2]['area'] = 20
+        self.assert_matches_full_injection(parameters)
+
+        # The input file written in full can be patched again.
+        parameters['lids'][3]['number'] = 6
+        self.assert_matches_full_injection(parameters)
+
+        self.assertEqual(self.patched, [False, False, True])
+
+    def test_changed_input_file_matches_full_injection(self):
+        """An input file changed since it was injected is not patched."""
+        parameters = copy.deepcopy(base_parameters)
+        self.assert_matches_full_injection(parameters)
+
+        input_path = self.get_config('incremental', True)['input_path']
+        with open(input_path, 'a') as input_file:
+            input_file.write('[TAGS]\n')
+
+        parameters['lids'][0]['number'] = 3
+        self.assert_matches_full_injection(parameters)
+
+        self.assertEqual(self.patched, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
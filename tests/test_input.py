@@ -0,0 +1,191 @@
+"""Tests for reading and writing SWMM input files."""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from ostrich_swmm.swmm import input_cache as sic
+from ostrich_swmm.swmm import input_reader as sir
+from ostrich_swmm.swmm import input_writer as siw
+
+input_text = (
+    '[TITLE]\n'
+    'Unparsed  title  text\n'
+    '\n'
+    '[JUNCTIONS] ;;Junctions\n'
+    ';;Name  Elevation   MaxDepth\n'
+    'J1      10.5        2    ;first\n'
+    'J2      11          3\n'
+    '\n'
+    '[OUTFALLS]\n'
+    'O1    9   FREE\n'
+)
+"""Input formatted differently than it would be written."""
+
+
+def write(swmm_input):
+    """Write input to a string.
+
+    Args:
+        swmm_input (OrderedDict): The input to write.
+
+    Returns:
+        string: The written input.
+    """
+    output = io.BytesIO()
+    siw.write(swmm_input, output)
+    return output.getvalue()
+
+
+def write_read(swmm_input):
+    """Write input and read back what was written.
+
+    Args:
+        swmm_input (OrderedDict): The input to write.
+
+    Returns:
+        OrderedDict: The input read back.
+    """
+    return sir.read(io.BytesIO(write(swmm_input)))
+
+
+def get_lines(swmm_input, section):
+    """Get the values and comment of each line of a section that is not blank.
+
+    Args:
+        swmm_input (OrderedDict): The input.
+        section (string): The section to get the lines of.
+
+    Returns:
+        list: The values and comment of each line.
+    """
+    return [
+        (line['values'], line['comment'])
+        for line
+        in swmm_input[section]['lines']
+        if line['values'] or line['comment'] is not None
+    ]
+
+
+class InputWriteTest(unittest.TestCase):
+    """Tests that sections read from a file are written with any changes."""
+
+    def read(self):
+        """Read the input.
+
+        Returns:
+            OrderedDict: The input.
+        """
+        return sir.read(io.BytesIO(input_text))
+
+    def test_unchanged_input_is_written_as_read(self):
+        """Input that was read and parsed but not changed is written as is."""
+        swmm_input = self.read()
+        swmm_input['JUNCTIONS']['lines']
+        self.assertEqual(write(swmm_input), input_text)
+
+    def test_added_lines_keep_read_lines(self):
+        """Lines added to a section leave its read lines as they were read."""
+        swmm_input = self.read()
+        swmm_input['JUNCTIONS']['lines'].append({
+            'values': ['J3', '12', '4'],
+            'comment': None,
+        })
+        written = write(swmm_input)
+        self.assertIn('J1      10.5        2    ;first\n', written)
+        self.assertEqual(
+            get_lines(sir.read(io.BytesIO(written)), 'JUNCTIONS')[-1],
+            (['J3', '12', '4'], None),
+        )
+
+    def test_edited_value_is_written(self):
+        """A value edited in place is written instead of the read text."""
+        swmm_input = self.read()
+        swmm_input['JUNCTIONS']['lines'][1]['values'][1] = '20'
+        self.assertEqual(
+            get_lines(write_read(swmm_input), 'JUNCTIONS'),
+            [
+                ([], ';Name  Elevation   MaxDepth'),
+                (['J1', '20', '2'], 'first'),
+                (['J2', '11', '3'], None),
+            ],
+        )
+
+    def test_replaced_and_removed_lines_are_written(self):
+        """Replacing and removing read lines is written."""
+        swmm_input = self.read()
+        lines = swmm_input['JUNCTIONS']['lines']
+        lines[1] = {'values': ['J4', '5', '1'], 'comment': None}
+        del lines[2]
+        self.assertEqual(
+            get_lines(write_read(swmm_input), 'JUNCTIONS'),
+            [
+                ([], ';Name  Elevation   MaxDepth'),
+                (['J4', '5', '1'], None),
+            ],
+        )
+
+    def test_edited_comments_are_written(self):
+        """Changing a line's or the section's comment is written."""
+        swmm_input = self.read()
+        swmm_input['OUTFALLS']['comment'] = 'Outfalls'
+        swmm_input['JUNCTIONS']['lines'][1]['comment'] = 'changed'
+        written_input = write_read(swmm_input)
+        self.assertEqual(written_input['OUTFALLS']['comment'], 'Outfalls')
+        self.assertEqual(
+            get_lines(written_input, 'JUNCTIONS')[1],
+            (['J1', '10.5', '2'], 'changed'),
+        )
+
+
+class CachedInputWriteTest(InputWriteTest):
+    """Tests that sections read through the input cache keep their changes.
+
+    Input is read from the cache file, or from memory where stated.
+    """
+
+    def setUp(self):
+        """Create an input file in a temporary directory."""
+        self.input_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.input_dir, 'input.inp')
+        with open(self.input_path, 'wb') as input_file:
+            input_file.write(input_text)
+
+        # Cache the input file with the junctions parsed, and forget it.
+        sic.read(self.input_path, ['JUNCTIONS'])
+        sic.memory_cache.clear()
+
+    def tearDown(self):
+        """Remove the temporary directory and forget the input file."""
+        sic.memory_cache.clear()
+        shutil.rmtree(self.input_dir)
+
+    def read(self):
+        """Read the input from the cache file, as a fresh copy.
+
+        Returns:
+            OrderedDict: The input.
+        """
+        sic.memory_cache.clear()
+        return sic.read(self.input_path)
+
+    def test_input_is_read_from_cache_file(self):
+        """The cache file holds the junctions parsed."""
+        self.assertTrue(self.read()['JUNCTIONS'].is_parsed())
+
+    def test_edit_from_memory_is_written(self):
+        """A value edited in input read from memory is written."""
+        sic.memory_cache.clear()
+        sic.read(self.input_path)
+        swmm_input = sic.read(self.input_path)
+        swmm_input['JUNCTIONS']['lines'][2]['values'][2] = '7'
+        self.assertEqual(
+            get_lines(write_read(swmm_input), 'JUNCTIONS')[-1],
+            (['J2', '11', '7'], None),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()